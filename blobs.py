@@ -0,0 +1,256 @@
+"""
+Armazenamento dos arquivos dos materiais endereçado pelo conteúdo.
+
+Cada arquivo é gravado uma única vez em `uploads/blobs/<2 primeiros
+dígitos>/<sha256>`: enviar de novo um arquivo idêntico (com qualquer nome)
+não ocupa nenhum byte a mais, e arquivos diferentes com o mesmo nome não se
+sobrescrevem.
+
+Arquivos grandes são enviados em partes por uma sessão de upload
+(`upload_sessao`). Cada parte é acrescentada ao arquivo parcial em
+`uploads/partes/` e passa pelo SHA-256 incremental da sessão; se a conexão
+cair, o cliente consulta quantos bytes já chegaram e continua dali. O estado
+do hash fica em memória e, se o servidor reiniciar no meio do envio, é
+reconstruído relendo o arquivo parcial.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+# Tamanho dos blocos lidos/gravados em disco
+COPY_BUFFER_SIZE = 1024 * 1024
+# Tamanho sugerido ao cliente para cada parte do upload
+CHUNK_SIZE = 8 * 1024 * 1024
+# Sessões sem atividade por mais tempo que isto são descartadas
+SESSION_TTL = timedelta(days=7)
+
+BLOBS_DIR = 'blobs'
+PARTS_DIR = 'partes'
+
+
+class UploadError(Exception):
+    """Erro de uma parte do upload; `status` é o código HTTP sugerido."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def blob_path(root, sha256):
+    return os.path.join(root, BLOBS_DIR, sha256[:2], sha256)
+
+
+def blob_url(root, sha256):
+    """Caminho relativo gravado em `materials.url`."""
+    return '/'.join((root, BLOBS_DIR, sha256[:2], sha256))
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _copy_and_hash(stream, output, hasher, limit=None):
+    """Copia `stream` para `output` em blocos, atualizando o hash. Retorna os bytes copiados."""
+    copied = 0
+    while limit is None or copied < limit:
+        size = COPY_BUFFER_SIZE if limit is None else min(COPY_BUFFER_SIZE, limit - copied)
+        block = stream.read(size)
+        if not block:
+            break
+        output.write(block)
+        hasher.update(block)
+        copied += len(block)
+    return copied
+
+
+def _register_blob(conn, root, partial_path, sha256, size):
+    """
+    Move o arquivo completo para o endereço do conteúdo (ou descarta-o se
+    o blob já existir) e registra o blob. Não faz commit.
+    """
+    target = blob_path(root, sha256)
+    if os.path.exists(target):
+        os.remove(partial_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(partial_path, target)
+    conn.execute(
+        'INSERT OR IGNORE INTO blob (sha256, tamanho, created_at) VALUES (?, ?, ?)',
+        (sha256, size, _now())
+    )
+
+
+def store_stream(conn, root, stream):
+    """
+    Grava um arquivo enviado de uma vez (ex.: upload multipart), lendo-o em
+    blocos. Retorna (sha256, tamanho). Não faz commit.
+    """
+    parts = os.path.join(root, PARTS_DIR)
+    os.makedirs(parts, exist_ok=True)
+    partial_path = os.path.join(parts, f'direto_{uuid.uuid4().hex}')
+    hasher = hashlib.sha256()
+    try:
+        with open(partial_path, 'wb') as output:
+            size = _copy_and_hash(stream, output, hasher)
+        sha256 = hasher.hexdigest()
+        _register_blob(conn, root, partial_path, sha256, size)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return sha256, size
+
+
+def store_file(conn, root, path):
+    """
+    Registra um arquivo já existente no disco sem removê-lo (usado para os
+    materiais enviados antes do armazenamento por conteúdo). Retorna
+    (sha256, tamanho). Não faz commit.
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+            hasher.update(block)
+    sha256 = hasher.hexdigest()
+    target = blob_path(root, sha256)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copyfile(path, target)
+    size = os.path.getsize(target)
+    conn.execute(
+        'INSERT OR IGNORE INTO blob (sha256, tamanho, created_at) VALUES (?, ?, ?)',
+        (sha256, size, _now())
+    )
+    return sha256, size
+
+
+# --- Uploads em partes ---
+
+# Estado do SHA-256 de cada sessão ativa: {id: (hasher, bytes já incluídos)}
+_hashers = {}
+# Uma parte por vez em cada sessão
+_session_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _session_lock(session_id):
+    with _locks_guard:
+        return _session_locks.setdefault(session_id, threading.Lock())
+
+
+def _forget_session(session_id):
+    with _locks_guard:
+        _session_locks.pop(session_id, None)
+    _hashers.pop(session_id, None)
+
+
+def _partial_path(root, session_id):
+    return os.path.join(root, PARTS_DIR, session_id)
+
+
+def cleanup_stale_sessions(conn, root):
+    """Remove as sessões abandonadas e seus arquivos parciais."""
+    limit = (datetime.now() - SESSION_TTL).isoformat(timespec='seconds')
+    stale = conn.execute('SELECT id FROM upload_sessao WHERE updated_at < ?', (limit,)).fetchall()
+    for row in stale:
+        delete_session(conn, root, row['id'])
+
+
+def create_session(conn, root, filename, size, title=None, tags=None):
+    """Abre uma sessão de upload de `size` bytes e retorna o seu id."""
+    cleanup_stale_sessions(conn, root)
+    session_id = f'up_{uuid.uuid4().hex}'
+    os.makedirs(os.path.join(root, PARTS_DIR), exist_ok=True)
+    open(_partial_path(root, session_id), 'wb').close()
+    now = _now()
+    conn.execute(
+        'INSERT INTO upload_sessao (id, nome_arquivo, tamanho, recebido, title, tags, created_at, updated_at) '
+        'VALUES (?, ?, ?, 0, ?, ?, ?, ?)',
+        (session_id, filename, size, title, tags, now, now)
+    )
+    conn.commit()
+    return session_id
+
+
+def delete_session(conn, root, session_id):
+    conn.execute('DELETE FROM upload_sessao WHERE id = ?', (session_id,))
+    conn.commit()
+    partial_path = _partial_path(root, session_id)
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    _forget_session(session_id)
+
+
+def _session_hasher(partial_path, session_id, received):
+    """
+    Hash dos `received` primeiros bytes do arquivo parcial. Retorna uma
+    cópia do estado guardado: se a parte falhar no meio (cliente
+    desconectado), os bytes já lidos não contaminam o hash da nova tentativa.
+    """
+    state = _hashers.get(session_id)
+    if state is not None and state[1] == received:
+        return state[0].copy()
+    # Servidor reiniciado (ou outro processo): relê o que já foi gravado
+    hasher = hashlib.sha256()
+    with open(partial_path, 'rb') as source:
+        remaining = received
+        while remaining:
+            block = source.read(min(COPY_BUFFER_SIZE, remaining))
+            if not block:
+                raise UploadError('Arquivo parcial incompleto; reinicie o upload.', 409)
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def append_chunk(conn, root, session, offset, stream, length):
+    """
+    Acrescenta uma parte de `length` bytes começando em `offset`. A parte
+    precisa começar exatamente onde a anterior terminou; caso contrário
+    lança UploadError (409) com o deslocamento esperado, para o cliente
+    retomar dali. Retorna (bytes recebidos, (sha256, tamanho) ou None se
+    ainda faltarem partes). Ao completar, o blob é registrado sem commit,
+    para que o material seja criado na mesma transação.
+    """
+    session_id = session['id']
+    with _session_lock(session_id):
+        received = conn.execute('SELECT recebido FROM upload_sessao WHERE id = ?', (session_id,)).fetchone()
+        if received is None:
+            raise UploadError('Sessão de upload não encontrada.', 404)
+        received = received[0]
+        if offset != received:
+            raise UploadError('Deslocamento inesperado.', 409, received)
+        if received + length > session['tamanho']:
+            raise UploadError('A parte ultrapassa o tamanho declarado do arquivo.', 400, received)
+
+        partial_path = _partial_path(root, session_id)
+        hasher = _session_hasher(partial_path, session_id, received)
+        with open(partial_path, 'r+b') as output:
+            # Descarta bytes de uma gravação interrompida antes de ser confirmada
+            output.truncate(received)
+            output.seek(received)
+            copied = _copy_and_hash(stream, output, hasher, length)
+        if copied != length:
+            _hashers.pop(session_id, None)
+            raise UploadError('Parte incompleta; envie-a novamente.', 400, received)
+
+        received += copied
+        _hashers[session_id] = (hasher, received)
+        conn.execute('UPDATE upload_sessao SET recebido = ?, updated_at = ? WHERE id = ?',
+                     (received, _now(), session_id))
+        if received < session['tamanho']:
+            conn.commit()
+            return received, None
+
+        sha256 = hasher.hexdigest()
+        _register_blob(conn, root, partial_path, sha256, received)
+        conn.execute('DELETE FROM upload_sessao WHERE id = ?', (session_id,))
+        _forget_session(session_id)
+        return received, (sha256, received)
@@ -0,0 +1,196 @@
+"""
+Índice de busca do texto dos arquivos dos materiais.
+
+O texto de cada conteúdo distinto (pelo hash, como em blobs.py) é extraído
+por um thread em segundo plano com `extraction.iter_text`, lido em blocos e
+gravado em partes de até PART_SIZE caracteres na tabela `blob_texto_parte`,
+indexada pela tabela FTS5 `blob_texto_busca`. Ao terminar, o hash é
+registrado em `blob_texto`: o mesmo conteúdo enviado de novo (ou com outro
+nome) não é extraído outra vez. Uma extração interrompida é refeita do zero
+na próxima vez que o conteúdo for agendado.
+
+Para indexar os materiais que ainda não estão no índice:
+
+    python3 content_index.py
+"""
+import logging
+import queue
+import threading
+from datetime import datetime
+
+import blobs
+import database
+import extraction
+import search
+
+# Caracteres por parte do texto indexado (cada parte gera seus próprios trechos)
+PART_SIZE = 32 * 1024
+# Limite de texto indexado por arquivo; o restante é ignorado
+MAX_INDEXED_CHARS = 8 * 1024 * 1024
+# Palavras ao redor dos termos encontrados no trecho de cada resultado
+SNIPPET_WORDS = 16
+
+logger = logging.getLogger(__name__)
+
+
+def iter_parts(chunks, size=PART_SIZE, max_chars=MAX_INDEXED_CHARS):
+    """
+    Agrupa os pedaços de texto em partes de até `size` caracteres, cortadas
+    em um espaço (sem partir palavras) e com os espaços simplificados.
+    """
+    buffer = ''
+    total = 0
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            cut = max(buffer.rfind(' ', 0, size), buffer.rfind('\n', 0, size))
+            if cut <= 0:
+                cut = size
+            part, buffer = ' '.join(buffer[:cut].split()), buffer[cut:]
+            if part:
+                yield part
+            total += cut
+            if total >= max_chars:
+                return
+    part = ' '.join(buffer.split())
+    if part:
+        yield part
+
+
+def is_indexed(conn, sha256):
+    return conn.execute('SELECT 1 FROM blob_texto WHERE sha256 = ?', (sha256,)).fetchone() is not None
+
+
+def index_blob(conn, root, sha256, filename):
+    """
+    Extrai e indexa o texto de um conteúdo. Retorna False se ele já estava
+    indexado. Cada parte é gravada na sua própria transação, para não
+    segurar o banco durante a extração de arquivos grandes.
+    """
+    if is_indexed(conn, sha256):
+        return False
+    # Restos de uma extração interrompida
+    conn.execute('DELETE FROM blob_texto_parte WHERE sha256 = ?', (sha256,))
+    conn.commit()
+
+    parts = 0
+    chunks = extraction.iter_text(blobs.blob_path(root, sha256), filename)
+    try:
+        for parts, text in enumerate(iter_parts(chunks), start=1):
+            conn.execute('INSERT INTO blob_texto_parte (sha256, parte, texto) VALUES (?, ?, ?)',
+                         (sha256, parts, text))
+            conn.commit()
+    finally:
+        # Encerra o pdftotext se a extração parar no meio
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    conn.execute('INSERT OR REPLACE INTO blob_texto (sha256, partes, extraido_em) VALUES (?, ?, ?)',
+                 (sha256, parts, datetime.now().isoformat()))
+    conn.commit()
+    return True
+
+
+def search_contents(conn, text, limit):
+    """
+    Conteúdos de materiais cujo texto contém todas as palavras buscadas
+    (como prefixos), do mais ao menos relevante: {sha256: (trecho, score)},
+    com o trecho da parte mais relevante de cada conteúdo.
+    """
+    match = search.prefix_query(text)
+    if match is None:
+        return {}
+    cursor = conn.execute(f'''
+        SELECT p.sha256, snippet(blob_texto_busca, 0, '**', '**', '…', {SNIPPET_WORDS}) AS snippet,
+               blob_texto_busca.rank AS score
+        FROM blob_texto_busca
+        JOIN blob_texto_parte p ON p.id = blob_texto_busca.rowid
+        WHERE blob_texto_busca MATCH ?
+          AND EXISTS (SELECT 1 FROM materials m WHERE m.sha256 = p.sha256)
+        ORDER BY blob_texto_busca.rank
+    ''', (match,))
+    hits = {}
+    # As linhas (e os trechos) são produzidas sob demanda: para assim que
+    # houver `limit` conteúdos distintos
+    for sha256, snippet, score in cursor:
+        if sha256 not in hits:
+            hits[sha256] = (snippet, score)
+            if len(hits) >= limit:
+                break
+    cursor.close()
+    return hits
+
+
+class ContentIndexer:
+    """
+    Fila de conteúdos a indexar, consumida por um único thread (as
+    gravações no SQLite são serializadas de qualquer forma). `enqueue` nunca
+    espera a extração.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='content-indexer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, root, sha256, filename):
+        """Agenda a indexação do conteúdo, se houver texto a extrair do seu formato."""
+        if not extraction.has_text(filename):
+            return
+        with self._lock:
+            if sha256 in self._pending:
+                return
+            self._pending.add(sha256)
+        self._queue.put((root, sha256, filename))
+        self.start()
+
+    def enqueue_missing(self, root):
+        """Agenda os materiais cujo conteúdo ainda não foi indexado. Retorna quantos."""
+        conn, _ = database.pool.acquire()
+        try:
+            rows = conn.execute('''
+                SELECT m.sha256, min(m.nome_arquivo) FROM materials m
+                WHERE m.sha256 IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM blob_texto t WHERE t.sha256 = m.sha256)
+                GROUP BY m.sha256
+            ''').fetchall()
+        finally:
+            database.pool.release(conn)
+        for sha256, filename in rows:
+            self.enqueue(root, sha256, filename or '')
+        return len(rows)
+
+    def join(self):
+        """Espera a fila esvaziar (usado pelo script de linha de comando)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            root, sha256, filename = self._queue.get()
+            try:
+                conn, _ = database.pool.acquire()
+                try:
+                    index_blob(conn, root, sha256, filename)
+                finally:
+                    database.pool.release(conn)
+            except Exception:
+                logger.exception('Falha ao indexar o texto de %s', sha256)
+            finally:
+                with self._lock:
+                    self._pending.discard(sha256)
+                self._queue.task_done()
+
+
+indexer = ContentIndexer()
+
+
+if __name__ == '__main__':
+    total = indexer.enqueue_missing('uploads')
+    indexer.join()
+    print(f'{total} arquivo(s) verificado(s) para o índice de busca.')
@@ -1,206 +1,181 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
 from flask import g
 
+import migrations
+
 # Define o caminho do banco de dados no diretório raiz do projeto
 DATABASE_FILE = "app_database.db"
 
+# Tamanho máximo do pool e tempo máximo (em segundos) que uma requisição
+# espera por uma conexão livre antes de falhar.
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+# PRAGMAs aplicados a cada conexão nova. O modo WAL permite que leitores
+# continuem enquanto um escritor grava; synchronous=NORMAL é seguro em WAL.
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('foreign_keys', 'ON'),
+    ('busy_timeout', 5000),
+    ('cache_size', -16000),     # ~16 MiB de cache de páginas
+    ('mmap_size', 268435456),   # 256 MiB mapeados em memória
+    ('temp_store', 'MEMORY'),
+)
+
+
+def _configure_connection(conn):
+    """Aplica os PRAGMAs padrão a uma conexão recém-aberta."""
+    for pragma, value in CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma} = {value}')
+
+
+def connect():
+    """
+    Abre uma nova conexão configurada com o banco de dados. Usada pelo pool
+    e por scripts que rodam fora de uma requisição (ex.: init_db).
+    """
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    _configure_connection(conn)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite pré-configuradas. As conexões são
+    criadas sob demanda até `max_size` e reaproveitadas entre requisições,
+    evitando o custo de abrir o arquivo e reler o esquema a cada chamada.
+    """
+
+    def __init__(self, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self):
+        """
+        Retorna uma conexão do pool e o tempo (em segundos) gasto esperando
+        por ela. Lança `TimeoutError` se nenhuma conexão ficar livre a tempo.
+        """
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError('Nenhuma conexão com o banco de dados disponível no pool.')
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn, waited
+
+    def release(self, conn):
+        """Devolve uma conexão ao pool, desfazendo qualquer transação pendente."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Conexão em estado inválido: descarta em vez de reaproveitar
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas (ex.: após resetar o banco)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Estatísticas de uso do pool, incluindo o tempo de espera acumulado."""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'open_connections': self._created,
+                'idle_connections': self._idle.qsize(),
+                'acquisitions': self._waits,
+                'wait_total_ms': round(self._wait_total * 1000, 3),
+                'wait_avg_ms': round(self._wait_total * 1000 / self._waits, 3) if self._waits else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+pool = ConnectionPool()
+
+
 def get_db():
     """
     Retorna uma conexão com o banco de dados. Se não existir no contexto da
-    aplicação (g), uma nova conexão é criada e armazenada lá.
+    aplicação (g), uma conexão é retirada do pool e armazenada lá.
     """
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE_FILE)
-        db.row_factory = sqlite3.Row
+        db, waited = pool.acquire()
+        g._database = db
+        g._db_pool_wait = waited
     return db
 
 def close_db(e=None):
-    """Fecha a conexão com o banco de dados se ela existir."""
+    """Devolve a conexão ao pool se ela existir."""
     db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        pool.release(db)
 
 def init_db():
     """
-    Inicializa o banco de dados. Cria as tabelas se elas ainda não existirem.
-    É seguro chamar esta função a cada inicialização do servidor.
+    Inicializa o banco de dados aplicando as migrações pendentes (ver
+    migrations.py). Quando o esquema já está na versão atual nenhum DDL é
+    executado, então é seguro e barato chamar esta função a cada
+    inicialização do servidor.
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-
-    # Tabela para os Materiais de Estudo (usando IF NOT EXISTS para segurança)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS materials (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        type TEXT,
-        tags TEXT,
-        url TEXT NOT NULL
-    )
-    ''')
-
-    # Tabela para as Disciplinas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS disciplina (
-        id TEXT PRIMARY KEY,
-        nome TEXT NOT NULL,
-        codigo TEXT,
-        descricao TEXT
-    )
-    ''')
-
-    # Tabela para as Turmas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS turma (
-        id TEXT PRIMARY KEY,
-        nome TEXT NOT NULL,
-        ano_semestre TEXT,
-        professor TEXT,
-        id_disciplina TEXT NOT NULL,
-        FOREIGN KEY (id_disciplina) REFERENCES disciplina(id)
-    )
-    ''')
-
-    # Tabela para os Alunos
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS aluno (
-        id TEXT PRIMARY KEY,
-        nome TEXT NOT NULL,
-        numero_chamada INTEGER,
-        data_nascimento TEXT,
-        situacao TEXT
-    )
-    ''')
-
-    # Tabela de associação para Matrículas (Alunos <-> Turmas)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS matricula (
-        id_aluno TEXT NOT NULL,
-        id_turma TEXT NOT NULL,
-        PRIMARY KEY (id_aluno, id_turma),
-        FOREIGN KEY (id_aluno) REFERENCES aluno(id),
-        FOREIGN KEY (id_turma) REFERENCES turma(id)
-    )
-    ''')
-
-    # Tabela para as Avaliações
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS avaliacao (
-        id TEXT PRIMARY KEY,
-        nome TEXT NOT NULL,
-        peso REAL NOT NULL,
-        nota_maxima REAL NOT NULL,
-        id_turma TEXT NOT NULL,
-        FOREIGN KEY (id_turma) REFERENCES turma(id)
-    )
-    ''')
-
-    # Tabela para as Notas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS nota (
-        id_aluno TEXT NOT NULL,
-        id_avaliacao TEXT NOT NULL,
-        valor REAL,
-        PRIMARY KEY (id_aluno, id_avaliacao),
-        FOREIGN KEY (id_aluno) REFERENCES aluno(id),
-        FOREIGN KEY (id_avaliacao) REFERENCES avaliacao(id)
-    )
-    ''')
-
-    # Tabela para Eventos do Calendário
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS evento (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        description TEXT,
-        start_datetime TEXT NOT NULL,
-        end_datetime TEXT,
-        recurrence_id TEXT,
-        reminders TEXT
-    )
-    ''')
-
-    # Tabela para Tarefas (To-Do List)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tarefa (
-        id TEXT PRIMARY KEY,
-        text TEXT NOT NULL,
-        completed INTEGER NOT NULL DEFAULT 0,
-        priority TEXT,
-        due_date TEXT
-    )
-    ''')
-
-    # Tabela para Planos de Aula
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS plano_de_aula (
-        id TEXT PRIMARY KEY,
-        title TEXT NOT NULL,
-        date TEXT,
-        objectives TEXT,
-        methodology TEXT,
-        resources TEXT,
-        created_at TEXT NOT NULL
-    )
-    ''')
-
-    # Tabela de associação: Planos de Aula <-> Turmas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS plano_aula_turma (
-        id_plano_aula TEXT NOT NULL,
-        id_turma TEXT NOT NULL,
-        PRIMARY KEY (id_plano_aula, id_turma),
-        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
-        FOREIGN KEY (id_turma) REFERENCES turma(id) ON DELETE CASCADE
-    )
-    ''')
-
-    # Tabela de associação: Planos de Aula <-> Materiais
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS plano_aula_material (
-        id_plano_aula TEXT NOT NULL,
-        id_material TEXT NOT NULL,
-        PRIMARY KEY (id_plano_aula, id_material),
-        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
-        FOREIGN KEY (id_material) REFERENCES materials(id) ON DELETE CASCADE
-    )
-    ''')
-
-    # Tabela de associação: Planos de Aula <-> Avaliações
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS plano_aula_avaliacao (
-        id_plano_aula TEXT NOT NULL,
-        id_avaliacao TEXT NOT NULL,
-        PRIMARY KEY (id_plano_aula, id_avaliacao),
-        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
-        FOREIGN KEY (id_avaliacao) REFERENCES avaliacao(id) ON DELETE CASCADE
-    )
-    ''')
-
-    # Tabela para o Banco de Questões
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS pergunta (
-        id TEXT PRIMARY KEY,
-        text TEXT NOT NULL,
-        subject TEXT,
-        difficulty TEXT,
-        options TEXT,
-        answer TEXT NOT NULL
-    )
-    ''')
-
-    # Tabela para Configurações da Aplicação (key-value store)
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS configuracoes (
-        key TEXT PRIMARY KEY,
-        value TEXT NOT NULL
-    )
-    ''')
-
-    conn.commit()
-    conn.close()
+    conn = connect()
+    try:
+        migrations.migrate(conn)
+    finally:
+        conn.close()
 
 if __name__ == '__main__':
     # Permite executar este script diretamente para inicializar o DB
@@ -0,0 +1,276 @@
+"""
+Exportação de boletins (notas e médias finais) em CSV ou XLSX.
+
+A exportação cobre uma turma, uma disciplina ou um `ano_semestre` inteiro e
+é gerada em streaming: as linhas de cada turma são lidas do cursor em lotes
+e escritas na resposta à medida que são produzidas, então a memória usada
+não depende da quantidade de turmas, alunos ou avaliações. No CSV cada
+turma forma um bloco com o seu próprio cabeçalho; no XLSX cada turma vira
+uma planilha.
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import gradebook
+
+FORMATS = ('csv', 'xlsx')
+
+MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Linhas lidas do cursor por vez
+FETCH_SIZE = 500
+
+_STUDENT_ROWS = '''
+    SELECT a.numero_chamada, a.nome,
+           json_group_object(n.id_avaliacao, n.valor) FILTER (WHERE n.valor IS NOT NULL) AS notas,
+           mt.soma_ponderada, mt.peso_total
+    FROM matricula m
+    JOIN aluno a ON a.id = m.id_aluno
+    LEFT JOIN media_aluno_turma mt ON mt.id_turma = m.id_turma AND mt.id_aluno = m.id_aluno
+    LEFT JOIN avaliacao av ON av.id_turma = m.id_turma
+    LEFT JOIN nota n ON n.id_aluno = m.id_aluno AND n.id_avaliacao = av.id
+    WHERE m.id_turma = ?
+    GROUP BY a.id
+    ORDER BY a.nome
+'''
+
+
+def select_turmas(conn, turma_id=None, disciplina_id=None, ano_semestre=None):
+    """Turmas incluídas na exportação, com o nome da disciplina."""
+    conditions, params = [], []
+    if turma_id:
+        conditions.append('t.id = ?')
+        params.append(turma_id)
+    if disciplina_id:
+        conditions.append('t.id_disciplina = ?')
+        params.append(disciplina_id)
+    if ano_semestre:
+        conditions.append('t.ano_semestre = ?')
+        params.append(ano_semestre)
+    query = '''
+        SELECT t.id, t.nome, t.ano_semestre, d.nome AS disciplina
+        FROM turma t
+        JOIN disciplina d ON d.id = t.id_disciplina
+    '''
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY t.ano_semestre, d.nome, t.nome'
+    return conn.execute(query, params).fetchall()
+
+
+def _format_grade(value):
+    return round(value, 2) if value is not None else None
+
+
+def iter_sections(conn, turmas):
+    """
+    Para cada turma, gera (turma, cabeçalho, linhas), em que `linhas` é um
+    iterador preguiçoso sobre as linhas dos alunos.
+    """
+    for turma in turmas:
+        avaliacoes = conn.execute(
+            'SELECT id, nome, peso FROM avaliacao WHERE id_turma = ? ORDER BY nome', (turma['id'],)
+        ).fetchall()
+        header = (['Nº', 'Aluno']
+                  + [f"{avaliacao['nome']} (peso {avaliacao['peso']:g})" for avaliacao in avaliacoes]
+                  + ['Média final'])
+        yield turma, header, _iter_student_rows(conn, turma['id'], [avaliacao['id'] for avaliacao in avaliacoes])
+
+
+def _iter_student_rows(conn, turma_id, avaliacao_ids):
+    cursor = conn.execute(_STUDENT_ROWS, (turma_id,))
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            notas = json.loads(row['notas']) if row['notas'] else {}
+            yield ([row['numero_chamada'], row['nome']]
+                   + [notas.get(avaliacao_id) for avaliacao_id in avaliacao_ids]
+                   + [_format_grade(gradebook.final_grade(row))])
+
+
+def _section_title(turma):
+    parts = [turma['disciplina'], turma['nome']]
+    if turma['ano_semestre']:
+        parts.append(turma['ano_semestre'])
+    return ' - '.join(parts)
+
+
+# --- CSV ---
+
+def generate_csv(conn, turmas):
+    """Gera o CSV em pedaços de texto, um bloco por turma."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que o Excel reconheça a codificação UTF-8
+    yield '\ufeff'
+    for index, (turma, header, rows) in enumerate(iter_sections(conn, turmas)):
+        if index:
+            writer.writerow([])
+        writer.writerow([_section_title(turma)])
+        writer.writerow(header)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(['' if value is None else value for value in row])
+            if count % FETCH_SIZE == 0:
+                yield _drain_text(buffer)
+        yield _drain_text(buffer)
+
+
+def _drain_text(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+# --- XLSX ---
+
+class _ChunkSink:
+    """
+    Destino de escrita sem `seek`/`tell` para o zipfile: os bytes escritos
+    ficam acumulados até serem entregues à resposta por `drain`. Sem
+    posicionamento, o zipfile grava os tamanhos em descritores após cada
+    arquivo, o que permite gerar o pacote em uma única passada.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def _sheet_name(turma, used):
+    """Nome de planilha válido (até 31 caracteres, sem repetição)."""
+    base = _INVALID_SHEET_CHARS.sub('-', f"{turma['nome']} {turma['ano_semestre'] or ''}").strip()[:31] or 'Turma'
+    name, suffix = base, 2
+    while name.lower() in used:
+        tail = f' ({suffix})'
+        name = base[:31 - len(tail)] + tail
+        suffix += 1
+    used.add(name.lower())
+    return name
+
+
+def generate_xlsx(conn, turmas):
+    """Gera o arquivo XLSX em pedaços de bytes, uma planilha por turma."""
+    sink = _ChunkSink()
+    sheet_names = []
+    used_names = set()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        for index, (turma, header, rows) in enumerate(iter_sections(conn, turmas), 1):
+            sheet_names.append(_sheet_name(turma, used_names))
+            with package.open(f'xl/worksheets/sheet{index}.xml', 'w') as sheet:
+                sheet.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    b'<sheetData>'
+                )
+                sheet.write((_row([_section_title(turma)]) + _row(header)).encode('utf-8'))
+                for count, row in enumerate(rows, 1):
+                    sheet.write(_row(row).encode('utf-8'))
+                    if count % FETCH_SIZE == 0:
+                        yield sink.drain()
+                sheet.write(b'</sheetData></worksheet>')
+            yield sink.drain()
+
+        # Os metadados do pacote dependem da lista de planilhas, então vão
+        # por último (a ordem dos arquivos dentro do zip é livre)
+        package.writestr('xl/workbook.xml', _workbook_xml(sheet_names))
+        package.writestr('xl/_rels/workbook.xml.rels', _workbook_rels(len(sheet_names)))
+        package.writestr('_rels/.rels', _PACKAGE_RELS)
+        package.writestr('[Content_Types].xml', _content_types(len(sheet_names)))
+    yield sink.drain()
+
+
+_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+
+def _workbook_xml(sheet_names):
+    sheets = ''.join(
+        f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{index}" r:id="rId{index}"/>'
+        for index, name in enumerate(sheet_names, 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets>{sheets}</sheets></workbook>'
+    )
+
+
+def _workbook_rels(sheet_count):
+    relationships = ''.join(
+        f'<Relationship Id="rId{index}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{index}.xml"/>'
+        for index in range(1, sheet_count + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'{relationships}</Relationships>'
+    )
+
+
+def _content_types(sheet_count):
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for index in range(1, sheet_count + 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        f'{overrides}</Types>'
+    )
+
+
+GENERATORS = {
+    'csv': generate_csv,
+    'xlsx': generate_xlsx,
+}
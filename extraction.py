@@ -0,0 +1,148 @@
+"""
+Extração incremental do texto dos arquivos dos materiais.
+
+`iter_text` gera o texto em pedaços, lendo o arquivo em blocos: texto puro
+passa por um decodificador incremental, HTML por um `HTMLParser` alimentado
+bloco a bloco (ignorando scripts e estilos) e PDF pela saída do
+`pdftotext` (poppler-utils), lida do pipe conforme é produzida. Nenhum
+formato é carregado inteiro na memória. Sem o `pdftotext` instalado, PDFs
+simplesmente não têm texto.
+"""
+import codecs
+import mimetypes
+import shutil
+import subprocess
+from html.parser import HTMLParser
+
+# Tamanho dos blocos lidos do arquivo
+READ_SIZE = 64 * 1024
+
+TEXT_EXTENSIONS = ('txt', 'md', 'csv', 'json', 'xml')
+HTML_EXTENSIONS = ('html', 'htm')
+PDF_EXTENSIONS = ('pdf',)
+
+
+def kind(filename):
+    """'text', 'html', 'pdf', 'image' ou None, pela extensão do nome do arquivo."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in HTML_EXTENSIONS:
+        return 'html'
+    if extension in TEXT_EXTENSIONS:
+        return 'text'
+    if extension in PDF_EXTENSIONS:
+        return 'pdf'
+    mimetype = mimetypes.guess_type(filename)[0] or ''
+    if mimetype.startswith('image/'):
+        return 'image'
+    if mimetype.startswith('text/'):
+        return 'text'
+    return None
+
+
+def has_text(filename):
+    """Se há como extrair o texto do arquivo (PDFs dependem do `pdftotext`)."""
+    extracted = kind(filename)
+    return extracted in ('text', 'html') or (extracted == 'pdf' and shutil.which('pdftotext') is not None)
+
+
+def _iter_plain(path):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(READ_SIZE), b''):
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+class _TextCollector(HTMLParser):
+    """Acumula o texto visível do HTML recebido até o momento."""
+
+    _SKIPPED = ('script', 'style', 'template', 'noscript')
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED:
+            self._skipping += 1
+        elif tag in ('p', 'br', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+    def take(self):
+        text, self.parts = ''.join(self.parts), []
+        return text
+
+
+def _iter_html(path):
+    collector = _TextCollector()
+    for block in _iter_plain(path):
+        collector.feed(block)
+        text = collector.take()
+        if text:
+            yield text
+    collector.close()
+    text = collector.take()
+    if text:
+        yield text
+
+
+def _iter_pdf(path):
+    executable = shutil.which('pdftotext')
+    if executable is None:
+        return
+    process = subprocess.Popen([executable, '-q', '-enc', 'UTF-8', path, '-'],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        for block in iter(lambda: process.stdout.read(READ_SIZE), b''):
+            text = decoder.decode(block)
+            if text:
+                yield text
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+_EXTRACTORS = {'text': _iter_plain, 'html': _iter_html, 'pdf': _iter_pdf}
+
+
+def iter_text(path, filename):
+    """Gera o texto do arquivo em pedaços (nada, se o formato não tiver texto extraível)."""
+    extractor = _EXTRACTORS.get(kind(filename))
+    return extractor(path) if extractor else iter(())
+
+
+def excerpt(path, filename, length):
+    """Os primeiros `length` caracteres do texto, com espaços simples; lê só o necessário."""
+    words = []
+    size = 0
+    pending = ''
+    for chunk in iter_text(path, filename):
+        text = pending + chunk
+        tokens = text.split()
+        # Uma palavra cortada no fim do pedaço continua no próximo
+        pending = tokens.pop() if tokens and not text[-1].isspace() else ''
+        for word in tokens:
+            words.append(word)
+            size += len(word) + 1
+            if size > length:
+                return ' '.join(words)[:length].rstrip() + '…'
+    if pending:
+        words.append(pending)
+    text = ' '.join(words)
+    return text if len(text) <= length else text[:length].rstrip() + '…'
@@ -0,0 +1,154 @@
+"""
+Estatísticas de distribuição das notas por avaliação e por turma.
+
+As notas de todas as avaliações pedidas vêm de uma única consulta, já
+ordenadas por avaliação e valor; cada grupo é resumido em uma passada
+(média, desvio padrão, percentis por interpolação linear e histograma
+normalizado pela nota máxima). Assim, calcular as estatísticas de dezenas
+de turmas custa uma consulta, e não uma por avaliação.
+"""
+import math
+from itertools import groupby
+
+# Percentis devolvidos em `percentis`
+PERCENTILES = (10, 25, 50, 75, 90)
+# Quantidade padrão de faixas do histograma
+HISTOGRAM_BUCKETS = 10
+
+
+def percentile(sorted_values, p):
+    """Percentil `p` (0-100) de uma lista ordenada, com interpolação linear."""
+    position = (len(sorted_values) - 1) * p / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def describe(sorted_values, nota_maxima, missing=0, buckets=HISTOGRAM_BUCKETS):
+    """
+    Resume uma lista de notas já ordenada. O histograma divide [0, 1] (nota
+    dividida por `nota_maxima`) em `buckets` faixas; a nota máxima entra na
+    última faixa.
+    """
+    count = len(sorted_values)
+    histogram = [0] * buckets
+    total = 0.0
+    for value in sorted_values:
+        total += value
+        if nota_maxima:
+            index = int(value / nota_maxima * buckets)
+            histogram[min(max(index, 0), buckets - 1)] += 1
+    mean = total / count if count else None
+    variance = sum((value - mean) ** 2 for value in sorted_values) / count if count else None
+
+    return {
+        'nota_maxima': nota_maxima,
+        'quantidade_notas': count,
+        'notas_faltantes': missing,
+        'media': mean,
+        'mediana': percentile(sorted_values, 50) if count else None,
+        'desvio_padrao': math.sqrt(variance) if count else None,
+        'minimo': sorted_values[0] if count else None,
+        'maximo': sorted_values[-1] if count else None,
+        'percentis': {f'p{p}': percentile(sorted_values, p) if count else None for p in PERCENTILES},
+        'histograma': [
+            {'inicio': index / buckets, 'fim': (index + 1) / buckets, 'quantidade': quantity}
+            for index, quantity in enumerate(histogram)
+        ]
+    }
+
+
+def _placeholders(values):
+    return ','.join('?' * len(values))
+
+
+def enrollment_counts(conn, turma_ids):
+    """Quantidade de alunos matriculados por turma."""
+    if not turma_ids:
+        return {}
+    rows = conn.execute(
+        f'SELECT id_turma, COUNT(*) FROM matricula WHERE id_turma IN ({_placeholders(turma_ids)}) GROUP BY id_turma',
+        list(turma_ids)
+    )
+    return dict(rows.fetchall())
+
+
+def evaluation_statistics(conn, avaliacoes, buckets=HISTOGRAM_BUCKETS):
+    """
+    Estatísticas de várias avaliações (linhas com id, id_turma e
+    nota_maxima). Só contam as notas de alunos matriculados na turma; os
+    matriculados sem nota entram em `notas_faltantes`. Retorna {id: resumo}.
+    """
+    if not avaliacoes:
+        return {}
+    by_id = {avaliacao['id']: avaliacao for avaliacao in avaliacoes}
+    enrolled = enrollment_counts(conn, {avaliacao['id_turma'] for avaliacao in avaliacoes})
+
+    cursor = conn.execute(f'''
+        SELECT n.id_avaliacao, n.valor
+        FROM nota n
+        JOIN avaliacao av ON av.id = n.id_avaliacao
+        JOIN matricula m ON m.id_aluno = n.id_aluno AND m.id_turma = av.id_turma
+        WHERE n.id_avaliacao IN ({_placeholders(by_id)}) AND n.valor IS NOT NULL
+        ORDER BY n.id_avaliacao, n.valor
+    ''', list(by_id))
+
+    statistics = {}
+    for avaliacao_id, rows in groupby(cursor, key=lambda row: row[0]):
+        values = [row[1] for row in rows]
+        avaliacao = by_id[avaliacao_id]
+        missing = enrolled.get(avaliacao['id_turma'], 0) - len(values)
+        statistics[avaliacao_id] = describe(values, avaliacao['nota_maxima'], missing, buckets)
+    # Avaliações ainda sem nenhuma nota
+    for avaliacao_id, avaliacao in by_id.items():
+        if avaliacao_id not in statistics:
+            statistics[avaliacao_id] = describe(
+                [], avaliacao['nota_maxima'], enrolled.get(avaliacao['id_turma'], 0), buckets)
+    return statistics
+
+
+def class_statistics(conn, turma_ids, buckets=HISTOGRAM_BUCKETS):
+    """
+    Estatísticas de várias turmas: as de cada avaliação e a distribuição das
+    médias finais (lidas de `media_aluno_turma`). A nota máxima das médias é
+    a média das notas máximas ponderada pelos pesos. Retorna {id: resumo}.
+    """
+    if not turma_ids:
+        return {}
+    turma_ids = list(turma_ids)
+    avaliacoes = conn.execute(
+        f'SELECT id, nome, peso, nota_maxima, id_turma FROM avaliacao '
+        f'WHERE id_turma IN ({_placeholders(turma_ids)}) ORDER BY id_turma, nome',
+        turma_ids
+    ).fetchall()
+    per_evaluation = evaluation_statistics(conn, avaliacoes, buckets)
+    enrolled = enrollment_counts(conn, turma_ids)
+
+    statistics = {
+        turma_id: {'id_turma': turma_id, 'alunos_matriculados': enrolled.get(turma_id, 0), 'avaliacoes': []}
+        for turma_id in turma_ids
+    }
+    weights = {}
+    for avaliacao in avaliacoes:
+        statistics[avaliacao['id_turma']]['avaliacoes'].append(
+            {'id_avaliacao': avaliacao['id'], 'nome': avaliacao['nome'], **per_evaluation[avaliacao['id']]}
+        )
+        weighted, total = weights.get(avaliacao['id_turma'], (0.0, 0.0))
+        weights[avaliacao['id_turma']] = (weighted + avaliacao['nota_maxima'] * avaliacao['peso'],
+                                          total + avaliacao['peso'])
+
+    cursor = conn.execute(f'''
+        SELECT mt.id_turma, mt.soma_ponderada / mt.peso_total AS media
+        FROM media_aluno_turma mt
+        JOIN matricula m ON m.id_aluno = mt.id_aluno AND m.id_turma = mt.id_turma
+        WHERE mt.id_turma IN ({_placeholders(turma_ids)}) AND mt.peso_total > 0
+        ORDER BY mt.id_turma, media
+    ''', turma_ids)
+    finals = {turma_id: [row[1] for row in rows] for turma_id, rows in groupby(cursor, key=lambda row: row[0])}
+
+    for turma_id, summary in statistics.items():
+        weighted, total = weights.get(turma_id, (0.0, 0.0))
+        values = finals.get(turma_id, [])
+        summary['media_final'] = describe(
+            values, weighted / total if total else None, summary['alunos_matriculados'] - len(values), buckets)
+    return statistics
@@ -0,0 +1,124 @@
+"""
+Agregados materializados das notas por (turma, aluno).
+
+A tabela `media_aluno_turma` guarda, para cada aluno em cada turma, a soma
+ponderada das notas, o peso total e a quantidade de notas lançadas, de modo
+que a média final (RN15: avaliações sem nota não entram no cálculo) é lida
+em O(linhas retornadas). Os agregados são atualizados de forma incremental,
+na mesma transação que altera `nota` ou `avaliacao`; `rebuild` recalcula
+tudo a partir das notas para verificar ou corrigir os valores.
+
+Uso pela linha de comando:
+    python gradebook.py                 # apenas verifica
+    python gradebook.py --reconstruir   # regenera a tabela
+"""
+import sys
+
+# Tolerância para diferenças de arredondamento acumuladas nas somas
+TOLERANCE = 1e-6
+
+_AGGREGATE_UPSERT = '''
+    ON CONFLICT (id_turma, id_aluno) DO UPDATE SET
+        soma_ponderada = soma_ponderada + excluded.soma_ponderada,
+        peso_total = peso_total + excluded.peso_total,
+        quantidade_notas = quantidade_notas + excluded.quantidade_notas
+'''
+
+_AGGREGATE_FROM_GRADES = '''
+    SELECT av.id_turma, n.id_aluno,
+           SUM(n.valor * av.peso), SUM(av.peso), COUNT(*)
+    FROM nota n
+    JOIN avaliacao av ON av.id = n.id_avaliacao
+    WHERE n.valor IS NOT NULL
+    GROUP BY av.id_turma, n.id_aluno
+'''
+
+
+def apply_evaluation_grades(conn, avaliacao_id, sign, aluno_ids=None):
+    """
+    Soma (sign=1) ou subtrai (sign=-1) dos agregados a contribuição das notas
+    atuais de uma avaliação, usando o peso atualmente gravado. Com
+    `aluno_ids`, considera apenas as notas desses alunos.
+
+    Para alterar notas ou o peso: subtraia antes da alteração e some depois,
+    dentro da mesma transação.
+    """
+    query = f'''
+        INSERT INTO media_aluno_turma (id_turma, id_aluno, soma_ponderada, peso_total, quantidade_notas)
+        SELECT av.id_turma, n.id_aluno, ? * n.valor * av.peso, ? * av.peso, ?
+        FROM nota n
+        JOIN avaliacao av ON av.id = n.id_avaliacao
+        WHERE n.id_avaliacao = ? AND n.valor IS NOT NULL
+    '''
+    params = [sign, sign, sign, avaliacao_id]
+    if aluno_ids is not None:
+        if not aluno_ids:
+            return
+        query += f" AND n.id_aluno IN ({','.join('?' * len(aluno_ids))})"
+        params += list(aluno_ids)
+    conn.execute(query + _AGGREGATE_UPSERT, params)
+
+    # Alunos sem nenhuma nota restante saem da tabela (evita resíduos de
+    # arredondamento em peso_total)
+    conn.execute('''
+        DELETE FROM media_aluno_turma
+        WHERE id_turma = (SELECT id_turma FROM avaliacao WHERE id = ?) AND quantidade_notas <= 0
+    ''', (avaliacao_id,))
+
+
+def final_grade(row):
+    """Média ponderada de uma linha de `media_aluno_turma`, ou None sem notas."""
+    if not row['peso_total']:
+        return None
+    return row['soma_ponderada'] / row['peso_total']
+
+
+def verify(conn):
+    """
+    Compara os agregados gravados com os recalculados a partir de `nota`.
+    Retorna a lista de divergências (vazia se tudo confere).
+    """
+    expected = {
+        (id_turma, id_aluno): (soma, peso, quantidade)
+        for id_turma, id_aluno, soma, peso, quantidade in conn.execute(_AGGREGATE_FROM_GRADES)
+    }
+    stored = {
+        (row[0], row[1]): (row[2], row[3], row[4])
+        for row in conn.execute(
+            'SELECT id_turma, id_aluno, soma_ponderada, peso_total, quantidade_notas FROM media_aluno_turma'
+        )
+    }
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None or want[2] != have[2] or any(
+                abs(a - b) > TOLERANCE for a, b in zip(want[:2], have[:2])):
+            mismatches.append({'id_turma': key[0], 'id_aluno': key[1], 'esperado': want, 'gravado': have})
+    return mismatches
+
+
+def rebuild(conn):
+    """Regenera todos os agregados a partir das notas. Não faz commit."""
+    conn.execute('DELETE FROM media_aluno_turma')
+    conn.execute(f'''
+        INSERT INTO media_aluno_turma (id_turma, id_aluno, soma_ponderada, peso_total, quantidade_notas)
+        {_AGGREGATE_FROM_GRADES}
+    ''')
+
+
+if __name__ == '__main__':
+    import database
+
+    conn = database.connect()
+    try:
+        mismatches = verify(conn)
+        print(f'{len(mismatches)} agregado(s) divergente(s).')
+        if '--reconstruir' in sys.argv:
+            rebuild(conn)
+            conn.commit()
+            print('Agregados reconstruídos a partir das notas.')
+        elif mismatches:
+            print("Execute 'python gradebook.py --reconstruir' para corrigi-los.")
+            sys.exit(1)
+    finally:
+        conn.close()
@@ -196,9 +196,10 @@ async function displayUpcomingEvents() { // ASYNC
         return;
     }
 
-    const allEvents = await window.eventService.getEvents(); // AWAIT
     const today = moment().startOf('day');
     const sevenDaysFromNow = moment().add(7, 'days').endOf('day');
+    // Only the next 7 days are needed, so let the server filter by range
+    const allEvents = await window.eventService.getEvents(today.format('YYYY-MM-DD'), sevenDaysFromNow.format('YYYY-MM-DD')); // AWAIT
 
     const upcomingEvents = allEvents
         .filter(event => moment(event.start_datetime).isBetween(today, sevenDaysFromNow, null, '[]'))
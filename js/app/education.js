@@ -1,51 +1,5 @@
 (function() {
     'use strict';
-    function parseCSV(content) {
-        const lines = content.split('\n').filter(line => line.trim() !== '');
-        if (lines.length < 1) return [];
-
-        // 1. Find the header row index by looking for keywords
-        let headerIndex = -1;
-        const headerKeywords = ['nº de chamada', 'nome do aluno', 'data de nascimento'];
-        for (let i = 0; i < lines.length; i++) {
-            const lowerLine = lines[i].toLowerCase();
-            if (headerKeywords.every(keyword => lowerLine.includes(keyword))) {
-                headerIndex = i;
-                break;
-            }
-        }
-        if (headerIndex === -1) return []; // Header not found
-
-        // 2. Detect delimiter from the header row
-        const headerLine = lines[headerIndex];
-        const delimiter = headerLine.includes(';') ? ';' : ',';
-
-        // 3. Normalize headers to be used as keys
-        const headers = headerLine.split(delimiter).map(h =>
-            h.trim().toLowerCase()
-             .replace(/nº de chamada/g, 'numero_chamada')
-             .replace(/nome do aluno/g, 'nome_do_aluno')
-             .replace(/data de nascimento/g, 'data_nascimento')
-             .replace(/situação do aluno/g, 'situacao')
-             .replace(/\s+/g, '_')
-        );
-
-        // 4. Parse data rows
-        const data = [];
-        for (let i = headerIndex + 1; i < lines.length; i++) {
-            const values = lines[i].split(delimiter).map(v => v.trim());
-            if (values.length < 2) continue; // Skip empty or invalid lines
-
-            const entry = {};
-            headers.forEach((header, index) => {
-                if (header) { // Only assign if header is not empty
-                    entry[header] = values[index] || '';
-                }
-            });
-            data.push(entry);
-        }
-        return data;
-    }
 
     // --- Inicialização da View de Disciplinas ---
     window.initSubjectsView = async function() {
@@ -360,60 +314,26 @@
         document.getElementById('view-class-report-btn').href = `#/class_report?classId=${classId}`;
 
         const importCsvInput = document.getElementById('import-students-csv');
-        importCsvInput.addEventListener('change', (event) => {
+        importCsvInput.addEventListener('change', async (event) => {
             const file = event.target.files[0];
             if (!file) {
                 return;
             }
 
-            const reader = new FileReader();
-            reader.onload = async (e) => {
-                const content = e.target.result;
-                const studentsData = parseCSV(content).map(student => {
-                    const dob = student.data_nascimento; // Use the new normalized header
-                    let formattedDob = '';
-                    if (dob) {
-                        // Handles dd/mm/yyyy
-                        const parts = dob.split('/');
-                        if (parts.length === 3) {
-                            formattedDob = `${parts[2]}-${parts[1]}-${parts[0]}`;
-                        }
-                    }
-
-                    return {
-                        nome: student.nome_do_aluno,
-                        numero_chamada: parseInt(student.numero_chamada, 10),
-                        data_nascimento: formattedDob,
-                        situacao: student.situacao || 'Ativo'
-                    };
-                });
-
-                if (studentsData.length === 0) {
-                    showToast('Arquivo CSV vazio ou em formato inválido.', 'error');
-                    return;
-                }
-
-                try {
-                    const result = await window.educationService.importStudentsToClass(classId, studentsData);
-                    showToast(result.message || `${result.success_count} aluno(s) importado(s) com sucesso.`);
-                    if (result.errors && result.errors.length > 0) {
-                        console.warn('Erros de importação:', result.errors);
-                    }
-                } catch (err) {
-                    showToast(`Erro ao importar alunos: ${err.message}`, 'error');
+            // O arquivo é enviado como está; o servidor lê o CSV em streaming
+            try {
+                const result = await window.educationService.importStudentsToClass(classId, file);
+                showToast(result.message || `${result.success_count} aluno(s) importado(s) com sucesso.`);
+                if (result.errors && result.errors.length > 0) {
+                    console.warn('Erros de importação:', result.errors);
                 }
+            } catch (err) {
+                showToast(`Erro ao importar alunos: ${err.message}`, 'error');
+            }
 
-                event.target.value = '';
-
-                await renderEnrolledStudents();
-            };
-
-            reader.onerror = () => {
-                showToast('Erro ao ler o arquivo.', 'error');
-                event.target.value = '';
-            };
+            event.target.value = '';
 
-            reader.readAsText(file, 'UTF-8');
+            await renderEnrolledStudents();
         });
     };
 
@@ -208,6 +208,16 @@
         return response.json();
     };
 
+    window.educationService.searchStudents = async function(query, limit = 20) {
+        const params = new URLSearchParams({ q: query, limit });
+        const response = await fetch(`/api/alunos?${params}`);
+        if (!response.ok) {
+            console.error('Erro ao buscar alunos.');
+            return [];
+        }
+        return response.json();
+    };
+
     window.educationService.addStudent = async function(studentData) {
         const response = await fetch('/api/alunos', {
             method: 'POST',
@@ -297,10 +307,12 @@
     };
 
     window.educationService.importStudentsToClass = async function(classId, studentsData) {
+        // Aceita um arquivo CSV (enviado sem conversão) ou uma lista de alunos
+        const isFile = studentsData instanceof Blob;
         const response = await fetch(`/api/turmas/${classId}/alunos/import`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(studentsData)
+            headers: { 'Content-Type': isFile ? 'text/csv; charset=utf-8' : 'application/json' },
+            body: isFile ? studentsData : JSON.stringify(studentsData)
         });
         if (!response.ok) {
             const error = await response.json();
@@ -399,47 +411,14 @@
     };
 
     window.educationService.calculateClassReport = async function(classId) {
-        // Esta função agora orquestra múltiplas chamadas de API.
-        const students = await this.getStudentsByClass(classId);
-        const evaluations = await this.getEvaluationsByClass(classId);
-
-        // Busca todas as notas de todas as avaliações em paralelo para eficiência.
-        const gradePromises = evaluations.map(e => this.getGradesByEvaluation(e.id));
-        const gradesByEvaluation = await Promise.all(gradePromises);
-
-        // Cria uma lista única com todas as notas para facilitar a busca.
-        const allGrades = gradesByEvaluation.flat();
-
-        const report = students.map(student => {
-            let totalWeightedGrade = 0;
-            let totalWeight = 0;
-            const studentGrades = {};
-
-            evaluations.forEach(evaluation => {
-                const gradeObj = allGrades.find(g => g.id_avaliacao === evaluation.id && g.id_aluno === student.id);
-                const grade = gradeObj ? parseFloat(gradeObj.valor) : null;
-
-                studentGrades[evaluation.id] = grade;
-
-                // RN15: Se não houver nota, não entra no cálculo
-                if (grade !== null) {
-                    const weight = parseFloat(evaluation.peso);
-                    totalWeightedGrade += grade * weight;
-                    totalWeight += weight;
-                }
-            });
-
-            const finalGrade = totalWeight > 0 ? (totalWeightedGrade / totalWeight).toFixed(2) : 'N/A';
-
-            return {
-                studentId: student.id,
-                studentName: student.name,
-                grades: studentGrades,
-                finalGrade: finalGrade
-            };
-        });
-
-        return { report, evaluations };
+        // O servidor monta a matriz de notas e calcula as médias ponderadas
+        // (RN15) em uma única consulta agregada.
+        const response = await fetch(`/api/turmas/${classId}/relatorio`);
+        if (!response.ok) {
+            console.error(`Erro ao buscar o relatório da turma ${classId}.`);
+            return { report: [], evaluations: [] };
+        }
+        return response.json();
     };
 
 })();
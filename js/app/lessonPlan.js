@@ -1,9 +1,15 @@
 (function() {
     'use strict';
 
+    // Trecho devolvido pela busca: os termos encontrados vêm entre **
+    function formatSnippet(snippet) {
+        const escaped = $('<div>').text(snippet).html();
+        return escaped.replace(/\*\*(.+?)\*\*/g, '<mark>$1</mark>');
+    }
+
     window.initLessonPlansView = async function() {
         const [lessonPlans, classes, subjects] = await Promise.all([
-            window.lessonPlanService.getLessonPlans(),
+            window.lessonPlanService.getLessonPlans({ summary: true }),
             window.educationService.getClasses(),
             window.educationService.getSubjects()
         ]);
@@ -29,7 +35,7 @@
                 const subjectNames = [...new Set(subjectIds.filter(Boolean).map(id => subjectMap[id]))].join(', ');
                 const row = `
                     <tr style="cursor: pointer;" onclick="window.location.hash='#/lesson-plans/details/${plan.id}'">
-                        <td>${plan.title}</td>
+                        <td>${plan.title}${plan.snippet ? `<br><small class="text-muted">${formatSnippet(plan.snippet)}</small>` : ''}</td>
                         <td>${subjectNames}</td>
                         <td>${new Date(plan.created_at).toLocaleDateString()}</td>
                         <td>
@@ -44,9 +50,23 @@
 
         renderList(lessonPlans);
 
-        classFilter.addEventListener('change', (e) => {
-            const selectedClassId = e.target.value;
-            renderList(selectedClassId === 'all' ? lessonPlans : lessonPlans.filter(p => (p.classIds || []).includes(selectedClassId)));
+        const searchInput = document.getElementById('lesson-plan-search');
+        let searchTimer = null;
+
+        const applyFilters = async () => {
+            const selectedClassId = classFilter.value === 'all' ? null : classFilter.value;
+            const query = searchInput.value.trim();
+            if (query) {
+                renderList(await window.lessonPlanService.searchLessonPlans(query, selectedClassId));
+            } else {
+                renderList(selectedClassId ? lessonPlans.filter(p => (p.classIds || []).includes(selectedClassId)) : lessonPlans);
+            }
+        };
+
+        classFilter.addEventListener('change', applyFilters);
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(applyFilters, 250);
         });
     };
 
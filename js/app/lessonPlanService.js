@@ -5,8 +5,9 @@
 
     // All lesson plan data is now managed by the backend API.
 
-    window.lessonPlanService.getLessonPlans = async function() {
-        const response = await fetch('/api/planos_de_aula');
+    window.lessonPlanService.getLessonPlans = async function({ summary = false } = {}) {
+        // O modo resumo omite objetivos, metodologia e recursos (telas de listagem)
+        const response = await fetch(summary ? '/api/planos_de_aula?resumo=1' : '/api/planos_de_aula');
         if (!response.ok) {
             console.error('Erro ao buscar planos de aula.');
             return [];
@@ -27,11 +28,26 @@
         if (!classId) {
             return this.getLessonPlans();
         }
-        // This filtering is now done on the client side after fetching all plans.
-        // For a large number of plans, a dedicated API endpoint would be better,
-        // e.g., /api/turmas/{classId}/planos_de_aula
-        const allPlans = await this.getLessonPlans();
-        return allPlans.filter(lp => lp.classIds.includes(classId));
+        const response = await fetch(`/api/planos_de_aula?turma=${encodeURIComponent(classId)}`);
+        if (!response.ok) {
+            console.error('Erro ao buscar planos de aula.');
+            return [];
+        }
+        return response.json();
+    };
+
+    window.lessonPlanService.searchLessonPlans = async function(query, classId) {
+        // Busca no servidor; cada plano vem com um trecho (`snippet`) destacado
+        const params = new URLSearchParams({ q: query });
+        if (classId) {
+            params.set('turma', classId);
+        }
+        const response = await fetch(`/api/planos_de_aula?${params}`);
+        if (!response.ok) {
+            console.error('Erro ao buscar planos de aula.');
+            return [];
+        }
+        return response.json();
     };
 
     window.lessonPlanService.addLessonPlan = async function(lessonPlanData) {
@@ -21,21 +21,95 @@
         return response.json();
     }
 
-    // The search can now be done on the server if desired, but for now we'll fetch all and filter client-side.
+    /**
+     * Searches titles, tags and the text of the uploaded files on the server.
+     * Content matches carry a `snippet` with the matched words between `**`.
+     * @param {string} query
+     * @returns {Promise<Object[]>}
+     */
     async function searchMaterials(query) {
-        const materials = await getMaterials();
-        if (!query) {
-            return materials;
+        if (!query || !query.trim()) {
+            return getMaterials();
+        }
+        const response = await fetch(`/api/materials?q=${encodeURIComponent(query)}`);
+        if (!response.ok) {
+            console.error("Erro ao buscar materiais.");
+            return [];
+        }
+        return response.json();
+    }
+
+    const MAX_CHUNK_RETRIES = 5;
+
+    function wait(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    /**
+     * Uploads a file in chunks through a resumable upload session. A failed chunk is
+     * retried from the offset the server reports, so a dropped connection only costs
+     * the chunk in flight.
+     * @param {File} file
+     * @param {{title?: string, tags?: string, onProgress?: function(number, number)}} [options]
+     * @returns {Promise<Object>} The created material.
+     */
+    async function uploadMaterial(file, options = {}) {
+        const created = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, title: options.title, tags: options.tags })
+        });
+        if (!created.ok) {
+            const error = await created.json();
+            throw new Error(error.error || 'Erro ao iniciar o envio.');
+        }
+        const session = await created.json();
+
+        let offset = session.offset;
+        let retries = 0;
+        while (true) {
+            const end = Math.min(offset + session.chunkSize, file.size);
+            let response;
+            try {
+                response = await fetch(`/api/uploads/${session.id}`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`
+                    },
+                    body: file.slice(offset, end)
+                });
+            } catch (networkError) {
+                response = null;
+            }
+
+            if (response && response.status === 201) {
+                if (options.onProgress) options.onProgress(file.size, file.size);
+                return response.json();
+            }
+            if (response && response.ok) {
+                offset = (await response.json()).offset;
+                retries = 0;
+                if (options.onProgress) options.onProgress(offset, file.size);
+                continue;
+            }
+
+            // Network failure or rejected chunk: ask the server where to resume
+            if (++retries > MAX_CHUNK_RETRIES) {
+                throw new Error('Erro ao enviar material: conexão instável.');
+            }
+            await wait(1000 * retries);
+            const status = await fetch(`/api/uploads/${session.id}`).catch(() => null);
+            if (status && status.ok) {
+                offset = (await status.json()).offset;
+            } else if (status && status.status === 404) {
+                throw new Error('A sessão de envio expirou.');
+            }
         }
-        const lowerCaseQuery = query.toLowerCase();
-        return materials.filter(material =>
-            material.title.toLowerCase().includes(lowerCaseQuery) ||
-            (material.tags && material.tags.some(tag => tag.toLowerCase().includes(lowerCaseQuery))) ||
-            (material.type && material.type.toLowerCase().includes(lowerCaseQuery))
-        );
     }
 
     window.materialService.getMaterials = getMaterials;
+    window.materialService.uploadMaterial = uploadMaterial;
     window.materialService.getMaterialById = getMaterialById;
     window.materialService.searchMaterials = searchMaterials;
     // Deprecate loadMaterials as getMaterials is now the primary async way to get data.
@@ -13,28 +13,61 @@
                 return;
             }
             materials.forEach(material => {
+                const previews = material.previews || {};
+                const thumbnail = previews.thumbnailUrl
+                    ? `<img src="${previews.thumbnailUrl}" alt="" class="pull-left" style="max-width: 64px; max-height: 64px; margin-right: 10px;">`
+                    : '';
+                // Search hits show where the words were found instead of the file's opening
+                const excerpt = material.snippet
+                    ? `<p class="text-muted small" style="margin: 5px 0 0;">${formatSnippet(material.snippet)}</p>`
+                    : previews.excerpt
+                        ? `<p class="text-muted small" style="margin: 5px 0 0;">${escapeHtml(previews.excerpt)}</p>`
+                        : '';
                 const item = `
-                    <li class="list-group-item">
+                    <li class="list-group-item clearfix">
+                        ${thumbnail}
                         ${material.title}
-                        <a href="${material.url}" target="_blank" class="btn btn-xs btn-primary pull-right">Visualizar</a>
+                        <a href="${material.contentUrl || material.url}" target="_blank" class="btn btn-xs btn-primary pull-right">Visualizar</a>
                         <span class="text-muted pull-right" style="margin-right: 10px;">${material.type}</span>
+                        ${excerpt}
                     </li>
                 `;
                 existingMaterialsList.innerHTML += item;
             });
         }
 
+        function escapeHtml(text) {
+            const element = document.createElement('div');
+            element.textContent = text;
+            return element.innerHTML;
+        }
+
+        function formatSnippet(snippet) {
+            return escapeHtml(snippet).replace(/\*\*(.+?)\*\*/g, '<mark>$1</mark>');
+        }
+
         let allMaterials = await window.materialService.getMaterials();
         renderMaterials(allMaterials);
 
+        // Searched on the server (titles, tags and file contents); waits for a
+        // pause in typing and ignores responses to outdated queries
+        let searchTimer = null;
+        let searchSequence = 0;
         searchInput.addEventListener('input', (e) => {
-            const query = e.target.value.toLowerCase();
-            const filteredMaterials = allMaterials.filter(material =>
-                material.title.toLowerCase().includes(query) ||
-                (material.tags && material.tags.some(tag => tag.toLowerCase().includes(query))) ||
-                (material.type && material.type.toLowerCase().includes(query))
-            );
-            renderMaterials(filteredMaterials);
+            const query = e.target.value.trim();
+            clearTimeout(searchTimer);
+            if (!query) {
+                searchSequence++;
+                renderMaterials(allMaterials);
+                return;
+            }
+            searchTimer = setTimeout(async () => {
+                const sequence = ++searchSequence;
+                const results = await window.materialService.searchMaterials(query);
+                if (sequence === searchSequence) {
+                    renderMaterials(results);
+                }
+            }, 250);
         });
 
         uploadForm.addEventListener('submit', async function(e) {
@@ -42,23 +75,18 @@
             const fileInput = document.getElementById('material-file');
             const titleInput = document.getElementById('material-title');
             const tagsInput = document.getElementById('material-tags');
-            const formData = new FormData();
 
             if (!fileInput.files[0]) {
                 alert("Por favor, selecione um arquivo.");
                 return;
             }
 
-            formData.append('file', fileInput.files[0]);
-            formData.append('title', titleInput.value);
-            formData.append('tags', tagsInput.value);
-
             try {
-                const response = await fetch('/upload', {
-                    method: 'POST',
-                    body: formData
+                // Sent in resumable chunks; identical files are stored only once
+                const result = await window.materialService.uploadMaterial(fileInput.files[0], {
+                    title: titleInput.value,
+                    tags: tagsInput.value
                 });
-                const result = await response.text();
                 console.log('Upload result:', result);
                 uploadForm.reset();
 
@@ -125,97 +125,39 @@
     requestNotificationPermission();
 
     /**
-     * Checks for pending event reminders and shows notifications if due.
+     * Subscribes to the reminders pushed by the server (Server-Sent Events).
+     * The server keeps the reminder schedule, so the browser no longer polls
+     * the event list; EventSource reconnects automatically if the connection drops.
      */
-    async function checkReminders() {
-        console.log('notificationService: Executando checkReminders...', new Date().toLocaleTimeString());
-        if (!window.eventService || typeof window.eventService.getEvents !== 'function') {
-            console.warn('eventService not available or not fully initialized for checking reminders.'); // Changed to warn and updated message
-            return; // Wait for next interval
-        }
-        if (!window.moment) {
-            console.error('moment.js is not available for date calculations.');
-            return; // moment.js is crucial for date/time manipulation here
-        }
-
-        const allEvents = await window.eventService.getEvents();
-        const now = new Date();
-
-        if (!Array.isArray(allEvents)) {
-            console.warn('checkReminders: getEvents() did not return an array, skipping check.');
+    function listenForReminders() {
+        if (!("EventSource" in window)) {
+            console.error("This browser does not support Server-Sent Events; reminders are disabled.");
             return;
         }
 
-        allEvents.forEach(event => {
-            if (!event.reminders || !Array.isArray(event.reminders)) {
-                return; // Skip if no reminders or reminders is not an array
-            }
-
-            let eventModified = false; // Flag to track if event needs updating
-
-            event.reminders.forEach(reminder => {
-                if (reminder.shown) {
-                    return; // Skip if reminder already shown
-                }
-
-                if (!event.date || !event.startTime) {
-                    // console.warn(`Event "${event.title}" (ID: ${event.id}) is missing date or startTime, cannot process reminder.`);
-                    return; // Skip if event date or time is missing
-                }
-
-                try {
-                    const eventDateTimeString = `${event.date} ${event.startTime}`;
-                    const eventMoment = moment(eventDateTimeString, 'YYYY-MM-DD HH:mm');
-
-                    if (!eventMoment.isValid()) {
-                        // console.warn(`Invalid date/time for event "${event.title}" (ID: ${event.id}): ${eventDateTimeString}`);
-                        return;
-                    }
-                    
-                    // Calculate reminder time using moment.js
-                    // moment.subtract mutates the original moment object, so clone it first.
-                    const reminderTime = eventMoment.clone().subtract(reminder.value, reminder.unit).toDate();
-
-                    // console.log(`Event: ${event.title}, Reminder: ${reminder.value} ${reminder.unit} before. Calculated time: ${reminderTime}, Current time: ${now}`);
-                    const calculatedReminderTime = reminderTime; // Alias for clarity in log
-
-                    if (now >= calculatedReminderTime) {
-                        console.log('notificationService: Disparando lembrete para evento:', event.title, 'Lembrete ID:', reminder.id, 'Horário calculado:', calculatedReminderTime.toLocaleString());
-                        showEventNotification(
-                            event.title,
-                            event.startTime,
-                            event.category,
-                            event.id.toString(), // Ensure ID is string for tag
-                            reminder.id.toString() // Ensure ID is string for tag
-                        );
-                        reminder.shown = true;
-                        eventModified = true;
-                        console.log('notificationService: Marcando lembrete como mostrado e atualizando evento:', event.id, 'Lembrete ID:', reminder.id);
-                    }
-                } catch (e) {
-                    console.error(`Error processing reminder for event "${event.title}" (ID: ${event.id}):`, e);
-                }
-            });
-
-            if (eventModified) {
-                if (window.eventService.updateEvent) {
-                    window.eventService.updateEvent(event);
-                    // console.log(`Event "${event.title}" (ID: ${event.id}) updated in localStorage with shown reminders.`);
-                } else {
-                    console.error('eventService.updateEvent is not available to save reminder status.');
-                }
+        const source = new EventSource('/api/lembretes/stream');
+
+        source.addEventListener('reminder', (message) => {
+            try {
+                const reminder = JSON.parse(message.data);
+                console.log('notificationService: Lembrete recebido do servidor:', reminder.title, 'Minutos antes:', reminder.minutes_before);
+                showEventNotification(
+                    reminder.title,
+                    reminder.start_datetime.substring(11, 16), // HH:MM
+                    null,
+                    String(reminder.event_id),
+                    String(reminder.minutes_before)
+                );
+            } catch (e) {
+                console.error('Error processing reminder pushed by the server:', e);
             }
         });
-    }
 
-    // Start the reminder checking loop
-    // For a real application, consider if the loop should run if notifications are denied.
-    // For this exercise, we'll start it regardless, as showEventNotification checks permission.
-    const REMINDER_CHECK_INTERVAL = 30000; // 30 seconds for more responsive testing, 60000 for 1 minute in production
-    setInterval(checkReminders, REMINDER_CHECK_INTERVAL);
-    console.log(`Reminder check loop started. Interval: ${REMINDER_CHECK_INTERVAL / 1000} seconds.`);
+        source.onerror = () => {
+            console.warn('notificationService: Conexão de lembretes interrompida, tentando reconectar...');
+        };
+    }
 
-    // Optionally, run once on load after a short delay to catch immediate reminders
-    setTimeout(checkReminders, 2000); // Run after 2 seconds
+    listenForReminders();
 
 })(window);
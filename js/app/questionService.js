@@ -74,6 +74,65 @@ const questionService = (() => {
         }
     }
 
+    /**
+     * Imports a question bank file (JSON lines, CSV or GIFT) in one request.
+     * The file is streamed as-is; the format comes from its extension.
+     * @param {File} file
+     * @returns {Promise<{created_count: number, error_count: number, errors: string[]}>}
+     */
+    async function importQuestions(file) {
+        const extension = file.name.split('.').pop().toLowerCase();
+        const formato = { jsonl: 'jsonl', ndjson: 'jsonl', csv: 'csv', gift: 'gift', txt: 'gift' }[extension];
+        if (!formato) {
+            throw new Error('Formato de arquivo não suportado (use .jsonl, .csv ou .gift).');
+        }
+        const response = await fetch(`/api/perguntas/import?formato=${formato}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: file
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Erro ao importar perguntas.');
+        }
+        return response.json();
+    }
+
+    /**
+     * Near-duplicates of a question (Jaccard similarity >= threshold), most similar first.
+     * @param {string} id
+     * @param {number} [threshold] - 0-1; the server default is used when omitted.
+     */
+    async function getSimilarQuestions(id, threshold) {
+        const url = new URL(`/api/perguntas/${id}/similares`, window.location.origin);
+        if (threshold) {
+            url.searchParams.append('limiar', threshold);
+        }
+        const response = await fetch(url);
+        if (!response.ok) {
+            if (response.status === 404) return [];
+            throw new Error('Erro ao buscar perguntas semelhantes.');
+        }
+        return response.json();
+    }
+
+    /**
+     * Groups of near-duplicate questions across the whole bank.
+     * @param {number} [threshold]
+     * @returns {Promise<Array<{questions: Array<Object>, pairs: Array<Object>}>>}
+     */
+    async function getDuplicateReport(threshold) {
+        const url = new URL('/api/perguntas/duplicadas', window.location.origin);
+        if (threshold) {
+            url.searchParams.append('limiar', threshold);
+        }
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error('Erro ao gerar o relatório de duplicatas.');
+        }
+        return response.json();
+    }
+
     // Public API
     return {
         addQuestion,
@@ -81,6 +140,9 @@ const questionService = (() => {
         getQuestionById,
         getAllSubjects,
         updateQuestion,
-        deleteQuestion
+        deleteQuestion,
+        importQuestions,
+        getSimilarQuestions,
+        getDuplicateReport
     };
 })();
@@ -10,8 +10,8 @@ const quizService = (() => {
 
     /**
      * Generates a new quiz based on the provided configuration.
-     * This is now an async function as it depends on the async questionService.
-     * @param {object} config - Quiz configuration { numQuestions, subject, difficulty }
+     * The questions are sampled on the server (POST /api/quizzes).
+     * @param {object} config - Quiz configuration { numQuestions, subject, difficulty, seed? }
      * @returns {Promise<Array<Question>>} A promise that resolves to an array of questions for the quiz.
      */
     async function generateQuiz(config) {
@@ -20,27 +20,26 @@ const quizService = (() => {
         currentQuiz.userAnswers = [];
         currentQuiz.score = 0;
 
-        const filters = {};
-        if (config.subject) {
-            filters.subject = config.subject;
+        // Questions are sampled server-side; only the chosen ones are returned
+        const numQuestions = parseInt(config.numQuestions, 10);
+        const response = await fetch('/api/quizzes', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                numQuestions: isNaN(numQuestions) || numQuestions <= 0 ? null : numQuestions, // null: all
+                subject: config.subject || null,
+                difficulty: config.difficulty || null,
+                seed: config.seed
+            })
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Erro ao gerar o quiz.');
         }
-        if (config.difficulty) {
-            filters.difficulty = config.difficulty;
-        }
-
-        // questionService.getQuestions is now async
-        let availableQuestions = await questionService.getQuestions(filters);
-
-        // Shuffle available questions to get a random selection
-        let shuffledQuestions = availableQuestions.sort(() => 0.5 - Math.random());
+        const quiz = await response.json();
 
-        // Select the desired number of questions
-        let numToSelect = parseInt(config.numQuestions, 10);
-        if (isNaN(numToSelect) || numToSelect <= 0) {
-            numToSelect = shuffledQuestions.length; // Default to all if invalid number
-        }
-        
-        currentQuiz.questions = shuffledQuestions.slice(0, numToSelect);
+        currentQuiz.config = { ...config, seed: quiz.seed };
+        currentQuiz.questions = quiz.questions;
         currentQuiz.userAnswers = new Array(currentQuiz.questions.length).fill(null); // Initialize answers array
 
         return [...currentQuiz.questions]; // Return a copy
@@ -113,6 +112,19 @@ const quizService = (() => {
         currentQuiz.detailedResults = detailedResults; 
 
         console.log("Quiz enviado. Pontuação:", currentQuiz.score, "/", currentQuiz.questions.length);
+
+        // Record the attempt so the per-question statistics stay up to date; the local result does not wait for it
+        fetch('/api/quizzes/tentativas', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                seed: currentQuiz.config ? currentQuiz.config.seed : null,
+                answers: currentQuiz.questions.map((question, i) => ({
+                    questionId: question.id,
+                    answer: currentQuiz.userAnswers[i]
+                }))
+            })
+        }).catch(error => console.error("Erro ao registrar a tentativa:", error));
         
         return {
             score: currentQuiz.score,
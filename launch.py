@@ -1,17 +1,47 @@
+import base64
+import io
 import os
-from flask import Flask, request, Response, send_from_directory, jsonify
+from flask import Flask, request, Response, send_file, send_from_directory, jsonify, g, redirect
 from openai import OpenAI
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import secure_filename
 import sys
 import json
+import mimetypes
+import queue
 import uuid
+from urllib.parse import quote
+import blobs
+import content_index
 import database as db
-from datetime import date, timedelta, datetime
+import exports
+import grade_stats
+import gradebook
+import previews
+import question_bank
+import quizzes
+import readers
+import recurrence
+import reminders
+import roster
+import search
+import similarity
+from datetime import date, timedelta, datetime, timezone
 
 # Configuração do Flask
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Entrega dos arquivos dos materiais: '' (o próprio Flask, com sendfile
+# quando o servidor WSGI oferece wsgi.file_wrapper), 'x-accel' (nginx, com
+# um location interno apontando para UPLOAD_FOLDER) ou 'x-sendfile'
+# (Apache/lighttpd)
+MATERIALS_OFFLOAD = os.environ.get('MATERIALS_OFFLOAD', '')
+MATERIALS_ACCEL_PREFIX = os.environ.get('MATERIALS_ACCEL_PREFIX', '/_uploads/')
+# Cache de um ano para as URLs versionadas pelo hash do conteúdo
+MATERIAL_CACHE_MAX_AGE = 365 * 24 * 3600
+
 app = Flask(__name__, static_folder='.', static_url_path='')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
@@ -19,10 +49,42 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 def close_connection(exception):
     db.close_db(exception)
 
+@app.after_request
+def add_db_timing_header(response):
+    # Expõe o tempo de espera por uma conexão do pool (visível no DevTools)
+    waited = getattr(g, '_db_pool_wait', None)
+    if waited is not None:
+        response.headers.add('Server-Timing', f'db-pool;dur={waited * 1000:.3f}')
+    return response
+
 @app.route('/')
 def serve_index():
     return send_from_directory('.', 'index.html')
 
+def _public_row(row):
+    """Helper to convert a row to a dict without the internal integer key (chave) of the indexed tables."""
+    row_dict = dict(row)
+    row_dict.pop('chave', None)
+    return row_dict
+
+def _client_filename(name):
+    """Helper to keep only the base name of a client-supplied filename (it is metadata, not a path)."""
+    return os.path.basename(str(name).replace('\\', '/')).strip() or 'arquivo'
+
+def _create_material(conn, title, filename, tags, sha256, size):
+    """Helper to insert a material pointing at a stored blob (no commit)."""
+    material_id = f'mat_{uuid.uuid4().hex}'
+    file_type = filename.split('.')[-1] if '.' in filename else ''
+    # Converte a lista de tags em uma string separada por vírgulas
+    tags_list = [tag.strip() for tag in (tags or '').split(',') if tag.strip()]
+    conn.execute(
+        'INSERT INTO materials (id, title, type, tags, url, sha256, tamanho, nome_arquivo) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (material_id, title or filename, file_type, ','.join(tags_list),
+         blobs.blob_url(app.config['UPLOAD_FOLDER'], sha256), sha256, size, filename)
+    )
+    return material_id
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -31,33 +93,112 @@ def upload_file():
     if file.filename == '':
         return 'No selected file', 400
     if file:
-        filename = file.filename
-        # Salva o arquivo no diretório de uploads
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-
-        # Salva os metadados no banco de dados
+        filename = _client_filename(file.filename)
         conn = db.get_db()
+        # O arquivo é gravado pelo hash do conteúdo: nomes iguais não se
+        # sobrescrevem e arquivos idênticos são guardados uma vez só
+        sha256, size = blobs.store_stream(conn, app.config['UPLOAD_FOLDER'], file.stream)
+        _create_material(conn, request.form.get('title'), filename, request.form.get('tags'), sha256, size)
+        conn.commit()
+        previews.enqueue(app.config['UPLOAD_FOLDER'], sha256, filename)
+        content_index.indexer.enqueue(app.config['UPLOAD_FOLDER'], sha256, filename)
 
-        # Gera um ID único para o material
-        material_id = f'mat_{uuid.uuid4().hex}'
+        return 'File uploaded successfully', 200
 
-        # Coleta os outros dados do formulário
-        title = request.form.get('title', filename)
-        file_type = filename.split('.')[-1] if '.' in filename else ''
-        # Converte a lista de tags em uma string separada por vírgulas
-        tags_list = [tag.strip() for tag in request.form.get('tags', '').split(',') if tag.strip()]
-        tags_str = ','.join(tags_list)
+# --- Uploads em partes (retomáveis) ---
 
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO materials (id, title, type, tags, url) VALUES (?, ?, ?, ?, ?)',
-            (material_id, title, file_type, tags_str, file_path)
-        )
+def _upload_session_response(session):
+    return {'id': session['id'], 'offset': session['recebido'], 'size': session['tamanho'],
+            'chunkSize': blobs.CHUNK_SIZE}
 
-        conn.commit()
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('filename'):
+        return jsonify({'error': 'O campo "filename" é obrigatório.'}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        size = -1
+    if size < 0:
+        return jsonify({'error': 'O campo "size" deve ser o tamanho do arquivo em bytes.'}), 400
 
-        return 'File uploaded successfully', 200
+    conn = db.get_db()
+    filename = _client_filename(data['filename'])
+    session_id = blobs.create_session(conn, app.config['UPLOAD_FOLDER'], filename, size,
+                                      data.get('title'), data.get('tags'))
+    session = conn.execute('SELECT * FROM upload_sessao WHERE id = ?', (session_id,)).fetchone()
+    return jsonify(_upload_session_response(session)), 201
+
+@app.route('/api/uploads/<string:upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    # The client asks where to resume after a dropped connection
+    conn = db.get_db()
+    session = conn.execute('SELECT * FROM upload_sessao WHERE id = ?', (upload_id,)).fetchone()
+    if session is None:
+        return jsonify({'error': 'Sessão de upload não encontrada.'}), 404
+    return jsonify(_upload_session_response(session))
+
+@app.route('/api/uploads/<string:upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    # Each chunk carries "Content-Range: bytes <start>-<end>/<total>" and is
+    # streamed to the partial file; the last one creates the material
+    conn = db.get_db()
+    session = conn.execute('SELECT * FROM upload_sessao WHERE id = ?', (upload_id,)).fetchone()
+    if session is None:
+        return jsonify({'error': 'Sessão de upload não encontrada.'}), 404
+
+    content_range = request.headers.get('Content-Range', '')
+    try:
+        unit, _, byte_range = content_range.partition(' ')
+        span, _, total = byte_range.partition('/')
+        start, _, end = span.partition('-')
+        start, end = int(start), int(end)
+        if unit != 'bytes' or end < start or (total not in ('*', '') and int(total) != session['tamanho']):
+            raise ValueError
+    except ValueError:
+        # Parte vazia de um arquivo de 0 bytes
+        if session['tamanho'] == 0 and not request.content_length:
+            start, end = 0, -1
+        else:
+            return jsonify({'error': 'Cabeçalho Content-Range inválido.', 'offset': session['recebido']}), 400
+    length = end - start + 1
+    if request.content_length is not None and request.content_length != length:
+        return jsonify({'error': 'O tamanho da parte não confere com o Content-Range.',
+                        'offset': session['recebido']}), 400
+
+    try:
+        received, stored = blobs.append_chunk(conn, app.config['UPLOAD_FOLDER'], session, start,
+                                              request.stream, length)
+    except blobs.UploadError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), e.status
+    if stored is None:
+        return jsonify({'id': upload_id, 'offset': received, 'size': session['tamanho']})
+
+    sha256, size = stored
+    material_id = _create_material(conn, session['title'], session['nome_arquivo'], session['tags'], sha256, size)
+    conn.commit()
+    # Thumbnails, excerpts and the search index are built in the background;
+    # the response does not wait
+    previews.enqueue(app.config['UPLOAD_FOLDER'], sha256, session['nome_arquivo'])
+    content_index.indexer.enqueue(app.config['UPLOAD_FOLDER'], sha256, session['nome_arquivo'])
+    material = conn.execute('SELECT * FROM materials WHERE id = ?', (material_id,)).fetchone()
+    return jsonify(_public_row(material)), 201
+
+@app.route('/api/uploads/<string:upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    conn = db.get_db()
+    blobs.delete_session(conn, app.config['UPLOAD_FOLDER'], upload_id)
+    return '', 204
+
+def _content_version(sha256):
+    return sha256[:16]
+
+def _material_content_url(material):
+    """Helper for the download URL; versioned by the content hash so it can be cached for good."""
+    if not material['sha256']:
+        return material['url']
+    return f"/api/materials/{material['id']}/conteudo?v={_content_version(material['sha256'])}"
 
 @app.route('/api/materials/<string:material_id>')
 def get_material(material_id):
@@ -65,24 +206,117 @@ def get_material(material_id):
     material = conn.execute('SELECT * FROM materials WHERE id = ?', (material_id,)).fetchone()
     if material is None:
         return jsonify({'error': 'Material não encontrado'}), 404
-    return jsonify(dict(material))
+    return jsonify({**_public_row(material), 'contentUrl': _material_content_url(material)})
+
+@app.route('/api/materials/<string:material_id>/conteudo')
+def get_material_content(material_id):
+    conn = db.get_db()
+    material = conn.execute('SELECT * FROM materials WHERE id = ?', (material_id,)).fetchone()
+    if material is None:
+        return jsonify({'error': 'Material não encontrado'}), 404
+    if not material['sha256']:
+        # Materials registered as external links
+        if material['url'].startswith(('http://', 'https://')):
+            return redirect(material['url'])
+        return jsonify({'error': 'Arquivo do material não encontrado'}), 404
+    path = os.path.abspath(blobs.blob_path(app.config['UPLOAD_FOLDER'], material['sha256']))
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Arquivo do material não encontrado'}), 404
+
+    # The blob never changes, so the hash is a strong ETag. URLs carrying the
+    # hash (?v=) are cached for a year; plain ones are revalidated (304)
+    sha256 = material['sha256']
+    # Only the exact version _material_content_url emits gets the long-lived cache
+    versioned = request.args.get('v') == _content_version(sha256)
+    filename = material['nome_arquivo'] or material['title']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if MATERIALS_OFFLOAD in ('x-accel', 'x-sendfile'):
+        last_modified = datetime.fromtimestamp(int(os.path.getmtime(path)), timezone.utc)
+        if not is_resource_modified(request.environ, etag=sha256, last_modified=last_modified):
+            response = Response(status=304)
+        else:
+            # The front server streams the file (and handles Range) itself
+            response = Response(mimetype=mimetype)
+            if MATERIALS_OFFLOAD == 'x-accel':
+                relative = os.path.relpath(path, os.path.abspath(app.config['UPLOAD_FOLDER']))
+                response.headers['X-Accel-Redirect'] = MATERIALS_ACCEL_PREFIX + relative.replace(os.sep, '/')
+            else:
+                response.headers['X-Sendfile'] = path
+            response.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+        response.set_etag(sha256)
+        response.last_modified = last_modified
+    else:
+        # send_file answers If-None-Match/If-Modified-Since and Range requests;
+        # full responses go through wsgi.file_wrapper (sendfile) when available
+        response = send_file(path, mimetype=mimetype, download_name=filename, conditional=True, etag=sha256)
+
+    if versioned:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = MATERIAL_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def _material_response(row):
+    material_dict = _public_row(row)
+    # Converte a string de tags de volta para uma lista para o frontend
+    if material_dict.get('tags'):
+        material_dict['tags'] = [tag.strip() for tag in material_dict['tags'].split(',')]
+    else:
+        material_dict['tags'] = []
+    material_dict['contentUrl'] = _material_content_url(row)
+    material_dict['previews'] = (previews.previews_for(app.config['UPLOAD_FOLDER'], row['sha256'])
+                                 if row['sha256'] else {'thumbnailUrl': None, 'excerpt': None})
+    return material_dict
+
+def _search_materials(conn, text, limit):
+    """
+    Helper for ?q=: materials whose title, tags or type match every word
+    (as prefixes) come first, then materials whose file contents match,
+    each group ranked by its full-text index. Content hits carry a
+    highlighted snippet.
+    """
+    match = search.prefix_query(text)
+    if match is None:
+        return []
+    by_metadata = conn.execute('''
+        SELECT m.* FROM materials_busca
+        JOIN materials m ON m.chave = materials_busca.rowid
+        WHERE materials_busca MATCH ?
+        ORDER BY bm25(materials_busca, 10.0, 5.0, 1.0), m.title
+        LIMIT ?
+    ''', (match, limit)).fetchall()
+    hits = content_index.search_contents(conn, text, limit)
+    matched = {row['id'] for row in by_metadata}
+    by_content = conn.execute(
+        'SELECT * FROM materials WHERE sha256 IN (SELECT value FROM json_each(?))', (json.dumps(list(hits)),)
+    ).fetchall()
+    by_content = sorted((row for row in by_content if row['id'] not in matched),
+                        key=lambda row: (hits[row['sha256']][1], row['title'] or ''))
+
+    results = []
+    for row in (by_metadata + by_content)[:limit]:
+        material = _material_response(row)
+        hit = hits.get(row['sha256'])
+        material['snippet'] = hit[0] if hit else None
+        results.append(material)
+    return results
 
 @app.route('/api/materials')
 def get_materials():
+    # ?q= searches titles, tags and the text extracted from the files
     conn = db.get_db()
-    materials_rows = conn.execute('SELECT * FROM materials ORDER BY title').fetchall()
-
-    materials = []
-    for row in materials_rows:
-        material_dict = dict(row)
-        # Converte a string de tags de volta para uma lista para o frontend
-        if material_dict.get('tags'):
-            material_dict['tags'] = [tag.strip() for tag in material_dict['tags'].split(',')]
-        else:
-            material_dict['tags'] = []
-        materials.append(material_dict)
+    if 'q' in request.args:
+        limit = search.parse_limit(request.args.get('limit'))
+        if limit is None:
+            return jsonify({'error': f'O parâmetro limit deve ser um inteiro entre 1 e {search.MAX_LIMIT}.'}), 400
+        return jsonify(_search_materials(conn, request.args['q'], limit))
 
-    return jsonify(materials)
+    materials_rows = conn.execute('SELECT * FROM materials ORDER BY title').fetchall()
+    return jsonify([_material_response(row) for row in materials_rows])
 
 # --- API para Disciplinas ---
 
@@ -158,8 +392,12 @@ def delete_disciplina(disciplina_id):
     if disciplina is None:
         return jsonify({'error': 'Disciplina não encontrada'}), 404
 
-    conn.execute('DELETE FROM disciplina WHERE id = ?', (disciplina_id,))
-    conn.commit()
+    try:
+        conn.execute('DELETE FROM disciplina WHERE id = ?', (disciplina_id,))
+        conn.commit()
+    except conn.IntegrityError:
+        conn.rollback()
+        return jsonify({'error': 'Esta disciplina possui turmas vinculadas e não pode ser excluída.'}), 400
 
     return '', 204
 
@@ -260,8 +498,12 @@ def delete_turma(turma_id):
     if turma is None:
         return jsonify({'error': 'Turma não encontrada'}), 404
 
-    conn.execute('DELETE FROM turma WHERE id = ?', (turma_id,))
-    conn.commit()
+    try:
+        conn.execute('DELETE FROM turma WHERE id = ?', (turma_id,))
+        conn.commit()
+    except conn.IntegrityError:
+        conn.rollback()
+        return jsonify({'error': 'Esta turma possui alunos matriculados ou avaliações e não pode ser excluída.'}), 400
 
     return '', 204
 
@@ -271,9 +513,26 @@ def delete_turma(turma_id):
 @app.route('/api/alunos', methods=['GET'])
 def get_alunos():
     conn = db.get_db()
-    alunos_rows = conn.execute('SELECT * FROM aluno ORDER BY nome').fetchall()
-    alunos = [dict(row) for row in alunos_rows]
-    return jsonify(alunos)
+    if 'q' not in request.args:
+        alunos_rows = conn.execute('SELECT * FROM aluno ORDER BY nome').fetchall()
+        return jsonify([_public_row(row) for row in alunos_rows])
+
+    # Busca por prefixo (sem acentos) no índice FTS5, dos mais relevantes
+    # para os menos relevantes
+    limit = search.parse_limit(request.args.get('limit'))
+    if limit is None:
+        return jsonify({'error': f'O parâmetro limit deve ser um inteiro entre 1 e {search.MAX_LIMIT}.'}), 400
+    match = search.prefix_query(request.args['q'])
+    if match is None:
+        return jsonify([])
+    alunos_rows = conn.execute('''
+        SELECT a.* FROM aluno_busca
+        JOIN aluno a ON a.chave = aluno_busca.rowid
+        WHERE aluno_busca MATCH ?
+        ORDER BY aluno_busca.rank, a.nome
+        LIMIT ?
+    ''', (match, limit)).fetchall()
+    return jsonify([_public_row(row) for row in alunos_rows])
 
 @app.route('/api/alunos', methods=['POST'])
 def create_aluno():
@@ -289,12 +548,12 @@ def create_aluno():
 
     conn = db.get_db()
     conn.execute(
-        'INSERT INTO aluno (id, nome, numero_chamada, data_nascimento, situacao) VALUES (?, ?, ?, ?, ?)',
-        (new_id, nome, numero_chamada, data_nascimento, situacao)
+        'INSERT INTO aluno (id, nome, nome_normalizado, numero_chamada, data_nascimento, situacao) VALUES (?, ?, ?, ?, ?, ?)',
+        (new_id, nome, roster.normalize_name(nome), numero_chamada, data_nascimento, situacao)
     )
     conn.commit()
     new_aluno = conn.execute('SELECT * FROM aluno WHERE id = ?', (new_id,)).fetchone()
-    return jsonify(dict(new_aluno)), 201
+    return jsonify(_public_row(new_aluno)), 201
 
 @app.route('/api/alunos/<string:aluno_id>', methods=['GET'])
 def get_aluno(aluno_id):
@@ -302,7 +561,7 @@ def get_aluno(aluno_id):
     aluno = conn.execute('SELECT * FROM aluno WHERE id = ?', (aluno_id,)).fetchone()
     if aluno is None:
         return jsonify({'error': 'Aluno não encontrado'}), 404
-    return jsonify(dict(aluno))
+    return jsonify(_public_row(aluno))
 
 @app.route('/api/alunos/<string:aluno_id>', methods=['PUT'])
 def update_aluno(aluno_id):
@@ -321,12 +580,12 @@ def update_aluno(aluno_id):
     situacao = data.get('situacao', aluno['situacao'])
 
     conn.execute(
-        'UPDATE aluno SET nome = ?, numero_chamada = ?, data_nascimento = ?, situacao = ? WHERE id = ?',
-        (nome, numero_chamada, data_nascimento, situacao, aluno_id)
+        'UPDATE aluno SET nome = ?, nome_normalizado = ?, numero_chamada = ?, data_nascimento = ?, situacao = ? WHERE id = ?',
+        (nome, roster.normalize_name(nome), numero_chamada, data_nascimento, situacao, aluno_id)
     )
     conn.commit()
     updated_aluno = conn.execute('SELECT * FROM aluno WHERE id = ?', (aluno_id,)).fetchone()
-    return jsonify(dict(updated_aluno))
+    return jsonify(_public_row(updated_aluno))
 
 @app.route('/api/alunos/<string:aluno_id>', methods=['DELETE'])
 def delete_aluno(aluno_id):
@@ -336,8 +595,12 @@ def delete_aluno(aluno_id):
     if matriculas:
         return jsonify({'error': 'Este aluno está matriculado em uma ou mais turmas e não pode ser excluído.'}), 400
 
-    conn.execute('DELETE FROM aluno WHERE id = ?', (aluno_id,))
-    conn.commit()
+    try:
+        conn.execute('DELETE FROM aluno WHERE id = ?', (aluno_id,))
+        conn.commit()
+    except conn.IntegrityError:
+        conn.rollback()
+        return jsonify({'error': 'Este aluno possui notas registradas e não pode ser excluído.'}), 400
     return '', 204
 
 # --- API para Matrículas (Enrollments) ---
@@ -352,7 +615,7 @@ def get_alunos_por_turma(turma_id):
         ORDER BY a.nome
     """
     alunos_rows = conn.execute(query, (turma_id,)).fetchall()
-    alunos = [dict(row) for row in alunos_rows]
+    alunos = [_public_row(row) for row in alunos_rows]
     return jsonify(alunos)
 
 @app.route('/api/turmas/<string:turma_id>/alunos', methods=['POST'])
@@ -387,60 +650,37 @@ def desmatricular_aluno(turma_id, aluno_id):
 
 @app.route('/api/turmas/<string:turma_id>/alunos/import', methods=['POST'])
 def import_alunos(turma_id):
-    students_data = request.get_json()
-    if not isinstance(students_data, list):
-        return jsonify({'error': 'O corpo da requisição deve ser uma lista de alunos.'}), 400
-
     conn = db.get_db()
     # Check if class exists
     turma = conn.execute('SELECT * FROM turma WHERE id = ?', (turma_id,)).fetchone()
     if turma is None:
         return jsonify({'error': 'Turma não encontrada'}), 404
 
-    success_count = 0
-    error_count = 0
-    errors = []
+    # CSV and NDJSON bodies are parsed line by line as they arrive; a JSON
+    # list is still accepted for older clients
+    if request.mimetype in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig' if charset.lower() == 'utf-8' else charset,
+                                 newline='')
+        entries = roster.iter_csv(lines) if request.mimetype == 'text/csv' else readers.iter_ndjson(lines)
+    elif request.mimetype == 'application/json':
+        students_data = request.get_json(silent=True)
+        if not isinstance(students_data, list):
+            return jsonify({'error': 'O corpo da requisição deve ser uma lista de alunos.'}), 400
+        entries = readers.iter_list(students_data)
+    else:
+        return jsonify({'error': 'Envie um arquivo CSV, NDJSON ou uma lista JSON de alunos.'}), 415
 
-    # Use a transaction
     try:
-        cursor = conn.cursor()
-        cursor.execute('BEGIN')
-
-        for student in students_data:
-            if not student.get('nome'):
-                error_count += 1
-                errors.append(f'Aluno sem nome ignorado: {student}')
-                continue
-
-            # The frontend now sends the date in YYYY-MM-DD format.
-            formatted_date = student.get('data_nascimento') if student.get('data_nascimento') else None
-
-            # Create student
-            aluno_id = f"aluno_{uuid.uuid4().hex}"
-            cursor.execute(
-                'INSERT INTO aluno (id, nome, numero_chamada, data_nascimento, situacao) VALUES (?, ?, ?, ?, ?)',
-                (aluno_id, student['nome'], student.get('numero_chamada'), formatted_date, student.get('situacao', 'Ativo'))
-            )
-
-            # Enroll student
-            try:
-                cursor.execute('INSERT INTO matricula (id_aluno, id_turma) VALUES (?, ?)', (aluno_id, turma_id))
-                success_count += 1
-            except conn.IntegrityError:
-                error_count += 1
-                errors.append(f'Erro de integridade ao matricular aluno: {student.get("nome")}')
-
-
-        cursor.execute('COMMIT')
+        summary = roster.import_roster(conn, turma_id, entries)
+    except (UnicodeDecodeError, LookupError) as e:
+        return jsonify({'error': f'Codificação do arquivo inválida: {e}'}), 400
     except Exception as e:
-        cursor.execute('ROLLBACK')
-        return jsonify({'error': f'Erro na transação do banco de dados: {e}', 'details': errors}), 500
+        return jsonify({'error': f'Erro na transação do banco de dados: {e}'}), 500
 
     return jsonify({
-        'message': f'{success_count} aluno(s) importado(s) com sucesso.',
-        'success_count': success_count,
-        'error_count': error_count,
-        'errors': errors
+        'message': f"{summary['success_count']} aluno(s) importado(s) com sucesso.",
+        **summary
     }), 201
 
 # --- API para Avaliações e Notas ---
@@ -499,11 +739,24 @@ def update_avaliacao(avaliacao_id):
     peso = data.get('peso', avaliacao['peso'])
     nota_maxima = data.get('nota_maxima', avaliacao['nota_maxima'])
 
-    conn.execute(
-        'UPDATE avaliacao SET nome = ?, peso = ?, nota_maxima = ? WHERE id = ?',
-        (nome, peso, nota_maxima, avaliacao_id)
-    )
-    conn.commit()
+    try:
+        conn.execute('BEGIN')
+        # A new weight changes every student's weighted sum: swap the old
+        # contribution for the new one in the same transaction.
+        # (nota_maxima does not take part in the RN15 average.)
+        weight_changed = peso != avaliacao['peso']
+        if weight_changed:
+            gradebook.apply_evaluation_grades(conn, avaliacao_id, -1)
+        conn.execute(
+            'UPDATE avaliacao SET nome = ?, peso = ?, nota_maxima = ? WHERE id = ?',
+            (nome, peso, nota_maxima, avaliacao_id)
+        )
+        if weight_changed:
+            gradebook.apply_evaluation_grades(conn, avaliacao_id, 1)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'error': f'Erro ao atualizar avaliação: {e}'}), 500
     updated_avaliacao = conn.execute('SELECT * FROM avaliacao WHERE id = ?', (avaliacao_id,)).fetchone()
     return jsonify(dict(updated_avaliacao))
 
@@ -513,6 +766,7 @@ def delete_avaliacao(avaliacao_id):
     # RN16: Excluir notas associadas
     conn.execute('BEGIN')
     try:
+        gradebook.apply_evaluation_grades(conn, avaliacao_id, -1)
         conn.execute('DELETE FROM nota WHERE id_avaliacao = ?', (avaliacao_id,))
         conn.execute('DELETE FROM avaliacao WHERE id = ?', (avaliacao_id,))
         conn.commit()
@@ -546,28 +800,290 @@ def save_notas(avaliacao_id):
         if grade.get('grade') > nota_maxima:
             return jsonify({'error': f"A nota para o aluno {grade.get('studentId')} não pode ser maior que {nota_maxima}."}), 400
 
-    # Usar uma transação para a operação de apagar e inserir
+    # A lista enviada é o conjunto completo de notas da avaliação. Compara com
+    # o que está gravado e aplica apenas as diferenças.
+    new_values = {g['studentId']: g['grade'] for g in grades}
+    stored_values = {
+        row['id_aluno']: row['valor']
+        for row in conn.execute('SELECT id_aluno, valor FROM nota WHERE id_avaliacao = ?', (avaliacao_id,))
+    }
+    inserted = [aluno_id for aluno_id in new_values if aluno_id not in stored_values]
+    updated = [aluno_id for aluno_id in new_values
+               if aluno_id in stored_values and stored_values[aluno_id] != new_values[aluno_id]]
+    deleted = [aluno_id for aluno_id in stored_values if aluno_id not in new_values]
+
     try:
         cursor = conn.cursor()
         cursor.execute('BEGIN')
-        # Remove notas antigas para esta avaliação
-        cursor.execute('DELETE FROM nota WHERE id_avaliacao = ?', (avaliacao_id,))
-
-        # Insere as novas notas
-        if grades:
-            grades_to_insert = [(g['studentId'], avaliacao_id, g['grade']) for g in grades]
-            cursor.executemany('INSERT INTO nota (id_aluno, id_avaliacao, valor) VALUES (?, ?, ?)', grades_to_insert)
+        # Retira dos agregados por aluno as notas que vão mudar ou sair
+        gradebook.apply_evaluation_grades(conn, avaliacao_id, -1, updated + deleted)
+        if deleted:
+            cursor.executemany(
+                'DELETE FROM nota WHERE id_aluno = ? AND id_avaliacao = ?',
+                [(aluno_id, avaliacao_id) for aluno_id in deleted]
+            )
+        if inserted or updated:
+            cursor.executemany(
+                'INSERT INTO nota (id_aluno, id_avaliacao, valor) VALUES (?, ?, ?) '
+                'ON CONFLICT (id_aluno, id_avaliacao) DO UPDATE SET valor = excluded.valor',
+                [(aluno_id, avaliacao_id, new_values[aluno_id]) for aluno_id in inserted + updated]
+            )
+        gradebook.apply_evaluation_grades(conn, avaliacao_id, 1, inserted + updated)
 
         cursor.execute('COMMIT')
     except Exception as e:
         cursor.execute('ROLLBACK')
         return jsonify({'error': f'Erro ao salvar notas: {e}'}), 500
 
-    return jsonify({'success': True}), 201
+    return jsonify({
+        'success': True,
+        'inserted': len(inserted),
+        'updated': len(updated),
+        'deleted': len(deleted)
+    }), 201
+
+
+@app.route('/api/turmas/<string:turma_id>/relatorio', methods=['GET'])
+def get_relatorio_turma(turma_id):
+    conn = db.get_db()
+    turma = conn.execute('SELECT id FROM turma WHERE id = ?', (turma_id,)).fetchone()
+    if turma is None:
+        return jsonify({'error': 'Turma não encontrada'}), 404
+
+    avaliacoes_rows = conn.execute('SELECT * FROM avaliacao WHERE id_turma = ? ORDER BY nome', (turma_id,)).fetchall()
+
+    # One grouped pass over the class: each student's grades, with the weighted
+    # sum and total weight read from the maintained aggregates (RN15: missing
+    # grades are left out of the average).
+    report_rows = conn.execute("""
+        SELECT a.id AS id_aluno, a.nome,
+               json_group_object(n.id_avaliacao, n.valor) FILTER (WHERE n.valor IS NOT NULL) AS notas,
+               mt.soma_ponderada, mt.peso_total
+        FROM matricula m
+        JOIN aluno a ON a.id = m.id_aluno
+        LEFT JOIN media_aluno_turma mt ON mt.id_turma = m.id_turma AND mt.id_aluno = m.id_aluno
+        LEFT JOIN avaliacao av ON av.id_turma = m.id_turma
+        LEFT JOIN nota n ON n.id_aluno = m.id_aluno AND n.id_avaliacao = av.id
+        WHERE m.id_turma = ?
+        GROUP BY a.id
+        ORDER BY a.nome
+    """, (turma_id,)).fetchall()
+
+    report = []
+    for row in report_rows:
+        final_grade = gradebook.final_grade(row)
+        report.append({
+            'studentId': row['id_aluno'],
+            'studentName': row['nome'],
+            'grades': json.loads(row['notas']) if row['notas'] else {},
+            'finalGrade': f"{final_grade:.2f}" if final_grade is not None else 'N/A'
+        })
+
+    return jsonify({
+        'evaluations': [dict(row) for row in avaliacoes_rows],
+        'report': report
+    })
+
+
+def _format_final_grade(row):
+    """Helper to convert a media_aluno_turma row to a JSON response."""
+    return {
+        'id_turma': row['id_turma'],
+        'id_aluno': row['id_aluno'],
+        'media': gradebook.final_grade(row),
+        'peso_total': row['peso_total'],
+        'quantidade_notas': row['quantidade_notas']
+    }
+
+@app.route('/api/turmas/<string:turma_id>/medias', methods=['GET'])
+def get_medias_turma(turma_id):
+    conn = db.get_db()
+    rows = conn.execute('SELECT * FROM media_aluno_turma WHERE id_turma = ?', (turma_id,)).fetchall()
+    return jsonify([_format_final_grade(row) for row in rows])
+
+@app.route('/api/alunos/<string:aluno_id>/medias', methods=['GET'])
+def get_medias_aluno(aluno_id):
+    conn = db.get_db()
+    rows = conn.execute('SELECT * FROM media_aluno_turma WHERE id_aluno = ?', (aluno_id,)).fetchall()
+    return jsonify([_format_final_grade(row) for row in rows])
+
+
+def _histogram_buckets():
+    """Reads the optional ?faixas= histogram size (1-100)."""
+    value = request.args.get('faixas', grade_stats.HISTOGRAM_BUCKETS)
+    try:
+        buckets = int(value)
+    except (TypeError, ValueError):
+        return None
+    return buckets if 1 <= buckets <= 100 else None
+
+@app.route('/api/avaliacoes/<string:avaliacao_id>/estatisticas', methods=['GET'])
+def get_estatisticas_avaliacao(avaliacao_id):
+    buckets = _histogram_buckets()
+    if buckets is None:
+        return jsonify({'error': 'O parâmetro faixas deve ser um inteiro entre 1 e 100.'}), 400
+    conn = db.get_db()
+    avaliacao = conn.execute('SELECT id, id_turma, nota_maxima FROM avaliacao WHERE id = ?', (avaliacao_id,)).fetchone()
+    if avaliacao is None:
+        return jsonify({'error': 'Avaliação não encontrada'}), 404
+    statistics = grade_stats.evaluation_statistics(conn, [avaliacao], buckets)
+    return jsonify({'id_avaliacao': avaliacao_id, **statistics[avaliacao_id]})
+
+@app.route('/api/turmas/<string:turma_id>/estatisticas', methods=['GET'])
+def get_estatisticas_turma(turma_id):
+    buckets = _histogram_buckets()
+    if buckets is None:
+        return jsonify({'error': 'O parâmetro faixas deve ser um inteiro entre 1 e 100.'}), 400
+    conn = db.get_db()
+    if conn.execute('SELECT id FROM turma WHERE id = ?', (turma_id,)).fetchone() is None:
+        return jsonify({'error': 'Turma não encontrada'}), 404
+    return jsonify(grade_stats.class_statistics(conn, [turma_id], buckets)[turma_id])
+
+@app.route('/api/turmas/estatisticas', methods=['GET'])
+def get_estatisticas_turmas():
+    # Batched: ?turmas=id1,id2,... and/or ?disciplina= / ?ano_semestre=
+    buckets = _histogram_buckets()
+    if buckets is None:
+        return jsonify({'error': 'O parâmetro faixas deve ser um inteiro entre 1 e 100.'}), 400
+    turma_ids = [turma_id for turma_id in request.args.get('turmas', '').split(',') if turma_id]
+    disciplina_id = request.args.get('disciplina')
+    ano_semestre = request.args.get('ano_semestre')
+    if not (turma_ids or disciplina_id or ano_semestre):
+        return jsonify({'error': 'Informe as turmas, a disciplina ou o ano_semestre.'}), 400
+
+    conn = db.get_db()
+    if disciplina_id or ano_semestre:
+        turmas = exports.select_turmas(conn, None, disciplina_id, ano_semestre)
+        selected = [turma['id'] for turma in turmas]
+        if turma_ids:
+            selected = [turma_id for turma_id in selected if turma_id in set(turma_ids)]
+        turma_ids = selected
+    else:
+        existing = {row['id'] for row in conn.execute(
+            f"SELECT id FROM turma WHERE id IN ({','.join('?' * len(turma_ids))})", turma_ids)}
+        turma_ids = [turma_id for turma_id in dict.fromkeys(turma_ids) if turma_id in existing]
+
+    statistics = grade_stats.class_statistics(conn, turma_ids, buckets)
+    return jsonify([statistics[turma_id] for turma_id in turma_ids])
+
+
+@app.route('/api/notas/exportar', methods=['GET'])
+def exportar_notas():
+    # Escopo: uma turma, uma disciplina e/ou um ano_semestre inteiro
+    turma_id = request.args.get('turma')
+    disciplina_id = request.args.get('disciplina')
+    ano_semestre = request.args.get('ano_semestre')
+    formato = request.args.get('formato', 'csv').lower()
+
+    if formato not in exports.FORMATS:
+        return jsonify({'error': f"Formato inválido. Use um de: {', '.join(exports.FORMATS)}."}), 400
+    if not (turma_id or disciplina_id or ano_semestre):
+        return jsonify({'error': 'Informe a turma, a disciplina ou o ano_semestre a exportar.'}), 400
+
+    turmas = exports.select_turmas(db.get_db(), turma_id, disciplina_id, ano_semestre)
+    if not turmas:
+        return jsonify({'error': 'Nenhuma turma encontrada para exportação.'}), 404
+
+    def generate():
+        # The response outlives the request's connection, so the stream reads
+        # through a pool connection of its own
+        conn, _ = db.pool.acquire()
+        try:
+            yield from exports.GENERATORS[formato](conn, turmas)
+        finally:
+            db.pool.release(conn)
+
+    filename = secure_filename('notas_' + '_'.join(filter(None, [ano_semestre, disciplina_id, turma_id])) + f'.{formato}')
+    return Response(generate(), mimetype=exports.MIMETYPES[formato], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
 
 
 # --- API para Eventos do Calendário ---
 
+def _format_event_response(event_row):
+    """Helper to convert an event row (or dict) to a proper JSON response."""
+    event_dict = _public_row(event_row)
+    if event_dict.get('reminders'):
+        event_dict['reminders'] = [int(r) for r in event_dict['reminders'].split(',') if r]
+    else:
+        event_dict['reminders'] = []
+    return event_dict
+
+def _rule_duration(rule):
+    """Duration of each occurrence of a recurrence rule (zero if it has no end)."""
+    if not rule['end_datetime']:
+        return timedelta(0)
+    return datetime.fromisoformat(rule['end_datetime']) - datetime.fromisoformat(rule['start_datetime'])
+
+def _occurrence_to_event(rule, start):
+    """Builds the event dict for one generated occurrence of a recurrence rule."""
+    end_datetime_iso = (start + _rule_duration(rule)).isoformat() if rule['end_datetime'] else None
+    return _format_event_response({
+        'id': recurrence.occurrence_id(rule['id'], start),
+        'title': rule['title'],
+        'description': rule['description'],
+        'start_datetime': start.isoformat(),
+        'end_datetime': end_datetime_iso,
+        'recurrence_id': rule['id'],
+        'reminders': rule['reminders']
+    })
+
+def _expand_rules(conn, rules, window_start=None, window_end=None):
+    """
+    Generates the occurrences of the given recurrence rules that overlap the
+    window [window_start, window_end), or all of them if no window is given.
+    """
+    if not rules:
+        return []
+
+    # Occurrences that started before the window but are still running overlap it.
+    # Like the interval index, an occurrence always lasts at least one minute.
+    durations = {rule['id']: max(_rule_duration(rule), timedelta(minutes=1)) for rule in rules}
+
+    rule_ids = [rule['id'] for rule in rules]
+    if window_start and window_end:
+        exceptions = recurrence.load_exceptions(conn, rule_ids, window_start - max(durations.values()), window_end)
+    else:
+        exceptions = recurrence.load_exceptions(conn, rule_ids)
+
+    events = []
+    for rule in rules:
+        duration = durations[rule['id']]
+        starts = recurrence.expand(
+            datetime.fromisoformat(rule['start_datetime']), rule['frequency'], rule['interval'],
+            until=recurrence.parse_until(rule['until']), count=rule['count'],
+            window_start=window_start - duration + timedelta(microseconds=1) if window_start else None,
+            window_end=window_end,
+            exceptions=exceptions.get(rule['id'], ())
+        )
+        events.extend(_occurrence_to_event(rule, start) for start in starts)
+    return events
+
+def _find_occurrence(conn, evento_id):
+    """
+    Resolves the ID of a generated occurrence to (rule, start). Returns None if
+    the ID does not name a current occurrence of an existing series.
+    """
+    parsed = recurrence.parse_occurrence_id(evento_id)
+    if parsed is None:
+        return None
+    rule_id, start = parsed
+
+    rule = conn.execute('SELECT * FROM recorrencia WHERE id = ?', (rule_id,)).fetchone()
+    if rule is None:
+        return None
+    if not recurrence.is_occurrence(datetime.fromisoformat(rule['start_datetime']), rule['frequency'], rule['interval'], start,
+                                    until=recurrence.parse_until(rule['until']), count=rule['count']):
+        return None
+    excluded = conn.execute(
+        'SELECT 1 FROM recorrencia_excecao WHERE id_recorrencia = ? AND occurrence_start = ?',
+        (rule_id, start.isoformat())
+    ).fetchone()
+    if excluded:
+        return None
+    return rule, start
+
 @app.route('/api/eventos', methods=['GET'])
 def get_eventos():
     start_date_str = request.args.get('start')
@@ -575,24 +1091,38 @@ def get_eventos():
 
     conn = db.get_db()
     if start_date_str and end_date_str:
-        # Fetch events within a date range, using the start_datetime column
-        # The date is extracted from the full datetime string for range comparison
-        event_rows = conn.execute(
-            "SELECT * FROM evento WHERE date(start_datetime) BETWEEN ? AND ? ORDER BY start_datetime",
-            (start_date_str, end_date_str)
+        try:
+            # The range is inclusive of the end date, so compare against the next day
+            end_exclusive = (date.fromisoformat(end_date_str) + timedelta(days=1)).isoformat()
+            window_start = datetime.fromisoformat(start_date_str)
+        except ValueError:
+            return jsonify({'error': 'Parâmetros "start" e "end" devem estar no formato AAAA-MM-DD.'}), 400
+        # Events overlapping [start, end + 1 day), answered by the R*Tree
+        # interval index instead of scanning evento. Bounds are in minutes.
+        event_rows = conn.execute("""
+            SELECT e.* FROM evento_intervalo i
+            JOIN evento e ON e.chave = i.id
+            WHERE i.start_minute < CAST(strftime('%s', ?) AS INTEGER) / 60
+              AND i.end_minute > CAST(strftime('%s', ?) AS INTEGER) / 60
+            ORDER BY e.start_datetime
+        """, (end_exclusive, start_date_str)).fetchall()
+        # Only series that can have occurrences in the window are expanded.
+        # Occurrences are same-day events, so looking back one day covers
+        # those that run past midnight into the window.
+        rules = conn.execute(
+            'SELECT * FROM recorrencia WHERE until >= ? AND start_datetime < ?',
+            ((window_start - timedelta(days=1)).date().isoformat(), end_exclusive)
         ).fetchall()
+        occurrences = _expand_rules(conn, rules, window_start, datetime.fromisoformat(end_exclusive))
     else:
         # Fetch all events if no range is specified
         event_rows = conn.execute('SELECT * FROM evento ORDER BY start_datetime').fetchall()
+        occurrences = _expand_rules(conn, conn.execute('SELECT * FROM recorrencia').fetchall())
 
-    events = []
-    for row in event_rows:
-        event_dict = dict(row)
-        if event_dict.get('reminders'):
-            event_dict['reminders'] = [int(r) for r in event_dict['reminders'].split(',') if r]
-        else:
-            event_dict['reminders'] = []
-        events.append(event_dict)
+    events = [_format_event_response(row) for row in event_rows]
+    if occurrences:
+        events.extend(occurrences)
+        events.sort(key=lambda event: event['start_datetime'])
 
     return jsonify(events)
 
@@ -607,8 +1137,7 @@ def create_evento():
 
     recurrence_frequency = data.get('recurrenceFrequency')
     recurrence_end_date_str = data.get('recurrenceEndDate')
-
-    events_to_insert = []
+    recurrence_count_str = data.get('recurrenceCount')
 
     # Helper to combine date and time into an ISO 8601 string
     def create_datetime_iso(date_str, time_str):
@@ -632,68 +1161,60 @@ def create_evento():
     if not base_event['start_datetime']:
         return jsonify({'error': 'A data do evento (date) é obrigatória.'}), 400
 
-    if recurrence_frequency and recurrence_frequency != 'none' and recurrence_end_date_str:
+    if recurrence_frequency and recurrence_frequency != 'none' and (recurrence_end_date_str or recurrence_count_str):
+        # Recurring events are stored as a single rule; occurrences are
+        # generated on demand by GET /api/eventos
+        if recurrence_frequency not in recurrence.FREQUENCIES:
+            return jsonify({'error': f'Frequência de recorrência inválida: {recurrence_frequency}'}), 400
+        try:
+            dtstart = datetime.fromisoformat(base_event['start_datetime'])
+            interval = int(data.get('recurrenceInterval') or 1)
+            count = int(recurrence_count_str) if recurrence_count_str else None
+            until = date.fromisoformat(recurrence_end_date_str) if recurrence_end_date_str else None
+        except ValueError:
+            return jsonify({'error': 'Dados de recorrência inválidos.'}), 400
+        if interval < 1 or (count is not None and count < 1):
+            return jsonify({'error': 'O intervalo e o número de ocorrências devem ser positivos.'}), 400
+
+        if count is not None:
+            # Store the date of the last occurrence so series can be filtered by window
+            last_date = recurrence.last_occurrence(dtstart, recurrence_frequency, interval, count).date()
+            until = min(until, last_date) if until else last_date
+        if until < dtstart.date():
+            return jsonify({'error': 'A data final da recorrência não pode ser anterior à data do evento.'}), 400
+
         recurrence_id = f"rec_{uuid.uuid4().hex}"
+        occurrence_count = sum(1 for _ in recurrence.expand(dtstart, recurrence_frequency, interval, until=until, count=count))
+        try:
+            cursor.execute(
+                'INSERT INTO recorrencia (id, title, description, start_datetime, end_datetime, frequency, interval, until, count, reminders) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (recurrence_id, base_event['title'], base_event['description'], base_event['start_datetime'], base_event['end_datetime'],
+                 recurrence_frequency, interval, until.isoformat(), count, base_event['reminders'])
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'error': f'Erro ao criar evento(s): {e}'}), 500
+        reminders.scheduler.invalidate()
 
-        # We need to parse the initial datetime to increment it
-        current_dt_obj = datetime.fromisoformat(base_event['start_datetime'])
-        end_date_obj = date.fromisoformat(recurrence_end_date_str)
-
-        delta = None
-        if recurrence_frequency == 'daily':
-            delta = timedelta(days=1)
-        elif recurrence_frequency == 'weekly':
-            delta = timedelta(weeks=1)
-
-        while current_dt_obj.date() <= end_date_obj:
-            event_id = f"evt_{uuid.uuid4().hex}"
-
-            # Calculate end_datetime for this occurrence if start and end times were provided
-            current_end_dt_iso = None
-            if base_event['end_datetime']:
-                 # Calculate duration and add to current start time
-                start_dt = datetime.fromisoformat(base_event['start_datetime'])
-                end_dt = datetime.fromisoformat(base_event['end_datetime'])
-                duration = end_dt - start_dt
-                current_end_dt_obj = current_dt_obj + duration
-                current_end_dt_iso = current_end_dt_obj.isoformat()
-
-            events_to_insert.append((
-                event_id, base_event['title'], base_event['description'],
-                current_dt_obj.isoformat(), current_end_dt_iso,
-                recurrence_id, base_event['reminders']
-            ))
-
-            if delta:
-                current_dt_obj += delta
-            elif recurrence_frequency == 'monthly':
-                # Simplified monthly recurrence
-                if current_dt_obj.month == 12:
-                    current_dt_obj = current_dt_obj.replace(year=current_dt_obj.year + 1, month=1)
-                else:
-                    current_dt_obj = current_dt_obj.replace(month=current_dt_obj.month + 1)
-            else:
-                break
-    else:
-        event_id = f"evt_{uuid.uuid4().hex}"
-        events_to_insert.append((
-            event_id, base_event['title'], base_event['description'],
-            base_event['start_datetime'], base_event['end_datetime'],
-            None, base_event['reminders']
-        ))
+        return jsonify({'success': True, 'count': occurrence_count, 'recurrence_id': recurrence_id}), 201
 
+    event_id = f"evt_{uuid.uuid4().hex}"
     try:
-        cursor.execute('BEGIN')
-        cursor.executemany(
+        cursor.execute(
             'INSERT INTO evento (id, title, description, start_datetime, end_datetime, recurrence_id, reminders) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            events_to_insert
+            (event_id, base_event['title'], base_event['description'],
+             base_event['start_datetime'], base_event['end_datetime'],
+             None, base_event['reminders'])
         )
-        cursor.execute('COMMIT')
+        reminders.sync_event_reminders(conn, event_id)
+        conn.commit()
     except Exception as e:
-        cursor.execute('ROLLBACK')
+        conn.rollback()
         return jsonify({'error': f'Erro ao criar evento(s): {e}'}), 500
+    reminders.scheduler.invalidate()
 
-    return jsonify({'success': True, 'count': len(events_to_insert)}), 201
+    return jsonify({'success': True, 'count': 1}), 201
 
 @app.route('/api/eventos/import', methods=['POST'])
 def import_eventos():
@@ -745,14 +1266,12 @@ def get_evento(evento_id):
     conn = db.get_db()
     evento = conn.execute('SELECT * FROM evento WHERE id = ?', (evento_id,)).fetchone()
     if evento is None:
-        return jsonify({'error': 'Evento não encontrado'}), 404
+        occurrence = _find_occurrence(conn, evento_id)
+        if occurrence is None:
+            return jsonify({'error': 'Evento não encontrado'}), 404
+        return jsonify(_occurrence_to_event(*occurrence))
 
-    event_dict = dict(evento)
-    if event_dict.get('reminders'):
-        event_dict['reminders'] = [int(r) for r in event_dict['reminders'].split(',') if r]
-    else:
-        event_dict['reminders'] = []
-    return jsonify(event_dict)
+    return jsonify(_format_event_response(evento))
 
 @app.route('/api/eventos/<string:evento_id>', methods=['PUT'])
 def update_evento(evento_id):
@@ -763,11 +1282,27 @@ def update_evento(evento_id):
     conn = db.get_db()
     evento = conn.execute('SELECT * FROM evento WHERE id = ?', (evento_id,)).fetchone()
     if evento is None:
-        return jsonify({'error': 'Evento não encontrado'}), 404
+        occurrence = _find_occurrence(conn, evento_id)
+        if occurrence is None:
+            return jsonify({'error': 'Evento não encontrado'}), 404
+        # Editing a single occurrence detaches it from the series: it is
+        # excluded from the rule and stored as a regular event with the same ID
+        rule, start = occurrence
+        detached = _occurrence_to_event(rule, start)
+        conn.execute(
+            'INSERT INTO recorrencia_excecao (id_recorrencia, occurrence_start) VALUES (?, ?)',
+            (rule['id'], start.isoformat())
+        )
+        conn.execute(
+            'INSERT INTO evento (id, title, description, start_datetime, end_datetime, recurrence_id, reminders) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (evento_id, detached['title'], detached['description'], detached['start_datetime'],
+             detached['end_datetime'], rule['id'], rule['reminders'])
+        )
+        evento = conn.execute('SELECT * FROM evento WHERE id = ?', (evento_id,)).fetchone()
 
     title = data.get('title', evento['title'])
     description = data.get('description', evento['description'])
-    reminders = ','.join(map(str, data.get('reminders', [])))
+    reminders_str = ','.join(map(str, data.get('reminders', [])))
 
     # Reconstruct datetime fields if date or time are provided
     date_str = data.get('date')
@@ -808,18 +1343,14 @@ def update_evento(evento_id):
 
     conn.execute(
         'UPDATE evento SET title = ?, description = ?, start_datetime = ?, end_datetime = ?, reminders = ? WHERE id = ?',
-        (title, description, start_datetime_iso, end_datetime_iso, reminders, evento_id)
+        (title, description, start_datetime_iso, end_datetime_iso, reminders_str, evento_id)
     )
+    reminders.sync_event_reminders(conn, evento_id)
     conn.commit()
+    reminders.scheduler.invalidate()
     updated_evento = conn.execute('SELECT * FROM evento WHERE id = ?', (evento_id,)).fetchone()
 
-    event_dict = dict(updated_evento)
-    if event_dict.get('reminders'):
-        event_dict['reminders'] = [int(r) for r in event_dict['reminders'].split(',') if r]
-    else:
-        event_dict['reminders'] = []
-
-    return jsonify(event_dict)
+    return jsonify(_format_event_response(updated_evento))
 
 @app.route('/api/eventos/<string:evento_id>', methods=['DELETE'])
 def delete_evento(evento_id):
@@ -827,27 +1358,71 @@ def delete_evento(evento_id):
 
     conn = db.get_db()
     evento_to_delete = conn.execute('SELECT * FROM evento WHERE id = ?', (evento_id,)).fetchone()
-    if evento_to_delete is None:
-        return jsonify({'error': 'Evento não encontrado'}), 404
+    if evento_to_delete is not None:
+        recurrence_id = evento_to_delete['recurrence_id']
+        start_datetime_iso = evento_to_delete['start_datetime']
+    else:
+        occurrence = _find_occurrence(conn, evento_id)
+        if occurrence is None:
+            return jsonify({'error': 'Evento não encontrado'}), 404
+        rule, start = occurrence
+        recurrence_id = rule['id']
+        start_datetime_iso = start.isoformat()
 
     try:
         conn.execute('BEGIN')
-        if scope == 'this' or not evento_to_delete['recurrence_id']:
-            conn.execute('DELETE FROM evento WHERE id = ?', (evento_id,))
+        if scope == 'this' or not recurrence_id:
+            if evento_to_delete is not None:
+                conn.execute('DELETE FROM evento WHERE id = ?', (evento_id,))
+            else:
+                conn.execute(
+                    'INSERT INTO recorrencia_excecao (id_recorrencia, occurrence_start) VALUES (?, ?)',
+                    (recurrence_id, start_datetime_iso)
+                )
         elif scope == 'all':
-            conn.execute('DELETE FROM evento WHERE recurrence_id = ?', (evento_to_delete['recurrence_id'],))
+            conn.execute('DELETE FROM evento WHERE recurrence_id = ?', (recurrence_id,))
+            conn.execute('DELETE FROM recorrencia WHERE id = ?', (recurrence_id,))
         elif scope == 'future':
             conn.execute(
                 'DELETE FROM evento WHERE recurrence_id = ? AND start_datetime >= ?',
-                (evento_to_delete['recurrence_id'], evento_to_delete['start_datetime'])
+                (recurrence_id, start_datetime_iso)
             )
+            # End the series the day before this occurrence
+            new_until = (datetime.fromisoformat(start_datetime_iso).date() - timedelta(days=1)).isoformat()
+            conn.execute('DELETE FROM recorrencia WHERE id = ? AND substr(start_datetime, 1, 10) > ?', (recurrence_id, new_until))
+            conn.execute('UPDATE recorrencia SET until = ? WHERE id = ? AND until > ?', (new_until, recurrence_id, new_until))
         conn.commit()
     except Exception as e:
         conn.rollback()
         return jsonify({'error': f'Erro ao excluir evento(s): {e}'}), 500
+    reminders.scheduler.invalidate()
 
     return '', 204
 
+@app.route('/api/lembretes/stream', methods=['GET'])
+def stream_lembretes():
+    # Server-Sent Events: reminders are pushed by the scheduler as they become due
+    subscription = reminders.scheduler.subscribe()
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    reminder = subscription.get(timeout=reminders.HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: reminder\ndata: {json.dumps(reminder)}\n\n'
+        finally:
+            reminders.scheduler.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 
 # --- API para Tarefas (To-Do) ---
 
@@ -931,39 +1506,170 @@ def delete_tarefa(tarefa_id):
 
 # --- API para Planos de Aula ---
 
+# Columns returned by the list view in summary mode (no long text fields)
+LESSON_PLAN_SUMMARY_COLUMNS = 'id, title, date, created_at'
+
+# Relation tables loaded with each plan: (response key, table, column)
+LESSON_PLAN_RELATIONS = (
+    ('classIds', 'plano_aula_turma', 'id_turma'),
+    ('materialIds', 'plano_aula_material', 'id_material'),
+    ('evaluationIds', 'plano_aula_avaliacao', 'id_avaliacao'),
+)
+# Table each relation list points to, with the error for an unknown id
+LESSON_PLAN_RELATED_TABLES = {
+    'classIds': ('turma', 'Turma não encontrada'),
+    'materialIds': ('materials', 'Material não encontrado'),
+    'evaluationIds': ('avaliacao', 'Avaliação não encontrada'),
+}
+
+def _validate_lesson_plan_relations(conn, data):
+    """
+    Helper: error message for the first relation list in `data` that is not
+    a list of ids or names a row that does not exist, or None. Checked before
+    writing so an unknown id is a 400 instead of a foreign key failure.
+    """
+    for key, (table, not_found) in LESSON_PLAN_RELATED_TABLES.items():
+        ids = data.get(key)
+        if ids is None:
+            continue
+        if not isinstance(ids, list) or not all(isinstance(related_id, str) for related_id in ids):
+            return f'O campo "{key}" deve ser uma lista de ids.'
+        if not ids:
+            continue
+        found = {row[0] for row in conn.execute(
+            f'SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))}
+        missing = [related_id for related_id in ids if related_id not in found]
+        if missing:
+            return f'{not_found}: {missing[0]}'
+    return None
+
+def _load_lesson_plans(conn, plan_rows):
+    """
+    Helper to attach the relation ids to lesson plan rows. Each relation
+    table is read once for the whole batch (ids passed as one JSON array),
+    so loading N plans costs a constant number of queries.
+    """
+    plans = [_public_row(row) for row in plan_rows]
+    if not plans:
+        return plans
+    by_id = {}
+    for plan in plans:
+        by_id[plan['id']] = plan
+        for key, _, _ in LESSON_PLAN_RELATIONS:
+            plan[key] = []
+    plan_ids = json.dumps(list(by_id))
+    for key, table, column in LESSON_PLAN_RELATIONS:
+        rows = conn.execute(
+            f'SELECT id_plano_aula, {column} FROM {table} '
+            'WHERE id_plano_aula IN (SELECT value FROM json_each(?))',
+            (plan_ids,)
+        )
+        for plan_id, related_id in rows:
+            by_id[plan_id][key].append(related_id)
+    return plans
+
 def _get_lesson_plan_details(plan_id):
     """Helper function to fetch a full lesson plan with its relations."""
     conn = db.get_db()
     plan_row = conn.execute('SELECT * FROM plano_de_aula WHERE id = ?', (plan_id,)).fetchone()
     if not plan_row:
         return None
+    return _load_lesson_plans(conn, [plan_row])[0]
 
-    plan = dict(plan_row)
-
-    # Get associated classes
-    class_ids_rows = conn.execute('SELECT id_turma FROM plano_aula_turma WHERE id_plano_aula = ?', (plan_id,)).fetchall()
-    plan['classIds'] = [row['id_turma'] for row in class_ids_rows]
-
-    # Get associated materials
-    material_ids_rows = conn.execute('SELECT id_material FROM plano_aula_material WHERE id_plano_aula = ?', (plan_id,)).fetchall()
-    plan['materialIds'] = [row['id_material'] for row in material_ids_rows]
+def _encode_lesson_plan_cursor(plan):
+    key = json.dumps([plan['date'] or '', plan['id']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
 
-    # Get associated evaluations
-    evaluation_ids_rows = conn.execute('SELECT id_avaliacao FROM plano_aula_avaliacao WHERE id_plano_aula = ?', (plan_id,)).fetchall()
-    plan['evaluationIds'] = [row['id_avaliacao'] for row in evaluation_ids_rows]
+def _decode_lesson_plan_cursor(cursor):
+    # Anything but the [date, id] pair that _encode_lesson_plan_cursor emits
+    # is rejected here, before it reaches the query
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(key, list) or len(key) != 2:
+        return None
+    plan_date, plan_id = key
+    if not isinstance(plan_date, (str, type(None))) or not isinstance(plan_id, str):
+        return None
+    return plan_date or '', plan_id
 
-    return plan
+def _search_lesson_plans(conn, text, turma_id, limit):
+    """
+    Helper for ?q=: ranked full-text search (title weighs more than the
+    other fields), returning summary plans with a highlighted snippet.
+    """
+    match = search.prefix_query(text)
+    if match is None:
+        return []
+    query = f'''
+        SELECT {', '.join('p.' + column for column in LESSON_PLAN_SUMMARY_COLUMNS.split(', '))},
+               snippet(plano_de_aula_busca, -1, '**', '**', '…', 16) AS snippet
+        FROM plano_de_aula_busca
+        JOIN plano_de_aula p ON p.chave = plano_de_aula_busca.rowid
+        WHERE plano_de_aula_busca MATCH ?
+    '''
+    params = [match]
+    if turma_id:
+        query += ' AND p.id IN (SELECT id_plano_aula FROM plano_aula_turma WHERE id_turma = ?)'
+        params.append(turma_id)
+    query += ' ORDER BY bm25(plano_de_aula_busca, 10.0, 1.0, 1.0, 1.0) LIMIT ?'
+    params.append(limit)
+    return _load_lesson_plans(conn, conn.execute(query, params).fetchall())
 
 @app.route('/api/planos_de_aula', methods=['GET'])
 def get_planos_de_aula():
+    # ?q= searches; ?turma= filters by class; ?resumo=1 omits
+    # objectives/methodology/resources (list views); ?limit=&cursor= pages
+    # by date DESC with a keyset cursor
     conn = db.get_db()
-    planos_rows = conn.execute('SELECT * FROM plano_de_aula ORDER BY date DESC').fetchall()
-
-    # For the list view, we might not need all details, but for simplicity, we'll fetch them.
-    # In a real-world scenario with performance concerns, this could be optimized.
-    planos = [_get_lesson_plan_details(row['id']) for row in planos_rows]
-
-    return jsonify(planos)
+    turma_id = request.args.get('turma')
+    if 'q' in request.args:
+        limit = search.parse_limit(request.args.get('limit'))
+        if limit is None:
+            return jsonify({'error': f'O parâmetro limit deve ser um inteiro entre 1 e {search.MAX_LIMIT}.'}), 400
+        return jsonify(_search_lesson_plans(conn, request.args['q'], turma_id, limit))
+
+    columns = LESSON_PLAN_SUMMARY_COLUMNS if request.args.get('resumo') in ('1', 'true') else '*'
+    paginate = 'limit' in request.args or 'cursor' in request.args
+
+    # Plans without a date sort last, as '' is below every ISO date
+    conditions = []
+    params = []
+    if turma_id:
+        conditions.append('id IN (SELECT id_plano_aula FROM plano_aula_turma WHERE id_turma = ?)')
+        params.append(turma_id)
+    if paginate:
+        limit = search.parse_limit(request.args.get('limit'))
+        if limit is None:
+            return jsonify({'error': f'O parâmetro limit deve ser um inteiro entre 1 e {search.MAX_LIMIT}.'}), 400
+        if request.args.get('cursor'):
+            position = _decode_lesson_plan_cursor(request.args['cursor'])
+            if position is None:
+                return jsonify({'error': 'Cursor de paginação inválido.'}), 400
+            # The first term lets SQLite seek into the index; the row value
+            # comparison breaks ties on the same date
+            conditions.append("ifnull(date, '') <= ? AND (ifnull(date, ''), id) < (?, ?)")
+            params += [position[0], *position]
+
+    query = f'SELECT {columns} FROM plano_de_aula'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += " ORDER BY ifnull(date, '') DESC, id DESC"
+    if paginate:
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+
+    planos_rows = conn.execute(query, params).fetchall()
+    if not paginate:
+        return jsonify(_load_lesson_plans(conn, planos_rows))
+
+    has_more = len(planos_rows) > limit
+    planos = _load_lesson_plans(conn, planos_rows[:limit])
+    return jsonify({
+        'items': planos,
+        'nextCursor': _encode_lesson_plan_cursor(planos[-1]) if has_more else None
+    })
 
 @app.route('/api/planos_de_aula/<string:plan_id>', methods=['GET'])
 def get_plano_de_aula(plan_id):
@@ -982,6 +1688,10 @@ def create_plano_de_aula():
     conn = db.get_db()
     cursor = conn.cursor()
 
+    error = _validate_lesson_plan_relations(conn, data)
+    if error:
+        return jsonify({'error': error}), 400
+
     new_id = f"lp_{uuid.uuid4().hex}"
     now_iso = date.today().isoformat()
 
@@ -1012,36 +1722,52 @@ def create_plano_de_aula():
 
     return jsonify(new_plan), 201
 
-@app.route('/api/planos_de_aula/<string:plan_id>', methods=['PUT'])
+# Columns of plano_de_aula that clients may update
+LESSON_PLAN_FIELDS = ('title', 'date', 'objectives', 'methodology', 'resources')
+
+@app.route('/api/planos_de_aula/<string:plan_id>', methods=['PUT', 'PATCH'])
 def update_plano_de_aula(plan_id):
+    # Only the fields present in the body are written, and each relation
+    # list that is present is diffed against the stored links
     data = request.get_json()
-    if not data:
+    if not isinstance(data, dict):
         return jsonify({'error': 'Dados inválidos'}), 400
+    if 'title' in data and not data['title']:
+        return jsonify({'error': 'O campo "title" é obrigatório.'}), 400
 
     conn = db.get_db()
-    cursor = conn.cursor()
+    stored_plan = conn.execute('SELECT * FROM plano_de_aula WHERE id = ?', (plan_id,)).fetchone()
+    if stored_plan is None:
+        return jsonify({'error': 'Plano de aula não encontrado'}), 404
+    error = _validate_lesson_plan_relations(conn, data)
+    if error:
+        return jsonify({'error': error}), 400
 
+    cursor = conn.cursor()
     try:
         cursor.execute('BEGIN')
 
-        # Update main table
-        cursor.execute(
-            'UPDATE plano_de_aula SET title = ?, date = ?, objectives = ?, methodology = ?, resources = ? WHERE id = ?',
-            (data.get('title'), data.get('date'), data.get('objectives'), data.get('methodology'), data.get('resources'), plan_id)
-        )
-
-        # Update join tables by deleting old and inserting new
-        cursor.execute('DELETE FROM plano_aula_turma WHERE id_plano_aula = ?', (plan_id,))
-        if data.get('classIds'):
-            cursor.executemany('INSERT INTO plano_aula_turma (id_plano_aula, id_turma) VALUES (?, ?)', [(plan_id, class_id) for class_id in data['classIds']])
-
-        cursor.execute('DELETE FROM plano_aula_material WHERE id_plano_aula = ?', (plan_id,))
-        if data.get('materialIds'):
-            cursor.executemany('INSERT INTO plano_aula_material (id_plano_aula, id_material) VALUES (?, ?)', [(plan_id, material_id) for material_id in data['materialIds']])
+        # Only columns whose value changed go in the SET clause, so saves
+        # that only touch the links do not fire the search index trigger
+        fields = [field for field in LESSON_PLAN_FIELDS if field in data and data[field] != stored_plan[field]]
+        if fields:
+            cursor.execute(
+                f"UPDATE plano_de_aula SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                [data[field] for field in fields] + [plan_id]
+            )
 
-        cursor.execute('DELETE FROM plano_aula_avaliacao WHERE id_plano_aula = ?', (plan_id,))
-        if data.get('evaluationIds'):
-            cursor.executemany('INSERT INTO plano_aula_avaliacao (id_plano_aula, id_avaliacao) VALUES (?, ?)', [(plan_id, eval_id) for eval_id in data['evaluationIds']])
+        for key, table, column in LESSON_PLAN_RELATIONS:
+            if key not in data:
+                continue
+            wanted = set(data[key] or [])
+            stored = {row[0] for row in cursor.execute(
+                f'SELECT {column} FROM {table} WHERE id_plano_aula = ?', (plan_id,))}
+            if stored - wanted:
+                cursor.executemany(f'DELETE FROM {table} WHERE id_plano_aula = ? AND {column} = ?',
+                                   [(plan_id, related_id) for related_id in stored - wanted])
+            if wanted - stored:
+                cursor.executemany(f'INSERT INTO {table} (id_plano_aula, {column}) VALUES (?, ?)',
+                                   [(plan_id, related_id) for related_id in wanted - stored])
 
         cursor.execute('COMMIT')
     except Exception as e:
@@ -1076,6 +1802,16 @@ def _format_question_response(question_row):
         question_dict['options'] = []
     return question_dict
 
+def _matching_subjects(conn, text):
+    """
+    Helper to resolve the ?subject= filter against the subject catalogue:
+    names equal to or starting with the text, ignoring case and accents.
+    Reads only the catalogue (one row per subject).
+    """
+    prefix = search.normalize_text(text)
+    return [row['nome'] for row in conn.execute('SELECT nome FROM assunto')
+            if search.normalize_text(row['nome']).startswith(prefix)]
+
 @app.route('/api/perguntas', methods=['GET'])
 def get_perguntas():
     subject = request.args.get('subject')
@@ -1086,9 +1822,14 @@ def get_perguntas():
     filters = []
     params = []
 
+    # Both filters are indexed equality lookups (idx_pergunta_subject_difficulty,
+    # idx_pergunta_difficulty)
     if subject:
-        filters.append('subject LIKE ?')
-        params.append(f'%{subject}%')
+        subjects = _matching_subjects(conn, subject)
+        if not subjects:
+            return jsonify([])
+        filters.append('subject IN (SELECT value FROM json_each(?))')
+        params.append(json.dumps(subjects))
     if difficulty:
         filters.append('difficulty = ?')
         params.append(difficulty)
@@ -1104,9 +1845,18 @@ def get_perguntas():
 @app.route('/api/perguntas/subjects', methods=['GET'])
 def get_question_subjects():
     conn = db.get_db()
-    subjects_rows = conn.execute('SELECT DISTINCT subject FROM pergunta WHERE subject IS NOT NULL AND subject != ""').fetchall()
-    subjects = [row['subject'] for row in subjects_rows]
-    return jsonify(subjects)
+    if request.args.get('contagens') not in ('1', 'true'):
+        subjects_rows = conn.execute('SELECT nome FROM assunto ORDER BY nome').fetchall()
+        return jsonify([row['nome'] for row in subjects_rows])
+
+    # Question counts per subject and per difficulty, from the catalogue
+    subjects = {}
+    for row in conn.execute('SELECT nome, quantidade FROM assunto ORDER BY nome'):
+        subjects[row['nome']] = {'subject': row['nome'], 'total': row['quantidade'], 'byDifficulty': {}}
+    for row in conn.execute('SELECT assunto, difficulty, quantidade FROM assunto_dificuldade'):
+        if row['assunto'] in subjects:
+            subjects[row['assunto']]['byDifficulty'][row['difficulty']] = row['quantidade']
+    return jsonify(list(subjects.values()))
 
 @app.route('/api/perguntas', methods=['POST'])
 def create_pergunta():
@@ -1122,18 +1872,91 @@ def create_pergunta():
         'INSERT INTO pergunta (id, text, subject, difficulty, options, answer) VALUES (?, ?, ?, ?, ?, ?)',
         (new_id, data['text'], data.get('subject'), data.get('difficulty'), options_json, data['answer'])
     )
+    similarity.index_questions(conn, [(new_id, data['text'])])
     conn.commit()
     new_pergunta = conn.execute('SELECT * FROM pergunta WHERE id = ?', (new_id,)).fetchone()
 
     return jsonify(_format_question_response(new_pergunta)), 201
 
+@app.route('/api/perguntas/import', methods=['POST'])
+def import_perguntas():
+    # JSON lines, CSV and GIFT bodies are parsed line by line as they arrive and
+    # stored in chunked transactions; invalid questions are reported, not fatal
+    formato = request.args.get('formato')
+    if formato is None:
+        formato = {
+            'application/x-ndjson': 'jsonl', 'application/jsonl': 'jsonl', 'text/csv': 'csv',
+            'application/x-gift': 'gift', 'text/plain': 'gift'
+        }.get(request.mimetype)
+    if formato is None and request.mimetype == 'application/json':
+        questions_data = request.get_json(silent=True)
+        if not isinstance(questions_data, list):
+            return jsonify({'error': 'O corpo da requisição deve ser uma lista de perguntas.'}), 400
+        entries = readers.iter_list(questions_data)
+    elif formato in question_bank.READERS:
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig' if charset.lower() == 'utf-8' else charset,
+                                 newline='')
+        entries = question_bank.READERS[formato](lines)
+    else:
+        return jsonify({'error': f"Formato inválido. Use: {', '.join(question_bank.FORMATS)}."}), 415
+
+    conn = db.get_db()
+    try:
+        summary = question_bank.import_questions(
+            conn, entries, request.args.get('subject') or None, request.args.get('difficulty') or None)
+    except (UnicodeDecodeError, LookupError) as e:
+        return jsonify({'error': f'Codificação do arquivo inválida: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Erro na transação do banco de dados: {e}'}), 500
+
+    return jsonify({
+        'message': f"{summary['created_count']} pergunta(s) importada(s) com sucesso.",
+        **summary
+    }), 201
+
+def _similarity_threshold():
+    """Helper to read ?limiar= (minimum Jaccard similarity, 0-1). Returns None if invalid."""
+    value = request.args.get('limiar')
+    if value in (None, ''):
+        return similarity.DEFAULT_THRESHOLD
+    try:
+        threshold = float(value)
+    except ValueError:
+        return None
+    return threshold if 0 < threshold <= 1 else None
+
+@app.route('/api/perguntas/duplicadas', methods=['GET'])
+def get_duplicate_questions():
+    # Only questions sharing an LSH band are compared, not every pair
+    threshold = _similarity_threshold()
+    if threshold is None:
+        return jsonify({'error': 'O parâmetro "limiar" deve estar entre 0 e 1.'}), 400
+    conn = db.get_db()
+    return jsonify(similarity.duplicate_groups(conn, threshold))
+
+@app.route('/api/perguntas/<string:pergunta_id>/similares', methods=['GET'])
+def get_similar_questions(pergunta_id):
+    threshold = _similarity_threshold()
+    limit = search.parse_limit(request.args.get('limit'))
+    if threshold is None or limit is None:
+        return jsonify({'error': 'Parâmetros "limiar" ou "limit" inválidos.'}), 400
+
+    conn = db.get_db()
+    pergunta = conn.execute('SELECT * FROM pergunta WHERE id = ?', (pergunta_id,)).fetchone()
+    if pergunta is None:
+        return jsonify({'error': 'Pergunta não encontrada'}), 404
+    matches = similarity.similar_questions(conn, pergunta_id, pergunta['text'], threshold, limit)
+    return jsonify([{**_format_question_response(row), 'similarity': value} for row, value in matches])
+
 @app.route('/api/perguntas/<string:pergunta_id>', methods=['GET'])
 def get_pergunta(pergunta_id):
     conn = db.get_db()
     pergunta = conn.execute('SELECT * FROM pergunta WHERE id = ?', (pergunta_id,)).fetchone()
     if pergunta is None:
         return jsonify({'error': 'Pergunta não encontrada'}), 404
-    return jsonify(_format_question_response(pergunta))
+    statistics = conn.execute('SELECT * FROM pergunta_estatistica WHERE id_pergunta = ?', (pergunta_id,)).fetchone()
+    return jsonify({**_format_question_response(pergunta), 'stats': quizzes.question_statistics(statistics)})
 
 @app.route('/api/perguntas/<string:pergunta_id>', methods=['PUT'])
 def update_pergunta(pergunta_id):
@@ -1161,6 +1984,8 @@ def update_pergunta(pergunta_id):
         'UPDATE pergunta SET text = ?, subject = ?, difficulty = ?, options = ?, answer = ? WHERE id = ?',
         (text, subject, difficulty, options_json, answer, pergunta_id)
     )
+    if text != pergunta['text']:
+        similarity.index_questions(conn, [(pergunta_id, text)])
     conn.commit()
     updated_pergunta = conn.execute('SELECT * FROM pergunta WHERE id = ?', (pergunta_id,)).fetchone()
 
@@ -1175,6 +2000,49 @@ def delete_pergunta(pergunta_id):
     return '', 204
 
 
+@app.route('/api/quizzes', methods=['POST'])
+def create_quiz():
+    # Server-side stratified sampling: only the chosen questions are sent
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Dados inválidos'}), 400
+    try:
+        strata = quizzes.parse_strata(data)
+        seed = quizzes.parse_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = db.get_db()
+    questions, summary = quizzes.sample_questions(conn, strata, seed)
+    return jsonify({
+        'seed': seed,
+        'questions': [_format_question_response(question) for question in questions],
+        'strata': summary
+    }), 201
+
+@app.route('/api/quizzes/tentativas', methods=['POST'])
+def submit_quiz_attempt():
+    # Graded against the stored answers; per-question counters are updated incrementally
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Dados inválidos'}), 400
+    seed = data.get('seed')
+    if seed not in (None, ''):
+        try:
+            seed = quizzes.parse_seed(seed)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        seed = None
+
+    conn = db.get_db()
+    try:
+        result = quizzes.record_attempt(conn, data.get('answers'), seed)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 201
+
+
 # --- API para Configurações ---
 
 @app.route('/api/configuracoes', methods=['GET'])
@@ -1218,6 +2086,9 @@ def save_configuracoes():
 if __name__ == '__main__':
     # Garante que o banco de dados e a tabela 'materials' existam ao iniciar
     db.init_db()
+    # Materials whose text is not in the search index yet (uploaded before
+    # the index existed or while the server was down)
+    content_index.indexer.enqueue_missing(app.config['UPLOAD_FOLDER'])
 
     PORT = 8000
     print(f"Servidor Flask rodando em http://127.0.0.1:{PORT}", file=sys.stdout)
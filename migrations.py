@@ -0,0 +1,1047 @@
+"""
+Migrações versionadas do esquema do banco de dados.
+
+Cada migração tem um número de versão, uma descrição, uma etapa `upgrade`
+(DDL executado dentro de uma única transação) e, opcionalmente, uma etapa
+`backfill` que preenche dados existentes em lotes pequenos, liberando o
+lock de escrita entre um lote e outro. A versão aplicada fica registrada na
+tabela `schema_version`; se ela já estiver atualizada, `migrate` não executa
+nenhum DDL.
+
+Para alterar o esquema, acrescente uma nova função ao final de MIGRATIONS
+em vez de editar migrações já publicadas.
+"""
+import os
+from datetime import datetime, timedelta
+
+# Quantidade de linhas atualizadas por transação durante um backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+class Migration:
+    """Uma etapa de migração do esquema."""
+
+    def __init__(self, version, description, upgrade, backfill=None, rebuilds_tables=False):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.backfill = backfill
+        self.rebuilds_tables = rebuilds_tables
+
+
+MIGRATIONS = []
+
+
+def migration(version, description, backfill=None, rebuilds_tables=False):
+    """
+    Decorator que registra uma função `upgrade(conn)` como migração. Com
+    `rebuilds_tables`, o upgrade roda com as chaves estrangeiras desligadas
+    (necessário para recriar tabelas referenciadas por outras, veja
+    `rebuild_with_integer_key`).
+    """
+    def register(upgrade):
+        MIGRATIONS.append(Migration(version, description, upgrade, backfill, rebuilds_tables))
+        return upgrade
+    return register
+
+
+# --- Utilitários para as migrações ---
+
+def column_exists(conn, table, column):
+    """Indica se a coluna já existe na tabela."""
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+
+def add_column(conn, table, column, definition):
+    """Adiciona uma coluna apenas se ela ainda não existir."""
+    if not column_exists(conn, table, column):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def backfill_in_batches(conn, table, set_clause, where_clause, params=(), batch_size=None):
+    """
+    Executa `UPDATE table SET set_clause WHERE where_clause` em lotes de
+    `batch_size` linhas, com um commit por lote, para não segurar o lock de
+    escrita durante a tabela inteira. `where_clause` deve deixar de
+    selecionar as linhas já atualizadas (ex.: `coluna IS NULL`), o que torna
+    o backfill idempotente e retomável. Retorna o total de linhas alteradas.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    total = 0
+    while True:
+        cursor = conn.execute(
+            f'UPDATE {table} SET {set_clause} WHERE rowid IN '
+            f'(SELECT rowid FROM {table} WHERE {where_clause} LIMIT ?)',
+            (*params, batch_size)
+        )
+        conn.commit()
+        total += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return total
+
+
+def rebuild_with_integer_key(conn, table, key):
+    """
+    Recria `table`, cuja chave primária é `id TEXT`, com uma coluna
+    `key INTEGER PRIMARY KEY` preenchida com os rowids atuais; `id` passa a
+    ser NOT NULL UNIQUE (as chaves estrangeiras de outras tabelas continuam
+    válidas). O rowid implícito de uma tabela com chave de texto pode mudar
+    (num VACUUM, por exemplo); o de uma INTEGER PRIMARY KEY não, então
+    índices externos (R*Tree, FTS5) podem apontar para ela com segurança.
+    As chaves estrangeiras da própria tabela, seus índices e gatilhos são
+    recriados. Só pode ser usada em migrações com `rebuilds_tables=True`:
+    com as chaves estrangeiras ligadas, o DROP TABLE apagaria em cascata as
+    linhas que a referenciam.
+    """
+    columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+    definitions = [f'{key} INTEGER PRIMARY KEY']
+    for _, name, column_type, notnull, default, primary_key in columns:
+        definition = f'{name} {column_type}'.rstrip()
+        if primary_key:
+            definition += ' NOT NULL UNIQUE'
+        elif notnull:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f' DEFAULT {default}'
+        definitions.append(definition)
+    # (id, seq, tabela, coluna, coluna referenciada, on_update, on_delete, match)
+    foreign_keys = {}
+    for fk_id, _, parent, column, parent_column, on_update, on_delete, _ in conn.execute(
+            f'PRAGMA foreign_key_list({table})'):
+        foreign_keys.setdefault(fk_id, (parent, [], [], on_update, on_delete))
+        foreign_keys[fk_id][1].append(column)
+        foreign_keys[fk_id][2].append(parent_column)
+    for parent, fk_columns, parent_columns, on_update, on_delete in foreign_keys.values():
+        constraint = f'FOREIGN KEY ({", ".join(fk_columns)}) REFERENCES {parent}({", ".join(parent_columns)})'
+        if on_delete != 'NO ACTION':
+            constraint += f' ON DELETE {on_delete}'
+        if on_update != 'NO ACTION':
+            constraint += f' ON UPDATE {on_update}'
+        definitions.append(constraint)
+    names = ', '.join(column[1] for column in columns)
+    # Índices automáticos (sql NULL) são recriados pelas restrições
+    schema = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+
+    conn.execute(f'CREATE TABLE {table}_nova ({", ".join(definitions)})')
+    conn.execute(f'INSERT INTO {table}_nova ({key}, {names}) SELECT rowid, {names} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_nova RENAME TO {table}')
+    for (sql,) in schema:
+        conn.execute(sql)
+
+
+# --- Migrações ---
+
+@migration(1, 'Esquema inicial')
+def _initial_schema(conn):
+    # Tabela para os Materiais de Estudo (usando IF NOT EXISTS para segurança)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS materials (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        type TEXT,
+        tags TEXT,
+        url TEXT NOT NULL
+    )
+    ''')
+
+    # Tabela para as Disciplinas
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS disciplina (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        codigo TEXT,
+        descricao TEXT
+    )
+    ''')
+
+    # Tabela para as Turmas
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS turma (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        ano_semestre TEXT,
+        professor TEXT,
+        id_disciplina TEXT NOT NULL,
+        FOREIGN KEY (id_disciplina) REFERENCES disciplina(id)
+    )
+    ''')
+
+    # Tabela para os Alunos
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS aluno (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        numero_chamada INTEGER,
+        data_nascimento TEXT,
+        situacao TEXT
+    )
+    ''')
+
+    # Tabela de associação para Matrículas (Alunos <-> Turmas)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS matricula (
+        id_aluno TEXT NOT NULL,
+        id_turma TEXT NOT NULL,
+        PRIMARY KEY (id_aluno, id_turma),
+        FOREIGN KEY (id_aluno) REFERENCES aluno(id),
+        FOREIGN KEY (id_turma) REFERENCES turma(id)
+    )
+    ''')
+
+    # Tabela para as Avaliações
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avaliacao (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        peso REAL NOT NULL,
+        nota_maxima REAL NOT NULL,
+        id_turma TEXT NOT NULL,
+        FOREIGN KEY (id_turma) REFERENCES turma(id)
+    )
+    ''')
+
+    # Tabela para as Notas
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS nota (
+        id_aluno TEXT NOT NULL,
+        id_avaliacao TEXT NOT NULL,
+        valor REAL,
+        PRIMARY KEY (id_aluno, id_avaliacao),
+        FOREIGN KEY (id_aluno) REFERENCES aluno(id),
+        FOREIGN KEY (id_avaliacao) REFERENCES avaliacao(id)
+    )
+    ''')
+
+    # Tabela para Eventos do Calendário
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS evento (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        start_datetime TEXT NOT NULL,
+        end_datetime TEXT,
+        recurrence_id TEXT,
+        reminders TEXT
+    )
+    ''')
+
+    # Tabela para Tarefas (To-Do List)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tarefa (
+        id TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        priority TEXT,
+        due_date TEXT
+    )
+    ''')
+
+    # Tabela para Planos de Aula
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS plano_de_aula (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        date TEXT,
+        objectives TEXT,
+        methodology TEXT,
+        resources TEXT,
+        created_at TEXT NOT NULL
+    )
+    ''')
+
+    # Tabela de associação: Planos de Aula <-> Turmas
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS plano_aula_turma (
+        id_plano_aula TEXT NOT NULL,
+        id_turma TEXT NOT NULL,
+        PRIMARY KEY (id_plano_aula, id_turma),
+        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
+        FOREIGN KEY (id_turma) REFERENCES turma(id) ON DELETE CASCADE
+    )
+    ''')
+
+    # Tabela de associação: Planos de Aula <-> Materiais
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS plano_aula_material (
+        id_plano_aula TEXT NOT NULL,
+        id_material TEXT NOT NULL,
+        PRIMARY KEY (id_plano_aula, id_material),
+        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
+        FOREIGN KEY (id_material) REFERENCES materials(id) ON DELETE CASCADE
+    )
+    ''')
+
+    # Tabela de associação: Planos de Aula <-> Avaliações
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS plano_aula_avaliacao (
+        id_plano_aula TEXT NOT NULL,
+        id_avaliacao TEXT NOT NULL,
+        PRIMARY KEY (id_plano_aula, id_avaliacao),
+        FOREIGN KEY (id_plano_aula) REFERENCES plano_de_aula(id) ON DELETE CASCADE,
+        FOREIGN KEY (id_avaliacao) REFERENCES avaliacao(id) ON DELETE CASCADE
+    )
+    ''')
+
+    # Tabela para o Banco de Questões
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS pergunta (
+        id TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        subject TEXT,
+        difficulty TEXT,
+        options TEXT,
+        answer TEXT NOT NULL
+    )
+    ''')
+
+    # Tabela para Configurações da Aplicação (key-value store)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS configuracoes (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    ''')
+
+
+@migration(2, 'Índices para as consultas mais frequentes')
+def _hot_path_indexes(conn):
+    # Calendário: filtro por intervalo e exclusão de séries recorrentes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_evento_start ON evento(start_datetime)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_evento_recurrence ON evento(recurrence_id, start_datetime)')
+    # Alunos de uma turma, avaliações de uma turma e notas de uma avaliação.
+    # As chaves primárias compostas começam pela outra coluna e não servem.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matricula_turma ON matricula(id_turma)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_avaliacao_turma ON avaliacao(id_turma, nome)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_nota_avaliacao ON nota(id_avaliacao)')
+    # Lado "filho" das chaves estrangeiras, usado nas verificações de exclusão
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_turma_disciplina ON turma(id_disciplina)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_plano_aula_turma_turma ON plano_aula_turma(id_turma)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_plano_aula_material_material ON plano_aula_material(id_material)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_plano_aula_avaliacao_avaliacao ON plano_aula_avaliacao(id_avaliacao)')
+
+
+@migration(3, 'Regras de recorrência de eventos')
+def _recurrence_rules(conn):
+    # Uma linha por série; as ocorrências são geradas por recurrence.py.
+    # `until` é a data (inclusiva) da última ocorrência, sempre preenchida
+    # (inclusive quando a série é limitada por `count`) para filtrar as
+    # séries que alcançam a janela consultada.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS recorrencia (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        start_datetime TEXT NOT NULL,
+        end_datetime TEXT,
+        frequency TEXT NOT NULL,
+        interval INTEGER NOT NULL DEFAULT 1,
+        until TEXT,
+        count INTEGER,
+        reminders TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recorrencia_until ON recorrencia(until)')
+
+    # Ocorrências excluídas da série (EXDATE), seja por exclusão ou porque
+    # foram editadas e passaram a existir como uma linha em `evento`
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS recorrencia_excecao (
+        id_recorrencia TEXT NOT NULL,
+        occurrence_start TEXT NOT NULL,
+        PRIMARY KEY (id_recorrencia, occurrence_start),
+        FOREIGN KEY (id_recorrencia) REFERENCES recorrencia(id) ON DELETE CASCADE
+    )
+    ''')
+
+
+# Limites do evento em minutos desde 1970 (UTC ingênuo, como as colunas de
+# texto). Eventos sem fim ou com fim anterior ao início ocupam 1 minuto, de
+# forma que o intervalo [início, fim) nunca fica vazio.
+_EVENT_START_MINUTE = "CAST(strftime('%s', {row}.start_datetime) AS INTEGER) / 60"
+_EVENT_END_MINUTE = (
+    "MAX(COALESCE(CAST(strftime('%s', {row}.end_datetime) AS INTEGER) / 60, 0), "
+    "CAST(strftime('%s', {row}.start_datetime) AS INTEGER) / 60 + 1)"
+)
+
+
+def _backfill_event_intervals(conn):
+    last_rowid = 0
+    while True:
+        rows = conn.execute(
+            f'''INSERT OR REPLACE INTO evento_intervalo (id, start_minute, end_minute)
+               SELECT e.rowid, {_EVENT_START_MINUTE.format(row='e')}, {_EVENT_END_MINUTE.format(row='e')}
+               FROM evento e WHERE e.rowid > ? ORDER BY e.rowid LIMIT ?
+               RETURNING id''',
+            (last_rowid, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        conn.commit()
+        if not rows:
+            return
+        last_rowid = max(row[0] for row in rows)
+
+
+@migration(4, 'Índice de intervalos (R*Tree) dos eventos', backfill=_backfill_event_intervals)
+def _event_interval_index(conn):
+    # R*Tree de inteiros: responde "eventos que cruzam [início, fim)" sem
+    # varrer a tabela, inclusive eventos que começaram antes da janela
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS evento_intervalo USING rtree_i32(
+        id, start_minute, end_minute
+    )
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS evento_intervalo_insert AFTER INSERT ON evento BEGIN
+        INSERT OR REPLACE INTO evento_intervalo (id, start_minute, end_minute)
+        VALUES (NEW.rowid, {_EVENT_START_MINUTE.format(row='NEW')}, {_EVENT_END_MINUTE.format(row='NEW')});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS evento_intervalo_update AFTER UPDATE OF start_datetime, end_datetime ON evento BEGIN
+        UPDATE evento_intervalo
+        SET start_minute = {_EVENT_START_MINUTE.format(row='NEW')}, end_minute = {_EVENT_END_MINUTE.format(row='NEW')}
+        WHERE id = NEW.rowid;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS evento_intervalo_delete AFTER DELETE ON evento BEGIN
+        DELETE FROM evento_intervalo WHERE id = OLD.rowid;
+    END
+    ''')
+
+
+def _backfill_event_reminders(conn):
+    last_rowid = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, id, start_datetime, reminders FROM evento "
+            "WHERE rowid > ? AND reminders IS NOT NULL AND reminders != '' ORDER BY rowid LIMIT ?",
+            (last_rowid, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        to_insert = []
+        for rowid, event_id, start_datetime, reminders in rows:
+            start = datetime.fromisoformat(start_datetime)
+            for minutes in {int(value) for value in reminders.split(',') if value}:
+                to_insert.append((event_id, minutes, (start - timedelta(minutes=minutes)).isoformat()))
+        conn.executemany(
+            'INSERT OR IGNORE INTO lembrete (id_evento, minutes_before, fire_at) VALUES (?, ?, ?)',
+            to_insert
+        )
+        conn.commit()
+        last_rowid = rows[-1][0]
+
+
+@migration(5, 'Horários de disparo dos lembretes', backfill=_backfill_event_reminders)
+def _event_reminders(conn):
+    # Um lembrete por (evento, minutos de antecedência), com o horário de
+    # disparo pré-calculado e indexado para o agendador de reminders.py
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS lembrete (
+        id_evento TEXT NOT NULL,
+        minutes_before INTEGER NOT NULL,
+        fire_at TEXT NOT NULL,
+        PRIMARY KEY (id_evento, minutes_before),
+        FOREIGN KEY (id_evento) REFERENCES evento(id) ON DELETE CASCADE
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lembrete_fire_at ON lembrete(fire_at)')
+
+
+@migration(6, 'Agregados de notas por aluno e turma')
+def _grade_aggregates(conn):
+    # Mantida de forma incremental por gradebook.py
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS media_aluno_turma (
+        id_turma TEXT NOT NULL,
+        id_aluno TEXT NOT NULL,
+        soma_ponderada REAL NOT NULL DEFAULT 0,
+        peso_total REAL NOT NULL DEFAULT 0,
+        quantidade_notas INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_turma, id_aluno)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_media_aluno_turma_aluno ON media_aluno_turma(id_aluno)')
+    conn.execute('''
+    INSERT OR REPLACE INTO media_aluno_turma (id_turma, id_aluno, soma_ponderada, peso_total, quantidade_notas)
+    SELECT av.id_turma, n.id_aluno, SUM(n.valor * av.peso), SUM(av.peso), COUNT(*)
+    FROM nota n
+    JOIN avaliacao av ON av.id = n.id_avaliacao
+    WHERE n.valor IS NOT NULL
+    GROUP BY av.id_turma, n.id_aluno
+    ''')
+
+
+def _backfill_student_names(conn):
+    import roster
+
+    while True:
+        rows = conn.execute(
+            'SELECT rowid, nome FROM aluno WHERE nome_normalizado IS NULL LIMIT ?', (BACKFILL_BATCH_SIZE,)
+        ).fetchall()
+        if not rows:
+            return
+        conn.executemany(
+            'UPDATE aluno SET nome_normalizado = ? WHERE rowid = ?',
+            [(roster.normalize_name(nome), rowid) for rowid, nome in rows]
+        )
+        conn.commit()
+
+
+@migration(7, 'Nome normalizado dos alunos (deduplicação na importação)', backfill=_backfill_student_names)
+def _student_normalized_name(conn):
+    # Preenchida pela aplicação (roster.normalize_name: sem acentos, minúsculas)
+    add_column(conn, 'aluno', 'nome_normalizado', 'TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_aluno_nome_normalizado ON aluno(nome_normalizado, data_nascimento)')
+
+
+@migration(8, 'Índice de busca (FTS5) dos nomes dos alunos')
+def _student_search_index(conn):
+    # Tabela de conteúdo externo: guarda só o índice e lê o nome de `aluno`
+    # pelo rowid. O tokenizador ignora acentos e maiúsculas; os índices de
+    # prefixo de 2 e 3 letras aceleram a busca enquanto o nome é digitado.
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS aluno_busca USING fts5(
+        nome, content='aluno', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS aluno_busca_insert AFTER INSERT ON aluno BEGIN
+        INSERT INTO aluno_busca (rowid, nome) VALUES (NEW.rowid, NEW.nome);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS aluno_busca_update AFTER UPDATE OF nome ON aluno BEGIN
+        INSERT INTO aluno_busca (aluno_busca, rowid, nome) VALUES ('delete', OLD.rowid, OLD.nome);
+        INSERT INTO aluno_busca (rowid, nome) VALUES (NEW.rowid, NEW.nome);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS aluno_busca_delete AFTER DELETE ON aluno BEGIN
+        INSERT INTO aluno_busca (aluno_busca, rowid, nome) VALUES ('delete', OLD.rowid, OLD.nome);
+    END
+    ''')
+    conn.execute("INSERT INTO aluno_busca (aluno_busca) VALUES ('rebuild')")
+
+
+@migration(9, 'Índice de ordenação dos planos de aula')
+def _lesson_plan_order_index(conn):
+    # Paginação por chave (keyset) em data decrescente; planos sem data
+    # ficam por último
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_plano_de_aula_data ON plano_de_aula(ifnull(date, ''), id)")
+
+
+@migration(10, 'Índice de busca (FTS5) dos planos de aula')
+def _lesson_plan_search_index(conn):
+    # Mesmo esquema de aluno_busca: conteúdo externo sincronizado por
+    # gatilhos, sem acentos e com índices de prefixo
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS plano_de_aula_busca USING fts5(
+        title, objectives, methodology, resources,
+        content='plano_de_aula', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS plano_de_aula_busca_insert AFTER INSERT ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (rowid, title, objectives, methodology, resources)
+        VALUES (NEW.rowid, NEW.title, NEW.objectives, NEW.methodology, NEW.resources);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS plano_de_aula_busca_update
+    AFTER UPDATE OF title, objectives, methodology, resources ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (plano_de_aula_busca, rowid, title, objectives, methodology, resources)
+        VALUES ('delete', OLD.rowid, OLD.title, OLD.objectives, OLD.methodology, OLD.resources);
+        INSERT INTO plano_de_aula_busca (rowid, title, objectives, methodology, resources)
+        VALUES (NEW.rowid, NEW.title, NEW.objectives, NEW.methodology, NEW.resources);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS plano_de_aula_busca_delete AFTER DELETE ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (plano_de_aula_busca, rowid, title, objectives, methodology, resources)
+        VALUES ('delete', OLD.rowid, OLD.title, OLD.objectives, OLD.methodology, OLD.resources);
+    END
+    ''')
+    conn.execute("INSERT INTO plano_de_aula_busca (plano_de_aula_busca) VALUES ('rebuild')")
+
+
+@migration(11, 'Índices do banco de questões para o sorteio de quizzes')
+def _question_sampling_indexes(conn):
+    # Os rowids de cada estrato (assunto e/ou dificuldade) saem direto do índice
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pergunta_subject_difficulty ON pergunta(subject, difficulty)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pergunta_difficulty ON pergunta(difficulty)')
+
+
+# Ajusta os contadores do catálogo de assuntos; usado pelos gatilhos de
+# `pergunta` com {sign} = 1 (linha nova) ou -1 (linha antiga)
+_SUBJECT_COUNT_UPSERT = '''
+    INSERT INTO assunto (nome, quantidade) SELECT {row}.subject, {sign}
+    WHERE {row}.subject IS NOT NULL AND {row}.subject != ''
+    ON CONFLICT (nome) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+    INSERT INTO assunto_dificuldade (assunto, difficulty, quantidade)
+    SELECT {row}.subject, ifnull({row}.difficulty, ''), {sign}
+    WHERE {row}.subject IS NOT NULL AND {row}.subject != ''
+    ON CONFLICT (assunto, difficulty) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+'''
+
+_SUBJECT_COUNT_CLEANUP = '''
+    DELETE FROM assunto_dificuldade WHERE assunto = OLD.subject AND quantidade <= 0;
+    DELETE FROM assunto WHERE nome = OLD.subject AND quantidade <= 0;
+'''
+
+
+@migration(12, 'Catálogo de assuntos das perguntas com contadores')
+def _question_subjects(conn):
+    # Um registro por assunto e por (assunto, dificuldade) com a quantidade
+    # de perguntas, mantido por gatilhos; a listagem de assuntos lê só esta
+    # tabela em vez de varrer `pergunta`
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS assunto (
+        nome TEXT PRIMARY KEY,
+        quantidade INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS assunto_dificuldade (
+        assunto TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        quantidade INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (assunto, difficulty)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS assunto_pergunta_insert AFTER INSERT ON pergunta BEGIN
+        {_SUBJECT_COUNT_UPSERT.format(row='NEW', sign=1)}
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS assunto_pergunta_update AFTER UPDATE OF subject, difficulty ON pergunta BEGIN
+        {_SUBJECT_COUNT_UPSERT.format(row='OLD', sign=-1)}
+        {_SUBJECT_COUNT_CLEANUP}
+        {_SUBJECT_COUNT_UPSERT.format(row='NEW', sign=1)}
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS assunto_pergunta_delete AFTER DELETE ON pergunta BEGIN
+        {_SUBJECT_COUNT_UPSERT.format(row='OLD', sign=-1)}
+        {_SUBJECT_COUNT_CLEANUP}
+    END
+    ''')
+
+    conn.execute('DELETE FROM assunto_dificuldade')
+    conn.execute('DELETE FROM assunto')
+    conn.execute('''
+    INSERT INTO assunto_dificuldade (assunto, difficulty, quantidade)
+    SELECT subject, ifnull(difficulty, ''), COUNT(*) FROM pergunta
+    WHERE subject IS NOT NULL AND subject != ''
+    GROUP BY subject, ifnull(difficulty, '')
+    ''')
+    conn.execute('''
+    INSERT INTO assunto (nome, quantidade)
+    SELECT assunto, SUM(quantidade) FROM assunto_dificuldade GROUP BY assunto
+    ''')
+
+
+@migration(13, 'Tentativas de quiz e estatísticas por pergunta')
+def _quiz_attempts(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tentativa_quiz (
+        id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        seed INTEGER,
+        total INTEGER NOT NULL,
+        acertos INTEGER NOT NULL
+    )
+    ''')
+    # Uma linha por pergunta respondida; o histórico da tentativa continua
+    # válido mesmo que a pergunta seja excluída depois
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS resposta_quiz (
+        id_tentativa TEXT NOT NULL,
+        posicao INTEGER NOT NULL,
+        id_pergunta TEXT,
+        resposta TEXT,
+        correta INTEGER NOT NULL,
+        PRIMARY KEY (id_tentativa, posicao),
+        FOREIGN KEY (id_tentativa) REFERENCES tentativa_quiz(id) ON DELETE CASCADE,
+        FOREIGN KEY (id_pergunta) REFERENCES pergunta(id) ON DELETE SET NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_resposta_quiz_pergunta ON resposta_quiz(id_pergunta)')
+    # Contadores por pergunta atualizados a cada tentativa (quizzes.py). As
+    # somas permitem calcular a correlação ponto-bisserial entre acertar a
+    # pergunta e o desempenho no restante do quiz (índice de discriminação)
+    # sem reler as respostas.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS pergunta_estatistica (
+        id_pergunta TEXT PRIMARY KEY,
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        acertos INTEGER NOT NULL DEFAULT 0,
+        n_resto INTEGER NOT NULL DEFAULT 0,
+        soma_resto REAL NOT NULL DEFAULT 0,
+        soma_resto_quadrado REAL NOT NULL DEFAULT 0,
+        soma_acerto_resto REAL NOT NULL DEFAULT 0,
+        soma_acertos_resto INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (id_pergunta) REFERENCES pergunta(id) ON DELETE CASCADE
+    )
+    ''')
+
+
+def _backfill_question_signatures(conn):
+    import similarity
+
+    while True:
+        rows = conn.execute(
+            'SELECT id, text FROM pergunta p '
+            'WHERE NOT EXISTS (SELECT 1 FROM pergunta_lsh l WHERE l.id_pergunta = p.id) LIMIT ?',
+            (BACKFILL_BATCH_SIZE,)
+        ).fetchall()
+        if not rows:
+            return
+        similarity.index_questions(conn, [(row[0], row[1]) for row in rows])
+        conn.commit()
+
+
+@migration(14, 'Índice LSH das perguntas (detecção de quase duplicatas)', backfill=_backfill_question_signatures)
+def _question_similarity_index(conn):
+    # Uma linha por faixa da assinatura MinHash de cada pergunta
+    # (similarity.py); perguntas com a mesma chave em alguma faixa são
+    # candidatas a duplicata. Mantida pela aplicação ao criar/editar.
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS pergunta_lsh (
+        banda INTEGER NOT NULL,
+        chave INTEGER NOT NULL,
+        id_pergunta TEXT NOT NULL,
+        PRIMARY KEY (banda, chave, id_pergunta),
+        FOREIGN KEY (id_pergunta) REFERENCES pergunta(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_pergunta_lsh_pergunta ON pergunta_lsh(id_pergunta)')
+
+
+def _backfill_material_blobs(conn):
+    import blobs
+
+    # Materiais enviados antes do armazenamento por conteúdo apontam para
+    # uploads/<nome original>; o arquivo é registrado como blob (sem remover
+    # o original) e a url passa a apontar para ele. Links externos ficam
+    # como estão.
+    rows = conn.execute('SELECT id, url FROM materials WHERE sha256 IS NULL').fetchall()
+    for material_id, url in rows:
+        if not url or not os.path.isfile(url):
+            continue
+        sha256, size = blobs.store_file(conn, 'uploads', url)
+        conn.execute(
+            'UPDATE materials SET sha256 = ?, tamanho = ?, nome_arquivo = ?, url = ? WHERE id = ?',
+            (sha256, size, os.path.basename(url), blobs.blob_url('uploads', sha256), material_id)
+        )
+        conn.commit()
+
+
+@migration(15, 'Arquivos dos materiais endereçados pelo conteúdo e uploads em partes',
+           backfill=_backfill_material_blobs)
+def _material_blobs(conn):
+    # Um registro por conteúdo distinto (blobs.py)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS blob (
+        sha256 TEXT PRIMARY KEY,
+        tamanho INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    add_column(conn, 'materials', 'sha256', 'TEXT REFERENCES blob(sha256)')
+    add_column(conn, 'materials', 'tamanho', 'INTEGER')
+    add_column(conn, 'materials', 'nome_arquivo', 'TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_materials_sha256 ON materials(sha256)')
+    # Uploads em andamento: `recebido` é quantos bytes já estão gravados no
+    # arquivo parcial, de onde o cliente retoma o envio
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS upload_sessao (
+        id TEXT PRIMARY KEY,
+        nome_arquivo TEXT NOT NULL,
+        tamanho INTEGER NOT NULL,
+        recebido INTEGER NOT NULL DEFAULT 0,
+        title TEXT,
+        tags TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+
+@migration(16, 'Índice de busca (FTS5) do texto dos arquivos dos materiais')
+def _material_content_index(conn):
+    # Texto extraído de cada conteúdo distinto (content_index.py), em partes
+    # de tamanho limitado; a busca e os trechos apontam para a parte
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS blob_texto_parte (
+        id INTEGER PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        parte INTEGER NOT NULL,
+        texto TEXT NOT NULL,
+        UNIQUE (sha256, parte)
+    )
+    ''')
+    # Conteúdos com a extração concluída: os que já estão aqui não são
+    # extraídos de novo
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS blob_texto (
+        sha256 TEXT PRIMARY KEY,
+        partes INTEGER NOT NULL,
+        extraido_em TEXT NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    # Mesmo esquema de plano_de_aula_busca: conteúdo externo sincronizado
+    # por gatilhos (as partes nunca são alteradas, só inseridas e removidas)
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS blob_texto_busca USING fts5(
+        texto,
+        content='blob_texto_parte', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS blob_texto_busca_insert AFTER INSERT ON blob_texto_parte BEGIN
+        INSERT INTO blob_texto_busca (rowid, texto) VALUES (NEW.id, NEW.texto);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS blob_texto_busca_delete AFTER DELETE ON blob_texto_parte BEGIN
+        INSERT INTO blob_texto_busca (blob_texto_busca, rowid, texto) VALUES ('delete', OLD.id, OLD.texto);
+    END
+    ''')
+
+
+@migration(17, 'Chave inteira estável para os índices de eventos, alunos e planos de aula',
+           rebuilds_tables=True)
+def _stable_index_keys(conn):
+    # evento_intervalo, aluno_busca e plano_de_aula_busca apontavam para o
+    # rowid implícito dessas tabelas (chave primária de texto), que o SQLite
+    # não garante estável. Cada tabela ganha uma coluna `chave INTEGER
+    # PRIMARY KEY` com os rowids atuais, então as entradas do R*Tree
+    # continuam válidas; os índices de busca são recriados sobre `chave`.
+    for trigger in ('evento_intervalo_insert', 'evento_intervalo_update', 'evento_intervalo_delete',
+                    'aluno_busca_insert', 'aluno_busca_update', 'aluno_busca_delete',
+                    'plano_de_aula_busca_insert', 'plano_de_aula_busca_update', 'plano_de_aula_busca_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS aluno_busca')
+    conn.execute('DROP TABLE IF EXISTS plano_de_aula_busca')
+
+    for table in ('evento', 'aluno', 'plano_de_aula'):
+        rebuild_with_integer_key(conn, table, 'chave')
+
+    conn.execute(f'''
+    CREATE TRIGGER evento_intervalo_insert AFTER INSERT ON evento BEGIN
+        INSERT OR REPLACE INTO evento_intervalo (id, start_minute, end_minute)
+        VALUES (NEW.chave, {_EVENT_START_MINUTE.format(row='NEW')}, {_EVENT_END_MINUTE.format(row='NEW')});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER evento_intervalo_update AFTER UPDATE OF start_datetime, end_datetime ON evento BEGIN
+        UPDATE evento_intervalo
+        SET start_minute = {_EVENT_START_MINUTE.format(row='NEW')}, end_minute = {_EVENT_END_MINUTE.format(row='NEW')}
+        WHERE id = NEW.chave;
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER evento_intervalo_delete AFTER DELETE ON evento BEGIN
+        DELETE FROM evento_intervalo WHERE id = OLD.chave;
+    END
+    ''')
+
+    conn.execute('''
+    CREATE VIRTUAL TABLE aluno_busca USING fts5(
+        nome, content='aluno', content_rowid='chave',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER aluno_busca_insert AFTER INSERT ON aluno BEGIN
+        INSERT INTO aluno_busca (rowid, nome) VALUES (NEW.chave, NEW.nome);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER aluno_busca_update AFTER UPDATE OF nome ON aluno BEGIN
+        INSERT INTO aluno_busca (aluno_busca, rowid, nome) VALUES ('delete', OLD.chave, OLD.nome);
+        INSERT INTO aluno_busca (rowid, nome) VALUES (NEW.chave, NEW.nome);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER aluno_busca_delete AFTER DELETE ON aluno BEGIN
+        INSERT INTO aluno_busca (aluno_busca, rowid, nome) VALUES ('delete', OLD.chave, OLD.nome);
+    END
+    ''')
+    conn.execute("INSERT INTO aluno_busca (aluno_busca) VALUES ('rebuild')")
+
+    conn.execute('''
+    CREATE VIRTUAL TABLE plano_de_aula_busca USING fts5(
+        title, objectives, methodology, resources,
+        content='plano_de_aula', content_rowid='chave',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER plano_de_aula_busca_insert AFTER INSERT ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (rowid, title, objectives, methodology, resources)
+        VALUES (NEW.chave, NEW.title, NEW.objectives, NEW.methodology, NEW.resources);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER plano_de_aula_busca_update
+    AFTER UPDATE OF title, objectives, methodology, resources ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (plano_de_aula_busca, rowid, title, objectives, methodology, resources)
+        VALUES ('delete', OLD.chave, OLD.title, OLD.objectives, OLD.methodology, OLD.resources);
+        INSERT INTO plano_de_aula_busca (rowid, title, objectives, methodology, resources)
+        VALUES (NEW.chave, NEW.title, NEW.objectives, NEW.methodology, NEW.resources);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER plano_de_aula_busca_delete AFTER DELETE ON plano_de_aula BEGIN
+        INSERT INTO plano_de_aula_busca (plano_de_aula_busca, rowid, title, objectives, methodology, resources)
+        VALUES ('delete', OLD.chave, OLD.title, OLD.objectives, OLD.methodology, OLD.resources);
+    END
+    ''')
+    conn.execute("INSERT INTO plano_de_aula_busca (plano_de_aula_busca) VALUES ('rebuild')")
+
+
+@migration(18, 'Índice de busca (FTS5) do título, das etiquetas e do tipo dos materiais',
+           rebuilds_tables=True)
+def _material_search_index(conn):
+    # A busca de materiais (?q=) procurava título e etiquetas lendo a tabela
+    # inteira; agora usa este índice, ao lado do índice do conteúdo
+    # (blob_texto_busca). Como em _stable_index_keys, o índice aponta para
+    # uma chave inteira estável, não para o rowid implícito.
+    rebuild_with_integer_key(conn, 'materials', 'chave')
+    conn.execute('''
+    CREATE VIRTUAL TABLE materials_busca USING fts5(
+        title, tags, type,
+        content='materials', content_rowid='chave',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER materials_busca_insert AFTER INSERT ON materials BEGIN
+        INSERT INTO materials_busca (rowid, title, tags, type) VALUES (NEW.chave, NEW.title, NEW.tags, NEW.type);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER materials_busca_update AFTER UPDATE OF title, tags, type ON materials BEGIN
+        INSERT INTO materials_busca (materials_busca, rowid, title, tags, type)
+        VALUES ('delete', OLD.chave, OLD.title, OLD.tags, OLD.type);
+        INSERT INTO materials_busca (rowid, title, tags, type) VALUES (NEW.chave, NEW.title, NEW.tags, NEW.type);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER materials_busca_delete AFTER DELETE ON materials BEGIN
+        INSERT INTO materials_busca (materials_busca, rowid, title, tags, type)
+        VALUES ('delete', OLD.chave, OLD.title, OLD.tags, OLD.type);
+    END
+    ''')
+    conn.execute("INSERT INTO materials_busca (materials_busca) VALUES ('rebuild')")
+
+
+# --- Execução ---
+
+def latest_version():
+    return max(m.version for m in MIGRATIONS) if MIGRATIONS else 0
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL,
+        backfill_done INTEGER NOT NULL DEFAULT 1
+    )
+    ''')
+
+
+def current_state(conn):
+    """
+    Retorna (versão aplicada, versões com backfill pendente). Um banco sem a
+    tabela `schema_version` é tratado como versão 0.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0, []
+    version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+    pending = [row[0] for row in conn.execute(
+        'SELECT version FROM schema_version WHERE backfill_done = 0 ORDER BY version'
+    )]
+    return version, pending
+
+
+def migrate(conn, verbose=False):
+    """
+    Aplica, em ordem, todas as migrações com versão maior que a registrada e
+    conclui backfills interrompidos. Retorna a versão final do esquema.
+    """
+    version, pending_backfills = current_state(conn)
+    target = latest_version()
+    if version >= target and not pending_backfills:
+        return version
+
+    by_version = {m.version: m for m in MIGRATIONS}
+    _ensure_version_table(conn)
+
+    for step in sorted(MIGRATIONS, key=lambda m: m.version):
+        if step.version <= version:
+            continue
+        if verbose:
+            print(f'Aplicando migração {step.version}: {step.description}')
+        # O PRAGMA não tem efeito dentro de uma transação
+        foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+        if step.rebuilds_tables:
+            conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('BEGIN')
+        try:
+            step.upgrade(conn)
+            conn.execute(
+                'INSERT INTO schema_version (version, description, applied_at, backfill_done) VALUES (?, ?, ?, ?)',
+                (step.version, step.description, datetime.now().isoformat(timespec='seconds'),
+                 0 if step.backfill else 1)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if step.rebuilds_tables:
+                conn.execute(f'PRAGMA foreign_keys = {foreign_keys}')
+        if step.backfill:
+            pending_backfills.append(step.version)
+
+    # Backfills rodam fora da transação do DDL, em lotes
+    for pending in pending_backfills:
+        step = by_version[pending]
+        if verbose:
+            print(f'Preenchendo dados da migração {step.version}: {step.description}')
+        step.backfill(conn)
+        conn.execute('UPDATE schema_version SET backfill_done = 1 WHERE version = ?', (step.version,))
+        conn.commit()
+
+    return target
+
+
+if __name__ == '__main__':
+    import database
+
+    conn = database.connect()
+    try:
+        before, _ = current_state(conn)
+        after = migrate(conn, verbose=True)
+    finally:
+        conn.close()
+    if before == after:
+        print(f'O esquema já está atualizado (versão {after}).')
+    else:
+        print(f'Esquema migrado da versão {before} para a versão {after}.')
@@ -0,0 +1,216 @@
+"""
+Prévias dos materiais (miniaturas e trechos do texto) geradas em segundo plano.
+
+Ao receber um arquivo, o servidor apenas agenda a geração em um pool de
+processos (`enqueue` nunca espera o trabalho). Os derivados ficam ao lado do
+blob, nomeados pelo hash do conteúdo (`<sha256>.miniatura.jpg`,
+`<sha256>.resumo.txt`): se já existem, nada é refeito, e o mesmo conteúdo
+enviado várias vezes gera as prévias uma vez só. Cada arquivo é gravado em
+um temporário e renomeado, então uma prévia pela metade nunca é servida.
+
+Miniaturas de imagens usam o Pillow, e a primeira página e o texto de PDFs
+o `pdftoppm` e o `pdftotext` (poppler-utils); sem eles, essas prévias são
+apenas puladas.
+
+Para gerar as prévias que faltam de todos os materiais:
+
+    python3 previews.py
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import blobs
+import extraction
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow é opcional
+    Image = None
+
+# Processos do pool de geração
+PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+# Lado maior da miniatura, em pixels
+THUMBNAIL_SIZE = 320
+# Caracteres do trecho de texto
+EXCERPT_LENGTH = 300
+
+THUMBNAIL = 'miniatura.jpg'
+EXCERPT = 'resumo.txt'
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_path(root, sha256, name):
+    return f'{blobs.blob_path(root, sha256)}.{name}'
+
+
+def derivative_url(root, sha256, name):
+    return f'{blobs.blob_url(root, sha256)}.{name}'
+
+
+def expected_derivatives(filename):
+    """Prévias possíveis para o tipo do arquivo."""
+    kind = extraction.kind(filename)
+    names = []
+    if kind == 'image' and Image is not None:
+        names.append(THUMBNAIL)
+    if kind == 'pdf' and shutil.which('pdftoppm'):
+        names.append(THUMBNAIL)
+    if extraction.has_text(filename):
+        names.append(EXCERPT)
+    return names
+
+
+# --- Geração (executada nos processos do pool) ---
+
+def _write_atomically(target, write):
+    temporary = f'{target}.{os.getpid()}.tmp'
+    try:
+        write(temporary)
+        os.replace(temporary, target)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _image_thumbnail(source, target):
+    def write(temporary):
+        with Image.open(source) as image:
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            image.convert('RGB').save(temporary, 'JPEG', quality=80)
+    _write_atomically(target, write)
+
+
+def _pdf_thumbnail(source, target):
+    def write(temporary):
+        # -singlefile grava <prefixo>.jpg
+        prefix = temporary[:-len('.tmp')] + '.pagina'
+        subprocess.run(
+            ['pdftoppm', '-q', '-jpeg', '-f', '1', '-l', '1', '-scale-to', str(THUMBNAIL_SIZE), '-singlefile',
+             source, prefix],
+            check=True, timeout=60
+        )
+        os.replace(f'{prefix}.jpg', temporary)
+    _write_atomically(target, write)
+
+
+def _text_excerpt(source, filename, target):
+    text = extraction.excerpt(source, filename, EXCERPT_LENGTH)
+
+    def write(temporary):
+        with open(temporary, 'w', encoding='utf-8') as output:
+            output.write(text)
+    _write_atomically(target, write)
+
+
+def generate(root, sha256, filename):
+    """Gera as prévias que ainda não existem. Retorna os nomes gerados."""
+    source = blobs.blob_path(root, sha256)
+    generated = []
+    for name in expected_derivatives(filename):
+        target = derivative_path(root, sha256, name)
+        if os.path.exists(target):
+            continue
+        if name == THUMBNAIL:
+            if extraction.kind(filename) == 'pdf':
+                _pdf_thumbnail(source, target)
+            else:
+                _image_thumbnail(source, target)
+        else:
+            _text_excerpt(source, filename, target)
+        generated.append(name)
+    return generated
+
+
+# --- Agendamento (processo do servidor) ---
+
+_executor = None
+# Hashes com geração em andamento, para não agendar o mesmo conteúdo duas vezes
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: os processos não herdam as conexões nem as threads do servidor
+        _executor = ProcessPoolExecutor(max_workers=PREVIEW_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def missing(root, sha256, filename):
+    return [name for name in expected_derivatives(filename)
+            if not os.path.exists(derivative_path(root, sha256, name))]
+
+
+def enqueue(root, sha256, filename):
+    """Agenda a geração das prévias que faltam, sem esperar por ela."""
+    if not missing(root, sha256, filename):
+        return
+    with _lock:
+        if sha256 in _pending:
+            return
+        _pending.add(sha256)
+        try:
+            future = _get_executor().submit(generate, root, sha256, filename)
+        except BrokenProcessPool:
+            _reset_executor()
+            future = _get_executor().submit(generate, root, sha256, filename)
+
+    def done(future):
+        error = future.exception()
+        with _lock:
+            _pending.discard(sha256)
+            if isinstance(error, BrokenProcessPool):
+                # Um processo morreu (falta de memória, por exemplo): o
+                # próximo envio cria um pool novo
+                _reset_executor()
+        if error is not None:
+            logger.warning('Falha ao gerar as prévias de %s: %s', sha256, error)
+
+    future.add_done_callback(done)
+
+
+def previews_for(root, sha256):
+    """URL da miniatura e trecho do texto já gerados (None enquanto não existirem)."""
+    thumbnail = derivative_path(root, sha256, THUMBNAIL)
+    excerpt = None
+    try:
+        with open(derivative_path(root, sha256, EXCERPT), encoding='utf-8') as source:
+            excerpt = source.read()
+    except FileNotFoundError:
+        pass
+    return {
+        'thumbnailUrl': derivative_url(root, sha256, THUMBNAIL) if os.path.exists(thumbnail) else None,
+        'excerpt': excerpt,
+    }
+
+
+if __name__ == '__main__':
+    import database
+
+    conn = database.connect()
+    try:
+        rows = conn.execute(
+            'SELECT DISTINCT sha256, nome_arquivo FROM materials WHERE sha256 IS NOT NULL'
+        ).fetchall()
+    finally:
+        conn.close()
+    total = 0
+    for sha256, filename in rows:
+        total += len(generate('uploads', sha256, filename or ''))
+    print(f'{total} prévia(s) gerada(s) para {len(rows)} arquivo(s).')
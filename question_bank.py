@@ -0,0 +1,310 @@
+"""
+Importação em massa do banco de questões (JSON lines, CSV ou GIFT).
+
+O arquivo é lido linha a linha conforme chega; cada pergunta é validada
+(texto, alternativas sem repetição e resposta entre as alternativas) e as
+válidas são gravadas em lotes de `IMPORT_BATCH_SIZE`, cada lote em uma
+transação com `executemany`. Perguntas inválidas entram no relatório de
+erros com o número da linha e a importação continua. As chaves de
+similaridade (similarity.py) são gravadas na mesma transação.
+"""
+import csv
+import json
+import re
+import uuid
+from itertools import islice
+
+import readers
+import similarity
+
+# Perguntas gravadas por transação
+IMPORT_BATCH_SIZE = 1000
+# Quantidade máxima de mensagens de erro devolvidas na resposta
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ('jsonl', 'csv', 'gift')
+
+# Cabeçalhos aceitos no CSV (em minúsculas) e o campo correspondente
+CSV_HEADERS = {
+    'text': 'text',
+    'pergunta': 'text',
+    'enunciado': 'text',
+    'subject': 'subject',
+    'assunto': 'subject',
+    'difficulty': 'difficulty',
+    'dificuldade': 'difficulty',
+    'answer': 'answer',
+    'resposta': 'answer',
+    'options': 'options',
+    'opcoes': 'options',
+    'opções': 'options',
+    'alternativas': 'options',
+}
+# Colunas com uma alternativa cada ("opcao_a", "option 1", "alternativa B"...)
+_OPTION_COLUMN = re.compile(r'^(option|opcao|opção|alternativa)[ _]?\w+$')
+# Separador das alternativas em uma única coluna
+OPTIONS_SEPARATOR = '|'
+
+
+def _text(value):
+    return ' '.join(str(value).split()) if value is not None else ''
+
+
+def clean_record(raw, subject=None, difficulty=None):
+    """
+    Valida uma pergunta bruta e devolve os valores a gravar. `subject` e
+    `difficulty` são usados quando o registro não os informa. Uma resposta
+    de uma letra (A, B, ...) é aceita como a alternativa naquela posição.
+    Lança ValueError.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('Registro inválido.')
+    text = _text(raw.get('text'))
+    if not text:
+        raise ValueError('Pergunta sem texto.')
+
+    options = raw.get('options') or []
+    if isinstance(options, str):
+        options = options.split(OPTIONS_SEPARATOR)
+    if not isinstance(options, list):
+        raise ValueError('As alternativas devem ser uma lista.')
+    options = [_text(option) for option in options]
+    options = [option for option in options if option]
+    if len(set(options)) != len(options):
+        raise ValueError('Alternativas repetidas.')
+
+    answer = _text(raw.get('answer'))
+    if not answer:
+        raise ValueError('Pergunta sem resposta.')
+    if options and answer not in options:
+        index = ord(answer.upper()) - ord('A') if len(answer) == 1 else -1
+        if not 0 <= index < len(options):
+            raise ValueError(f'A resposta "{answer}" não está entre as alternativas.')
+        answer = options[index]
+
+    return {
+        'text': text,
+        'subject': _text(raw.get('subject')) or subject,
+        'difficulty': _text(raw.get('difficulty')) or difficulty,
+        'options': options,
+        'answer': answer,
+    }
+
+
+# --- Leitores incrementais ---
+# Geram (número da linha, registro bruto ou erro), como os de `readers`.
+
+def iter_csv(lines):
+    """
+    Lê um CSV linha a linha. As alternativas vêm em uma coluna separada por
+    `|` ou em uma coluna por alternativa; o separador (`;` ou `,`) vem do
+    cabeçalho, que deve ser a primeira linha.
+    """
+    lines = iter(lines)
+    header_line = next(lines, None)
+    if header_line is None:
+        return
+    delimiter = ';' if ';' in header_line else ','
+    header = [cell.strip().lower() for cell in next(csv.reader([header_line], delimiter=delimiter))]
+    fields = [CSV_HEADERS.get(cell) or ('option' if _OPTION_COLUMN.match(cell) else None) for cell in header]
+    if 'text' not in fields or 'answer' not in fields:
+        yield 1, ValueError('Cabeçalho com as colunas da pergunta e da resposta não encontrado.')
+        return
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        record = {'options': []}
+        for field, value in zip(fields, row):
+            if field == 'option':
+                record['options'].append(value)
+            elif field == 'options':
+                record['options'].extend(value.split(OPTIONS_SEPARATOR))
+            elif field:
+                record[field] = value
+        yield 1 + reader.line_num, record
+
+
+_GIFT_TRUE = ('t', 'true', 'v', 'verdadeiro')
+_GIFT_FALSE = ('f', 'false', 'falso')
+GIFT_TRUE_FALSE_OPTIONS = ['Verdadeiro', 'Falso']
+
+
+def _gift_unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def _gift_find(text, chars, start=0):
+    """Posição do primeiro caractere de `chars` não escapado, ou -1."""
+    index = start
+    while index < len(text):
+        if text[index] == '\\':
+            index += 2
+            continue
+        if text[index] in chars:
+            return index
+        index += 1
+    return -1
+
+
+def _gift_strip_format(text):
+    # Marcadores de formato ([html], [markdown]...) no início do texto
+    return re.sub(r'^\[(html|moodle|markdown|plain)\]', '', text.strip())
+
+
+def _parse_gift_answers(body):
+    """Alternativas e resposta de um bloco {...} do GIFT."""
+    body = body.strip()
+    if body.lower() in _GIFT_TRUE or body.lower() in _GIFT_FALSE:
+        return GIFT_TRUE_FALSE_OPTIONS, 'Verdadeiro' if body.lower() in _GIFT_TRUE else 'Falso'
+    if body.startswith('#'):
+        raise ValueError('Perguntas numéricas do GIFT não são suportadas.')
+
+    entries = []
+    index = _gift_find(body, '=~')
+    if index == -1:
+        raise ValueError('Bloco de respostas vazio.')
+    while index != -1:
+        following = _gift_find(body, '=~', index + 1)
+        entries.append((body[index], body[index + 1:following if following != -1 else len(body)]))
+        index = following
+
+    options, correct, only_right = [], [], True
+    for marker, entry in entries:
+        feedback = _gift_find(entry, '#')
+        if feedback != -1:
+            entry = entry[:feedback]
+        if '->' in entry:
+            raise ValueError('Perguntas de associação do GIFT não são suportadas.')
+        weight = re.match(r'\s*%(-?\d+(?:\.\d+)?)%', entry)
+        if weight:
+            entry = entry[weight.end():]
+        option = _text(_gift_unescape(_gift_strip_format(entry)))
+        options.append(option)
+        if marker == '=' or (weight and float(weight.group(1)) >= 100):
+            correct.append(option)
+        if marker == '~':
+            only_right = False
+
+    if only_right:
+        # Resposta curta: todas as alternativas são respostas aceitas
+        return [], correct[0]
+    if len(correct) != 1:
+        raise ValueError('A pergunta deve ter exatamente uma alternativa correta.')
+    return options, correct[0]
+
+
+def _parse_gift_question(block, subject):
+    text = block.strip()
+    title = re.match(r'^::(.*?)::', text, re.S)
+    if title:
+        text = text[title.end():]
+    opening = _gift_find(text, '{')
+    closing = _gift_find(text, '}', opening + 1) if opening != -1 else -1
+    if opening == -1 or closing == -1:
+        raise ValueError('Pergunta sem bloco de respostas {...}.')
+    options, answer = _parse_gift_answers(text[opening + 1:closing])
+    before, after = text[:opening].strip(), text[closing + 1:].strip()
+    if after:
+        # Lacuna no meio do enunciado ("Capital do Brasil é {=Brasília}.")
+        statement = f"{before} _____{'' if after[0] in '.,;:!?' else ' '}{after}"
+    else:
+        statement = before
+    return {
+        'text': _gift_unescape(_gift_strip_format(statement)),
+        'subject': subject,
+        'options': options,
+        'answer': answer,
+    }
+
+
+def iter_gift(lines):
+    """
+    Lê perguntas no formato GIFT (Moodle), separadas por linhas em branco.
+    Suporta múltipla escolha, verdadeiro/falso e resposta curta; o
+    `$CATEGORY` vigente (último nível do caminho) vira o assunto.
+    """
+    subject = None
+    block, block_start = [], None
+    number = 0
+
+    def flush():
+        try:
+            return block_start, _parse_gift_question('\n'.join(block), subject)
+        except ValueError as e:
+            return block_start, e
+
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if stripped.startswith('//'):
+            continue
+        if stripped.startswith('$CATEGORY:'):
+            subject = stripped[len('$CATEGORY:'):].strip().rstrip('/').split('/')[-1] or None
+            continue
+        if not stripped:
+            # Linha em branco fora de um bloco {...} encerra a pergunta
+            joined = '\n'.join(block)
+            opening = _gift_find(joined, '{')
+            if block and (opening == -1 or _gift_find(joined, '}', opening + 1) != -1):
+                yield flush()
+                block, block_start = [], None
+            continue
+        if not block:
+            block_start = number
+        block.append(line.rstrip('\r\n'))
+    if block:
+        yield flush()
+
+
+READERS = {'jsonl': readers.iter_ndjson, 'csv': iter_csv, 'gift': iter_gift}
+
+
+# --- Importação ---
+
+def import_questions(conn, entries, subject=None, difficulty=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Grava as perguntas de `entries` (pares de número da linha e registro
+    bruto ou erro) em lotes, cada um em uma transação; erros de validação
+    são contados e a importação segue. Retorna o resumo.
+    """
+    summary = {'created_count': 0, 'error_count': 0, 'errors': []}
+
+    def report(line, message):
+        summary['error_count'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append(f'Linha {line}: {message}')
+
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return summary
+
+        rows = []
+        for line, raw in batch:
+            if isinstance(raw, Exception):
+                report(line, raw)
+                continue
+            try:
+                record = clean_record(raw, subject, difficulty)
+            except ValueError as e:
+                report(line, e)
+                continue
+            rows.append((f"q_{uuid.uuid4().hex}", record['text'], record['subject'], record['difficulty'],
+                         json.dumps(record['options']), record['answer']))
+        if not rows:
+            continue
+
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(
+                'INSERT INTO pergunta (id, text, subject, difficulty, options, answer) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            similarity.index_questions(conn, [(row[0], row[1]) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        summary['created_count'] += len(rows)
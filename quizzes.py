@@ -0,0 +1,237 @@
+"""
+Geração de quizzes no servidor por amostragem aleatória estratificada.
+
+Cada estrato (assunto e/ou dificuldade, com a quantidade desejada) é
+resolvido pelo índice de `pergunta`: apenas os rowids das perguntas do
+estrato são lidos do índice, a amostra é sorteada sem reposição com
+`random.Random.sample` (uniforme, sem o viés de ordenar por um comparador
+aleatório) e só as perguntas escolhidas são carregadas. Com a mesma semente
+e o mesmo banco de questões o quiz gerado é sempre o mesmo.
+
+As tentativas enviadas são corrigidas e gravadas, e os contadores de cada
+pergunta (tentativas, acertos e as somas usadas no índice de
+discriminação) são atualizados na mesma transação.
+"""
+import json
+import math
+import random
+import secrets
+import uuid
+from datetime import datetime
+
+# Quantidade máxima de perguntas em um quiz
+MAX_QUESTIONS = 200
+# Sementes aceitas: [0, MAX_SEED), representáveis sem perda no SQLite e em JS
+MAX_SEED = 2 ** 53
+
+
+def parse_strata(data):
+    """
+    Lê os estratos do corpo da requisição. Aceita `strata` (lista de
+    {subject, difficulty, count}) ou a forma simples {numQuestions, subject,
+    difficulty}. `count` None significa todas as perguntas do estrato (até
+    MAX_QUESTIONS).
+    Lança ValueError com a mensagem de erro.
+    """
+    if 'strata' in data:
+        raw_strata = data['strata']
+        if not isinstance(raw_strata, list) or not raw_strata:
+            raise ValueError('O campo "strata" deve ser uma lista não vazia.')
+    else:
+        raw_strata = [{
+            'subject': data.get('subject'),
+            'difficulty': data.get('difficulty'),
+            'count': data.get('numQuestions'),
+        }]
+
+    strata = []
+    for raw in raw_strata:
+        if not isinstance(raw, dict):
+            raise ValueError('Cada estrato deve ser um objeto.')
+        count = raw.get('count')
+        if count in (None, ''):
+            count = None
+        else:
+            try:
+                count = int(count)
+            except (TypeError, ValueError):
+                raise ValueError('A quantidade de perguntas deve ser um número inteiro.')
+            if count < 1:
+                raise ValueError('A quantidade de perguntas deve ser maior que zero.')
+        strata.append({'subject': raw.get('subject') or None, 'difficulty': raw.get('difficulty') or None,
+                       'count': count})
+
+    total = sum(stratum['count'] or 0 for stratum in strata)
+    if total > MAX_QUESTIONS:
+        raise ValueError(f'Um quiz pode ter no máximo {MAX_QUESTIONS} perguntas.')
+    return strata
+
+
+def parse_seed(value):
+    """Semente informada pelo cliente, ou uma nova semente aleatória."""
+    if value in (None, ''):
+        return secrets.randbits(32)
+    try:
+        seed = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('A semente deve ser um número inteiro.')
+    if not 0 <= seed < MAX_SEED:
+        raise ValueError(f'A semente deve estar entre 0 e {MAX_SEED - 1}.')
+    return seed
+
+
+def _stratum_filter(stratum):
+    conditions, params = [], []
+    if stratum['subject']:
+        conditions.append('subject = ?')
+        params.append(stratum['subject'])
+    if stratum['difficulty']:
+        conditions.append('difficulty = ?')
+        params.append(stratum['difficulty'])
+    return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def sample_questions(conn, strata, seed):
+    """
+    Sorteia as perguntas de cada estrato sem repetir perguntas entre
+    estratos. Retorna (perguntas, como dicts, em ordem aleatória; resumo por
+    estrato com as quantidades pedida, disponível e sorteada).
+    """
+    rng = random.Random(seed)
+    chosen = []
+    chosen_set = set()
+    summary = []
+    for stratum in strata:
+        where, params = _stratum_filter(stratum)
+        # Só o índice é lido aqui (índice de cobertura); a ordenação em
+        # Python deixa a amostra reprodutível pela semente
+        rowids = sorted(row[0] for row in conn.execute(f'SELECT rowid FROM pergunta{where}', params)
+                        if row[0] not in chosen_set)
+        wanted = min(len(rowids), MAX_QUESTIONS - len(chosen))
+        if stratum['count'] is not None:
+            wanted = min(wanted, stratum['count'])
+        picked = rng.sample(rowids, wanted)
+        chosen.extend(picked)
+        chosen_set.update(picked)
+        summary.append({**stratum, 'available': len(rowids), 'selected': wanted})
+
+    rng.shuffle(chosen)
+    if not chosen:
+        return [], summary
+    rows = conn.execute(
+        'SELECT rowid AS question_rowid, * FROM pergunta WHERE rowid IN (SELECT value FROM json_each(?))',
+        (json.dumps(chosen),)
+    )
+    by_rowid = {}
+    for row in rows:
+        question = dict(row)
+        by_rowid[question.pop('question_rowid')] = question
+    return [by_rowid[rowid] for rowid in chosen if rowid in by_rowid], summary
+
+
+# --- Tentativas e estatísticas por pergunta ---
+
+_STATISTICS_UPSERT = '''
+    INSERT INTO pergunta_estatistica (
+        id_pergunta, tentativas, acertos, n_resto, soma_resto, soma_resto_quadrado,
+        soma_acerto_resto, soma_acertos_resto
+    ) VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id_pergunta) DO UPDATE SET
+        tentativas = tentativas + 1,
+        acertos = acertos + excluded.acertos,
+        n_resto = n_resto + excluded.n_resto,
+        soma_resto = soma_resto + excluded.soma_resto,
+        soma_resto_quadrado = soma_resto_quadrado + excluded.soma_resto_quadrado,
+        soma_acerto_resto = soma_acerto_resto + excluded.soma_acerto_resto,
+        soma_acertos_resto = soma_acertos_resto + excluded.soma_acertos_resto
+'''
+
+
+def record_attempt(conn, answers, seed=None):
+    """
+    Corrige e grava uma tentativa. `answers` é uma lista de {questionId,
+    answer}; a correção usa a resposta gravada em `pergunta`, não a do
+    cliente. Atualiza os contadores de cada pergunta na mesma transação.
+    Lança ValueError se alguma pergunta não existir.
+    """
+    if not isinstance(answers, list) or not answers:
+        raise ValueError('O campo "answers" deve ser uma lista não vazia.')
+    if any(not isinstance(item, dict) or not item.get('questionId') for item in answers):
+        raise ValueError('Cada resposta deve informar "questionId".')
+    if seed is not None:
+        seed = parse_seed(seed)
+
+    question_ids = [item['questionId'] for item in answers]
+    expected = dict(conn.execute(
+        'SELECT id, answer FROM pergunta WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(question_ids),)
+    ).fetchall())
+    missing = [question_id for question_id in question_ids if question_id not in expected]
+    if missing:
+        raise ValueError(f'Pergunta não encontrada: {missing[0]}')
+
+    graded = []
+    for item in answers:
+        answer = item.get('answer')
+        graded.append((item['questionId'], answer, answer is not None and str(answer) == expected[item['questionId']]))
+    total = len(graded)
+    score = sum(correct for _, _, correct in graded)
+
+    attempt_id = f"tq_{uuid.uuid4().hex}"
+    conn.execute('BEGIN')
+    try:
+        conn.execute(
+            'INSERT INTO tentativa_quiz (id, created_at, seed, total, acertos) VALUES (?, ?, ?, ?, ?)',
+            (attempt_id, datetime.now().isoformat(timespec='seconds'), seed, total, score)
+        )
+        conn.executemany(
+            'INSERT INTO resposta_quiz (id_tentativa, posicao, id_pergunta, resposta, correta) VALUES (?, ?, ?, ?, ?)',
+            [(attempt_id, position, question_id, None if answer is None else str(answer), int(correct))
+             for position, (question_id, answer, correct) in enumerate(graded)]
+        )
+        statistics = []
+        for question_id, _, correct in graded:
+            x = int(correct)
+            if total > 1:
+                # Desempenho no restante do quiz (sem esta pergunta), de 0 a 1
+                rest = (score - x) / (total - 1)
+                statistics.append((question_id, x, 1, rest, rest * rest, x * rest, x))
+            else:
+                statistics.append((question_id, x, 0, 0.0, 0.0, 0.0, 0))
+        conn.executemany(_STATISTICS_UPSERT, statistics)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        'id': attempt_id,
+        'score': score,
+        'totalQuestions': total,
+        'results': [{'id': question_id, 'userAnswer': answer, 'isCorrect': correct}
+                    for question_id, answer, correct in graded]
+    }
+
+
+def question_statistics(row):
+    """
+    Resumo de uma linha de `pergunta_estatistica` (ou None): tentativas,
+    taxa de acerto e índice de discriminação (correlação ponto-bisserial
+    entre acertar a pergunta e o desempenho no restante do quiz; None
+    enquanto não houver variação suficiente).
+    """
+    if row is None:
+        return {'attempts': 0, 'correct': 0, 'correctRate': None, 'discrimination': None}
+    n = row['n_resto']
+    sum_x, sum_y = row['soma_acertos_resto'], row['soma_resto']
+    variance_x = n * sum_x - sum_x * sum_x
+    variance_y = n * row['soma_resto_quadrado'] - sum_y * sum_y
+    discrimination = None
+    if n > 1 and variance_x > 0 and variance_y > 1e-12:
+        discrimination = (n * row['soma_acerto_resto'] - sum_x * sum_y) / math.sqrt(variance_x * variance_y)
+    return {
+        'attempts': row['tentativas'],
+        'correct': row['acertos'],
+        'correctRate': row['acertos'] / row['tentativas'] if row['tentativas'] else None,
+        'discrimination': discrimination
+    }
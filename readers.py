@@ -0,0 +1,25 @@
+"""
+Leitores incrementais comuns às importações em massa (roster.py e
+question_bank.py).
+
+Todos geram pares (número da linha, registro bruto ou erro): um registro
+inválido vira uma exceção no lugar do registro, e a importação decide se a
+conta e segue adiante.
+"""
+import json
+
+
+def iter_ndjson(lines):
+    """Lê um objeto JSON por linha, gerando (número da linha, registro ou erro)."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, ValueError('JSON inválido.')
+
+
+def iter_list(records):
+    """Adapta uma lista JSON já carregada ao formato dos leitores."""
+    return enumerate(records, 1)
@@ -0,0 +1,139 @@
+"""
+Motor de expansão de eventos recorrentes.
+
+Uma série é guardada como uma regra no estilo RRULE (frequência, intervalo,
+data limite e/ou número de ocorrências, exceções) na tabela `recorrencia`.
+As ocorrências não são gravadas no banco: elas são geradas sob demanda,
+apenas para a janela de datas consultada. Como a posição da primeira
+ocorrência da janela é calculada diretamente, o custo de uma consulta
+depende do tamanho da janela e não do comprimento da série.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+_OCCURRENCE_STAMP = '%Y%m%dT%H%M%S'
+
+
+def add_months(dt, months):
+    """
+    Soma meses a um datetime. Quando o dia não existe no mês de destino
+    (ex.: 31 de abril), usa o último dia do mês.
+    """
+    month_index = dt.month - 1 + months
+    year = dt.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+def occurrence_at(dtstart, frequency, interval, index):
+    """Retorna o início da ocorrência de número `index` (a primeira é 0)."""
+    if frequency == 'daily':
+        return dtstart + timedelta(days=interval * index)
+    if frequency == 'weekly':
+        return dtstart + timedelta(weeks=interval * index)
+    if frequency == 'monthly':
+        return add_months(dtstart, interval * index)
+    raise ValueError(f'Frequência de recorrência inválida: {frequency}')
+
+
+def first_index_on_or_after(dtstart, frequency, interval, moment):
+    """Menor índice cuja ocorrência começa em `moment` ou depois."""
+    if moment <= dtstart:
+        return 0
+    if frequency in ('daily', 'weekly'):
+        period = timedelta(days=interval) if frequency == 'daily' else timedelta(weeks=interval)
+        elapsed = moment - dtstart
+        return -(-elapsed // period)
+    months = (moment.year - dtstart.year) * 12 + moment.month - dtstart.month
+    index = max(0, months // interval - 1)
+    while occurrence_at(dtstart, frequency, interval, index) < moment:
+        index += 1
+    return index
+
+
+def last_occurrence(dtstart, frequency, interval, count):
+    """Início da última ocorrência de uma série limitada por `count`."""
+    return occurrence_at(dtstart, frequency, interval, count - 1)
+
+
+def expand(dtstart, frequency, interval=1, until=None, count=None,
+           window_start=None, window_end=None, exceptions=()):
+    """
+    Gera, em ordem, os inícios das ocorrências dentro de
+    [window_start, window_end). `until` é uma data inclusiva; `exceptions` é
+    um conjunto de inícios (datetime) excluídos da série. Sem `until`,
+    `count` nem `window_end` a série seria infinita, então um deles é
+    obrigatório.
+    """
+    if until is None and count is None and window_end is None:
+        raise ValueError('Uma série sem fim exige uma janela de datas.')
+    index = first_index_on_or_after(dtstart, frequency, interval, window_start) if window_start else 0
+    while count is None or index < count:
+        current = occurrence_at(dtstart, frequency, interval, index)
+        if until is not None and current.date() > until:
+            return
+        if window_end is not None and current >= window_end:
+            return
+        if current not in exceptions:
+            yield current
+        index += 1
+
+
+def is_occurrence(dtstart, frequency, interval, moment, until=None, count=None):
+    """Indica se `moment` é exatamente o início de uma ocorrência da série."""
+    if moment < dtstart:
+        return False
+    index = first_index_on_or_after(dtstart, frequency, interval, moment)
+    if count is not None and index >= count:
+        return False
+    if until is not None and moment.date() > until:
+        return False
+    return occurrence_at(dtstart, frequency, interval, index) == moment
+
+
+# --- Identificadores das ocorrências virtuais ---
+
+def occurrence_id(rule_id, start):
+    """ID estável de uma ocorrência: `<id da regra>_<AAAAMMDDTHHMMSS>`."""
+    return f'{rule_id}_{start.strftime(_OCCURRENCE_STAMP)}'
+
+
+def parse_occurrence_id(event_id):
+    """
+    Separa um ID de ocorrência em (id da regra, início). Retorna None se o ID
+    pertencer a um evento gravado normalmente.
+    """
+    if not event_id.startswith('rec_') or '_' not in event_id[4:]:
+        return None
+    rule_id, stamp = event_id.rsplit('_', 1)
+    try:
+        return rule_id, datetime.strptime(stamp, _OCCURRENCE_STAMP)
+    except ValueError:
+        return None
+
+
+def load_exceptions(conn, rule_ids, lower=None, upper=None):
+    """
+    Carrega as exceções das séries informadas, opcionalmente restritas a
+    inícios em [lower, upper). Retorna {id da regra: conjunto de datetimes}.
+    """
+    if not rule_ids:
+        return {}
+    query = ('SELECT id_recorrencia, occurrence_start FROM recorrencia_excecao '
+             f"WHERE id_recorrencia IN ({','.join('?' * len(rule_ids))})")
+    params = list(rule_ids)
+    if lower is not None and upper is not None:
+        query += ' AND occurrence_start >= ? AND occurrence_start < ?'
+        params += [lower.isoformat(), upper.isoformat()]
+    exceptions = {}
+    for rule_id, start in conn.execute(query, params):
+        exceptions.setdefault(rule_id, set()).add(datetime.fromisoformat(start))
+    return exceptions
+
+
+def parse_until(value):
+    """Converte a data limite armazenada (AAAA-MM-DD) em `date`."""
+    return date.fromisoformat(value) if value else None
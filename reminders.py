@@ -0,0 +1,217 @@
+"""
+Agendador de lembretes de eventos no servidor.
+
+Os horários de disparo dos lembretes de cada evento ficam pré-calculados na
+tabela `lembrete` (mantida por `sync_event_reminders`). Um único thread
+carrega os lembretes que disparam nas próximas horas para um heap, dorme até
+o próximo horário e entrega os lembretes vencidos a todas as abas abertas
+inscritas no endpoint de Server-Sent Events. Lembretes de séries
+recorrentes são calculados a partir das regras, apenas para essa janela.
+"""
+import heapq
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+
+import database
+import recurrence
+
+# Janela carregada para a memória a cada recarga
+HORIZON = timedelta(hours=6)
+# Intervalo máximo entre verificações, mesmo sem lembretes pendentes
+MAX_SLEEP_SECONDS = 60
+# Intervalo entre comentários de keep-alive na conexão SSE
+HEARTBEAT_SECONDS = 25
+
+logger = logging.getLogger(__name__)
+
+
+def parse_reminders(value):
+    """Converte a coluna `reminders` ("10,30") em minutos de antecedência."""
+    if not value:
+        return []
+    return sorted({int(minutes) for minutes in value.split(',') if minutes})
+
+
+def sync_event_reminders(conn, evento_id):
+    """
+    Recalcula os horários de disparo dos lembretes de um evento. Deve ser
+    chamada na mesma transação que grava o evento.
+    """
+    conn.execute('DELETE FROM lembrete WHERE id_evento = ?', (evento_id,))
+    evento = conn.execute('SELECT start_datetime, reminders FROM evento WHERE id = ?', (evento_id,)).fetchone()
+    if evento is None:
+        return
+    start = datetime.fromisoformat(evento['start_datetime'])
+    conn.executemany(
+        'INSERT INTO lembrete (id_evento, minutes_before, fire_at) VALUES (?, ?, ?)',
+        [(evento_id, minutes, (start - timedelta(minutes=minutes)).isoformat())
+         for minutes in parse_reminders(evento['reminders'])]
+    )
+
+
+def _reminder(event_id, title, start, minutes, fire_at):
+    return {
+        'event_id': event_id,
+        'title': title,
+        'start_datetime': start.isoformat(),
+        'minutes_before': minutes,
+        'fire_at': fire_at.isoformat()
+    }
+
+
+def load_due_reminders(conn, lower, upper):
+    """Lembretes com disparo em [lower, upper), como (horário, chave, payload)."""
+    entries = []
+
+    rows = conn.execute('''
+        SELECT l.id_evento, l.minutes_before, l.fire_at, e.title, e.start_datetime
+        FROM lembrete l
+        JOIN evento e ON e.id = l.id_evento
+        WHERE l.fire_at >= ? AND l.fire_at < ?
+    ''', (lower.isoformat(), upper.isoformat())).fetchall()
+    for row in rows:
+        fire_at = datetime.fromisoformat(row['fire_at'])
+        entries.append((
+            fire_at, f"{row['id_evento']}:{row['minutes_before']}",
+            _reminder(row['id_evento'], row['title'], datetime.fromisoformat(row['start_datetime']),
+                      row['minutes_before'], fire_at)
+        ))
+
+    # Séries recorrentes: uma ocorrência que começa em `start` dispara o
+    # lembrete de `m` minutos em start - m, então a janela de inícios é
+    # deslocada pela maior antecedência de cada regra
+    rules = conn.execute(
+        "SELECT * FROM recorrencia WHERE until >= ? AND reminders IS NOT NULL AND reminders != ''",
+        (lower.date().isoformat(),)
+    ).fetchall()
+    rules = [rule for rule in rules if parse_reminders(rule['reminders'])]
+    if rules:
+        max_lead = timedelta(minutes=max(max(parse_reminders(rule['reminders'])) for rule in rules))
+        exceptions = recurrence.load_exceptions(conn, [rule['id'] for rule in rules], lower, upper + max_lead)
+        for rule in rules:
+            minutes_list = parse_reminders(rule['reminders'])
+            starts = recurrence.expand(
+                datetime.fromisoformat(rule['start_datetime']), rule['frequency'], rule['interval'],
+                until=recurrence.parse_until(rule['until']), count=rule['count'],
+                window_start=lower, window_end=upper + timedelta(minutes=minutes_list[-1]),
+                exceptions=exceptions.get(rule['id'], ())
+            )
+            for start in starts:
+                event_id = recurrence.occurrence_id(rule['id'], start)
+                for minutes in minutes_list:
+                    fire_at = start - timedelta(minutes=minutes)
+                    if lower <= fire_at < upper:
+                        entries.append((fire_at, f'{event_id}:{minutes}',
+                                        _reminder(event_id, rule['title'], start, minutes, fire_at)))
+    return entries
+
+
+class ReminderScheduler:
+    """
+    Heap de lembretes da janela atual e lista de inscritos (uma fila por
+    conexão SSE). Chame `invalidate()` após gravar eventos para recarregar a
+    janela; a recarga acontece no thread do agendador, nunca na requisição.
+    """
+
+    def __init__(self, horizon=HORIZON):
+        self.horizon = horizon
+        self._heap = []
+        self._cond = threading.Condition()
+        self._subscribers = set()
+        self._dirty = True
+        self._loaded_until = None
+        self._checked_at = None
+        self._fired = {}
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+                self._thread.start()
+
+    def invalidate(self):
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def subscribe(self):
+        subscription = queue.Queue(maxsize=100)
+        with self._cond:
+            self._subscribers.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._cond:
+            self._subscribers.discard(subscription)
+
+    def _broadcast(self, reminder):
+        with self._cond:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(reminder)
+            except queue.Full:
+                # Cliente lento: descarta em vez de segurar o agendador
+                pass
+
+    def _pop_due(self, now):
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, key, payload = heapq.heappop(self._heap)
+                if key not in self._fired:
+                    self._fired[key] = fire_at
+                    due.append(payload)
+            self._checked_at = now
+            # Guarda as chaves recentes só pelo tempo necessário para evitar
+            # disparos repetidos quando a janela é recarregada
+            cutoff = now - timedelta(hours=1)
+            self._fired = {key: at for key, at in self._fired.items() if at >= cutoff}
+        return due
+
+    def _reload(self, now):
+        lower = self._checked_at or now
+        upper = now + self.horizon
+        conn, _ = database.pool.acquire()
+        try:
+            entries = load_due_reminders(conn, lower, upper)
+        finally:
+            database.pool.release(conn)
+        heapq.heapify(entries)
+        with self._cond:
+            self._heap = entries
+            self._loaded_until = upper
+
+    def _run(self):
+        while True:
+            now = datetime.now()
+            for reminder in self._pop_due(now):
+                self._broadcast(reminder)
+
+            with self._cond:
+                needs_reload = self._dirty or self._loaded_until is None or now >= self._loaded_until
+                self._dirty = False
+            if needs_reload:
+                try:
+                    self._reload(now)
+                except Exception:
+                    logger.exception('Falha ao carregar lembretes; nova tentativa em breve.')
+                    with self._cond:
+                        self._dirty = True
+                        self._cond.wait(MAX_SLEEP_SECONDS)
+                    continue
+
+            with self._cond:
+                if self._dirty:
+                    continue
+                timeout = MAX_SLEEP_SECONDS
+                if self._heap:
+                    timeout = min(timeout, max(0.0, (self._heap[0][0] - datetime.now()).total_seconds()))
+                self._cond.wait(timeout)
+
+
+scheduler = ReminderScheduler()
@@ -6,10 +6,16 @@ def reset_database():
     """
     Exclui o arquivo de banco de dados existente para forçar a recriação
     com o esquema mais recente na próxima inicialização da aplicação.
+    Mudanças de esquema normais são aplicadas por migrations.py; use este
+    script apenas quando quiser começar com um banco de dados vazio.
     """
     if os.path.exists(DATABASE_FILE):
         try:
             os.remove(DATABASE_FILE)
+            # No modo WAL o SQLite mantém arquivos auxiliares ao lado do banco
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(DATABASE_FILE + suffix):
+                    os.remove(DATABASE_FILE + suffix)
             print(f"O arquivo de banco de dados '{DATABASE_FILE}' foi excluído com sucesso.")
             print("Execute 'python3 launch.py' novamente para criar um novo banco de dados com o esquema atualizado.")
         except OSError as e:
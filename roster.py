@@ -0,0 +1,209 @@
+"""
+Importação de listas de alunos (CSV ou NDJSON) em streaming.
+
+O corpo da requisição é lido linha a linha; os registros são validados e
+processados em lotes de `IMPORT_BATCH_SIZE`, cada lote na sua própria
+transação, com inserções e matrículas via `executemany`. Um aluno que já
+existe (mesmo nome normalizado e mesma data de nascimento, consultados pelo
+índice `idx_aluno_nome_normalizado`) é reaproveitado em vez de duplicado.
+"""
+import csv
+import uuid
+from datetime import date, datetime
+from itertools import islice
+
+import search
+
+# Registros processados por transação
+IMPORT_BATCH_SIZE = 500
+# Quantidade máxima de mensagens de erro devolvidas na resposta
+MAX_REPORTED_ERRORS = 100
+
+# Cabeçalhos aceitos no CSV (em minúsculas) e o campo correspondente
+CSV_HEADERS = {
+    'nome': 'nome',
+    'nome do aluno': 'nome',
+    'nome_do_aluno': 'nome',
+    'nº de chamada': 'numero_chamada',
+    'numero_chamada': 'numero_chamada',
+    'data de nascimento': 'data_nascimento',
+    'data_nascimento': 'data_nascimento',
+    'situação do aluno': 'situacao',
+    'situacao': 'situacao',
+}
+
+
+def normalize_name(nome):
+    """
+    Nome sem acentos, em minúsculas e com espaços simples (chave de
+    deduplicação). Todo `nome_normalizado` gravado passa por aqui, inclusive
+    o da migração 7; a normalização em si é a das buscas.
+    """
+    return search.normalize_text(nome)
+
+
+def _text(value):
+    # Campos de JSON podem chegar como números ou booleanos
+    return '' if value is None else str(value).strip()
+
+
+def _parse_birth_date(value):
+    value = _text(value)
+    if not value:
+        return None
+    for pattern in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, pattern).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f'Data de nascimento inválida: {value}')
+
+
+def _parse_roll_number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def clean_record(raw):
+    """Valida um registro bruto e devolve os valores a gravar. Lança ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError('Registro inválido.')
+    nome = ' '.join(str(raw.get('nome') or '').split())
+    if not nome:
+        raise ValueError('Aluno sem nome ignorado.')
+    data_nascimento = raw.get('data_nascimento')
+    if isinstance(data_nascimento, date):
+        data_nascimento = data_nascimento.isoformat()
+    return {
+        'nome': nome,
+        'nome_normalizado': normalize_name(nome),
+        'numero_chamada': _parse_roll_number(raw.get('numero_chamada')),
+        'data_nascimento': _parse_birth_date(data_nascimento),
+        'situacao': _text(raw.get('situacao')) or 'Ativo',
+    }
+
+
+# --- Leitores incrementais ---
+
+def iter_csv(lines):
+    """
+    Lê um CSV linha a linha, gerando (número da linha, registro ou erro).
+    Linhas antes do cabeçalho (títulos da planilha exportada pela secretaria,
+    por exemplo) são ignoradas; o separador (`;` ou `,`) vem do cabeçalho.
+    """
+    lines = iter(lines)
+    offset = 0
+    for line in lines:
+        offset += 1
+        delimiter = ';' if ';' in line else ','
+        header = [cell.strip().lower() for cell in next(csv.reader([line], delimiter=delimiter))]
+        fields = [CSV_HEADERS.get(cell) for cell in header]
+        if 'nome' in fields:
+            break
+    else:
+        yield offset, ValueError('Cabeçalho com a coluna "Nome do Aluno" não encontrado.')
+        return
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        record = {field: value.strip() for field, value in zip(fields, row) if field}
+        yield offset + reader.line_num, record
+
+
+# --- Importação ---
+
+def _find_existing(conn, records):
+    """{(nome normalizado, data de nascimento): id} dos alunos já cadastrados."""
+    names = list({record['nome_normalizado'] for record in records})
+    rows = conn.execute(
+        f"SELECT id, nome_normalizado, data_nascimento FROM aluno "
+        f"WHERE nome_normalizado IN ({','.join('?' * len(names))}) ORDER BY rowid",
+        names
+    )
+    existing = {}
+    for aluno_id, nome_normalizado, data_nascimento in rows:
+        existing.setdefault((nome_normalizado, data_nascimento or None), aluno_id)
+    return existing
+
+
+def import_roster(conn, turma_id, entries, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importa e matricula na turma os registros de `entries` (pares de número
+    da linha e registro bruto ou erro). Cada lote é gravado em uma transação;
+    erros de validação são contados e a importação segue. Retorna o resumo.
+    """
+    summary = {
+        'created_count': 0,
+        'matched_count': 0,
+        'success_count': 0,
+        'already_enrolled_count': 0,
+        'error_count': 0,
+        'errors': [],
+    }
+
+    def report(line, message):
+        summary['error_count'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append(f'Linha {line}: {message}')
+
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return summary
+
+        records = []
+        for line, raw in batch:
+            if isinstance(raw, Exception):
+                report(line, raw)
+                continue
+            try:
+                records.append(clean_record(raw))
+            except ValueError as e:
+                report(line, e)
+        if not records:
+            continue
+
+        conn.execute('BEGIN')
+        try:
+            existing = _find_existing(conn, records)
+            new_students = []
+            enrollments = {}
+            for record in records:
+                key = (record['nome_normalizado'], record['data_nascimento'])
+                aluno_id = existing.get(key)
+                if aluno_id is None:
+                    aluno_id = f"aluno_{uuid.uuid4().hex}"
+                    existing[key] = aluno_id
+                    new_students.append((aluno_id, record['nome'], record['nome_normalizado'],
+                                         record['numero_chamada'], record['data_nascimento'], record['situacao']))
+                else:
+                    summary['matched_count'] += 1
+                enrollments[aluno_id] = None
+
+            conn.executemany(
+                'INSERT INTO aluno (id, nome, nome_normalizado, numero_chamada, data_nascimento, situacao) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                new_students
+            )
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO matricula (id_aluno, id_turma) VALUES (?, ?)',
+                [(aluno_id, turma_id) for aluno_id in enrollments]
+            )
+            enrolled = conn.total_changes - before
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        summary['created_count'] += len(new_students)
+        summary['success_count'] += enrolled
+        summary['already_enrolled_count'] += len(enrollments) - enrolled
+
@@ -0,0 +1,47 @@
+"""
+Utilitários para as buscas de texto (tabelas FTS5).
+
+As tabelas de busca usam o tokenizador `unicode61 remove_diacritics 2`, de
+modo que acentos e maiúsculas são ignorados tanto no texto indexado quanto
+nos termos buscados.
+"""
+import re
+import unicodedata
+
+# Quantidade padrão e máxima de resultados de uma busca
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Palavra (sequência de letras/dígitos)
+WORD = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Texto sem acentos, em minúsculas e com espaços simples."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def prefix_query(text):
+    """
+    Converte o texto digitado em uma expressão MATCH em que cada palavra é
+    um prefixo obrigatório ("jo si" -> "jo"* "si"*). Retorna None se não
+    houver nenhuma palavra. As palavras vão entre aspas, então a sintaxe do
+    FTS5 (AND, OR, NEAR, colunas) digitada pelo usuário não é interpretada.
+    """
+    terms = WORD.findall(text or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    """Lê o parâmetro `limit`, limitado a [1, MAX_LIMIT]. Retorna None se inválido."""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(limit, MAX_LIMIT) if limit >= 1 else None
@@ -0,0 +1,72 @@
+"""
+Uploads em partes (blobs.py): o hash do conteúdo montado precisa ser o
+SHA-256 real do arquivo, mesmo quando uma parte falha no meio e é reenviada.
+
+Execute com: python -m pytest tests/
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blobs  # noqa: E402
+import migrations  # noqa: E402
+
+
+class DroppedStream:
+    """Entrega o início da parte e depois falha, como um cliente que desconecta."""
+
+    def __init__(self, data):
+        self._data = data
+        self._reads = 0
+
+    def read(self, size=-1):
+        self._reads += 1
+        if self._reads > 1:
+            raise ConnectionError('cliente desconectado')
+        return self._data[:min(size, 5)]
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    migrations.migrate(connection)
+    yield connection
+    connection.close()
+
+
+def upload(conn, root, chunks, fail_before=None):
+    content = b''.join(chunks)
+    session_id = blobs.create_session(conn, root, 'arquivo.txt', len(content))
+    session = conn.execute('SELECT * FROM upload_sessao WHERE id = ?', (session_id,)).fetchone()
+    offset = 0
+    stored = None
+    for index, chunk in enumerate(chunks):
+        if index == fail_before:
+            with pytest.raises(ConnectionError):
+                blobs.append_chunk(conn, root, session, offset, DroppedStream(chunk), len(chunk))
+        offset, stored = blobs.append_chunk(conn, root, session, offset, io.BytesIO(chunk), len(chunk))
+    return stored
+
+
+def test_retried_chunk_keeps_content_hash(conn, tmp_path):
+    chunks = [b'primeira', b'segunda part']
+    sha256, size = upload(conn, str(tmp_path), chunks, fail_before=1)
+
+    content = b''.join(chunks)
+    assert sha256 == hashlib.sha256(content).hexdigest()
+    assert size == len(content)
+    with open(blobs.blob_path(str(tmp_path), sha256), 'rb') as stored:
+        assert stored.read() == content
+
+
+def test_identical_uploads_share_blob(conn, tmp_path):
+    first = upload(conn, str(tmp_path), [b'mesmo ', b'conteudo'])
+    second = upload(conn, str(tmp_path), [b'mesmo conteudo'])
+    assert first == second
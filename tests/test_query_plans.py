@@ -0,0 +1,160 @@
+"""
+Garante, via EXPLAIN QUERY PLAN, que as consultas dos endpoints mais usados
+são atendidas por índices em vez de varrer a tabela inteira (SCAN).
+
+Execute com: python -m pytest tests/
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+
+
+# Consultas copiadas dos endpoints de launch.py e dos módulos que eles usam
+HOT_QUERIES = {
+    'get_eventos': '''
+        SELECT e.* FROM evento_intervalo i
+        JOIN evento e ON e.chave = i.id
+        WHERE i.start_minute < CAST(strftime('%s', ?) AS INTEGER) / 60
+          AND i.end_minute > CAST(strftime('%s', ?) AS INTEGER) / 60
+        ORDER BY e.start_datetime
+    ''',
+    'get_eventos (séries)': 'SELECT * FROM recorrencia WHERE until >= ? AND start_datetime < ?',
+    'delete_evento (all)': 'DELETE FROM evento WHERE recurrence_id = ?',
+    'delete_evento (future)': 'DELETE FROM evento WHERE recurrence_id = ? AND start_datetime >= ?',
+    'get_alunos_por_turma': '''
+        SELECT a.* FROM aluno a
+        JOIN matricula m ON a.id = m.id_aluno
+        WHERE m.id_turma = ?
+        ORDER BY a.nome
+    ''',
+    'get_alunos (busca)': '''
+        SELECT a.* FROM aluno_busca
+        JOIN aluno a ON a.chave = aluno_busca.rowid
+        WHERE aluno_busca MATCH ?
+        ORDER BY aluno_busca.rank, a.nome
+        LIMIT ?
+    ''',
+    'import_alunos (deduplicação)': '''
+        SELECT id, nome_normalizado, data_nascimento FROM aluno
+        WHERE nome_normalizado IN (?) ORDER BY rowid
+    ''',
+    'get_similar_questions': '''
+        SELECT p.* FROM pergunta p
+        WHERE p.id IN (
+            SELECT l.id_pergunta FROM json_each(?)
+            JOIN pergunta_lsh l ON l.banda = json_each.key AND l.chave = json_each.value
+        ) AND p.id IS NOT ?
+    ''',
+    'get_avaliacoes_por_turma': 'SELECT * FROM avaliacao WHERE id_turma = ? ORDER BY nome',
+    'get_relatorio_turma': '''
+        SELECT a.id AS id_aluno, a.nome,
+               json_group_object(n.id_avaliacao, n.valor) FILTER (WHERE n.valor IS NOT NULL) AS notas,
+               mt.soma_ponderada, mt.peso_total
+        FROM matricula m
+        JOIN aluno a ON a.id = m.id_aluno
+        LEFT JOIN media_aluno_turma mt ON mt.id_turma = m.id_turma AND mt.id_aluno = m.id_aluno
+        LEFT JOIN avaliacao av ON av.id_turma = m.id_turma
+        LEFT JOIN nota n ON n.id_aluno = m.id_aluno AND n.id_avaliacao = av.id
+        WHERE m.id_turma = ?
+        GROUP BY a.id
+        ORDER BY a.nome
+    ''',
+    'get_medias_turma': 'SELECT * FROM media_aluno_turma WHERE id_turma = ?',
+    'get_medias_aluno': 'SELECT * FROM media_aluno_turma WHERE id_aluno = ?',
+    'grade_stats (avaliações)': '''
+        SELECT n.id_avaliacao, n.valor
+        FROM nota n
+        JOIN avaliacao av ON av.id = n.id_avaliacao
+        JOIN matricula m ON m.id_aluno = n.id_aluno AND m.id_turma = av.id_turma
+        WHERE n.id_avaliacao IN (?) AND n.valor IS NOT NULL
+        ORDER BY n.id_avaliacao, n.valor
+    ''',
+    'grade_stats (médias finais)': '''
+        SELECT mt.id_turma, mt.soma_ponderada / mt.peso_total AS media
+        FROM media_aluno_turma mt
+        JOIN matricula m ON m.id_aluno = mt.id_aluno AND m.id_turma = mt.id_turma
+        WHERE mt.id_turma IN (?) AND mt.peso_total > 0
+        ORDER BY mt.id_turma, media
+    ''',
+    'get_planos_de_aula (página)': '''
+        SELECT * FROM plano_de_aula
+        WHERE ifnull(date, '') <= ? AND (ifnull(date, ''), id) < (?, ?)
+        ORDER BY ifnull(date, '') DESC, id DESC LIMIT ?
+    ''',
+    'get_planos_de_aula (turmas)': '''
+        SELECT id_plano_aula, id_turma FROM plano_aula_turma
+        WHERE id_plano_aula IN (SELECT value FROM json_each(?))
+    ''',
+    'get_planos_de_aula (busca)': '''
+        SELECT p.id, p.title, snippet(plano_de_aula_busca, -1, '**', '**', '…', 16) AS snippet
+        FROM plano_de_aula_busca
+        JOIN plano_de_aula p ON p.chave = plano_de_aula_busca.rowid
+        WHERE plano_de_aula_busca MATCH ?
+          AND p.id IN (SELECT id_plano_aula FROM plano_aula_turma WHERE id_turma = ?)
+        ORDER BY bm25(plano_de_aula_busca, 10.0, 1.0, 1.0, 1.0) LIMIT ?
+    ''',
+    'get_materials (busca no conteúdo)': '''
+        SELECT p.sha256, snippet(blob_texto_busca, 0, '**', '**', '…', 16) AS snippet,
+               blob_texto_busca.rank AS score
+        FROM blob_texto_busca
+        JOIN blob_texto_parte p ON p.id = blob_texto_busca.rowid
+        WHERE blob_texto_busca MATCH ?
+          AND EXISTS (SELECT 1 FROM materials m WHERE m.sha256 = p.sha256)
+        ORDER BY blob_texto_busca.rank
+    ''',
+    'get_materials (busca)': '''
+        SELECT m.* FROM materials_busca
+        JOIN materials m ON m.chave = materials_busca.rowid
+        WHERE materials_busca MATCH ?
+        ORDER BY bm25(materials_busca, 10.0, 5.0, 1.0), m.title
+        LIMIT ?
+    ''',
+    'get_materials (busca, materiais)': 'SELECT * FROM materials WHERE sha256 IN (SELECT value FROM json_each(?))',
+    'create_quiz (estrato)': 'SELECT rowid FROM pergunta WHERE subject = ? AND difficulty = ?',
+    'create_quiz (dificuldade)': 'SELECT rowid FROM pergunta WHERE difficulty = ?',
+    'get_perguntas (assunto e dificuldade)': '''
+        SELECT * FROM pergunta
+        WHERE subject IN (SELECT value FROM json_each(?)) AND difficulty = ?
+    ''',
+    'get_notas_por_avaliacao': 'SELECT * FROM nota WHERE id_avaliacao = ?',
+    'delete_avaliacao': 'DELETE FROM nota WHERE id_avaliacao = ?',
+}
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:')
+    migrations.migrate(connection)
+    yield connection
+    connection.close()
+
+
+def query_plan(conn, sql):
+    params = (None,) * sql.count('?')
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def is_full_scan(step):
+    # Tabelas virtuais (R*Tree, FTS5) aparecem como "SCAN ... VIRTUAL TABLE
+    # INDEX n:<restrições>"; só é varredura completa se não houver restrição
+    # json_each(?) percorre apenas a lista de ids passada como parâmetro
+    if step.startswith('SCAN json_each'):
+        return False
+    if 'VIRTUAL TABLE INDEX' in step:
+        return step.rstrip().endswith(':')
+    return step.startswith('SCAN')
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(conn, name):
+    plan = query_plan(conn, HOT_QUERIES[name])
+    assert plan, f'{name}: plano vazio'
+    scans = [step for step in plan if is_full_scan(step)]
+    assert not scans, f'{name} faz varredura completa: {plan}'
+    assert any('INDEX' in step for step in plan), f'{name} não usa índice: {plan}'
@@ -0,0 +1,54 @@
+"""
+Sementes dos quizzes (quizzes.py): só valores que o SQLite e o JavaScript
+representam sem perda; os demais são recusados com ValueError (400 na API).
+
+Execute com: python -m pytest tests/
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import quizzes  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    migrations.migrate(connection)
+    connection.execute(
+        "INSERT INTO pergunta (id, text, subject, difficulty, options, answer) "
+        "VALUES ('q1', 'Quanto é 2+2?', 'Matemática', 'Fácil', '[\"3\", \"4\"]', '4')"
+    )
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize('value', [0, '42', quizzes.MAX_SEED - 1])
+def test_seed_in_range(value):
+    assert quizzes.parse_seed(value) == int(value)
+
+
+@pytest.mark.parametrize('value', [-1, quizzes.MAX_SEED, 2 ** 70, 'abc'])
+def test_seed_out_of_range_is_rejected(value):
+    with pytest.raises(ValueError):
+        quizzes.parse_seed(value)
+
+
+def test_attempt_with_out_of_range_seed_is_rejected(conn):
+    with pytest.raises(ValueError):
+        quizzes.record_attempt(conn, [{'questionId': 'q1', 'answer': '4'}], seed=2 ** 70)
+    assert conn.execute('SELECT COUNT(*) FROM tentativa_quiz').fetchone()[0] == 0
+
+
+def test_attempt_keeps_seed(conn):
+    result = quizzes.record_attempt(conn, [{'questionId': 'q1', 'answer': '4'}], seed=quizzes.MAX_SEED - 1)
+    stored = conn.execute('SELECT seed FROM tentativa_quiz WHERE id = ?', (result['id'],)).fetchone()[0]
+    assert stored == quizzes.MAX_SEED - 1
+    assert result['score'] == 1
@@ -0,0 +1,43 @@
+"""
+Importação de alunos (roster.py): registros com valores inválidos entram no
+relatório de erros e a importação continua com os demais.
+
+Execute com: python -m pytest tests/
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import readers  # noqa: E402
+import roster  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:')
+    connection.row_factory = sqlite3.Row
+    migrations.migrate(connection)
+    connection.execute("INSERT INTO disciplina (id, nome) VALUES ('d1', 'Biologia')")
+    connection.execute("INSERT INTO turma (id, nome, id_disciplina) VALUES ('t1', 'Turma A', 'd1')")
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def test_numeric_birth_date_is_reported(conn):
+    entries = readers.iter_list([
+        {'nome': 'Ana', 'data_nascimento': 20100101},
+        {'nome': 'Bruno', 'data_nascimento': '2010-01-01', 'situacao': 1},
+    ])
+    summary = roster.import_roster(conn, 't1', entries)
+
+    assert summary['created_count'] == 1
+    assert summary['error_count'] == 1
+    assert summary['errors'][0].startswith('Linha 1:')
+    bruno = conn.execute("SELECT data_nascimento, situacao FROM aluno WHERE nome = 'Bruno'").fetchone()
+    assert tuple(bruno) == ('2010-01-01', '1')